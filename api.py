@@ -1,21 +1,70 @@
-from flask import Blueprint, jsonify
+import json
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from flask_login import current_user
+from datamanager.sql_data_manager import MovieNotFound, UserNotFoundError, SearchUnavailable, DEFAULT_PAGE_SIZE
+from helpers.import_helpers import read_titles
+from helpers.response_cache import cached
 
 
 api = Blueprint('api', __name__)
 
 
+def _cursor_args():
+    """
+    Read the 'after' cursor and 'limit' page size from the query string.
+    Raises ValueError if either of them is not a positive integer.
+    """
+    after = request.args.get('after')
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE)
+    after = int(after) if after is not None else None
+    limit = int(limit)
+    if limit < 1 or (after is not None and after < 0):
+        raise ValueError
+    return after, limit
+
+
+def _limit_arg(default=DEFAULT_PAGE_SIZE):
+    """
+    Read the 'limit' from the query string. Raises ValueError if it is not a positive integer.
+    """
+    limit = int(request.args.get('limit', default))
+    if limit < 1:
+        raise ValueError
+    return limit
+
+
+def _list_response(get_page, iter_rows, *args):
+    """
+    Build the response for a list endpoint.
+    With ?format=ndjson the rows are streamed one JSON object per line,
+    otherwise a single page is returned along with the cursor of the next page.
+    """
+    try:
+        after, limit = _cursor_args()
+    except ValueError:
+        return jsonify({"error": "'after' and 'limit' must be positive integers"}), 400
+
+    if request.args.get('format') == 'ndjson':
+        rows = iter_rows(*args, after=after)
+        lines = (json.dumps(row) + "\n" for row in rows)
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+    items, next_cursor = get_page(*args, after=after, limit=limit)
+    return jsonify({"items": items, "next": next_cursor})
+
+
 @api.route('/users', methods=['GET'])
+@cached
 def get_users():
     """
-    getting a list of all the users in the database
+    getting a page of the users in the database
     """
     from app import data_manager
-    users = [{"username": user.name, "id": user.id} for user in data_manager.get_all_users()]
-
-    return jsonify(users)
+    return _list_response(data_manager.get_users_page, data_manager.iter_users)
 
 
 @api.route('/users/<user_id>/movies', methods=['GET'])
+@cached
 def get_user_movies(user_id):
     """
     getting a list of all the movies of the user
@@ -27,20 +76,187 @@ def get_user_movies(user_id):
     return jsonify(movie_names)
 
 
+@api.route('/users/<user_id>/recommendations', methods=['GET'])
+@cached
+def get_user_recommendations(user_id):
+    """
+    getting movies the user may like, based on the favorites of users with similar taste
+    """
+    from app import data_manager
+    try:
+        limit = _limit_arg(default=10)
+        return jsonify({"items": data_manager.get_recommendations(user_id, limit=limit)})
+    except ValueError:
+        return jsonify({"error": "'limit' must be a positive integer"}), 400
+    except UserNotFoundError as e:
+        return jsonify({"error": f"{e}"}), 404
+
+
+@api.route('/users/<user_id>/movies/import', methods=['POST'])
+def import_user_movies(user_id):
+    """
+    adding many movies to the user's list at once.
+    the titles are sent either as JSON {"titles": [...]} or as a CSV body (text/csv)
+    with a title in the first column of each row.
+    """
+    from app import data_manager
+    if not current_user.is_authenticated:
+        return jsonify({"error": "Login required"}), 401
+    if str(current_user.get_id()) != str(user_id):
+        return jsonify({"error": "Unauthorized!"}), 403
+
+    if request.mimetype == 'text/csv':
+        titles = read_titles(request.get_data(as_text=True).splitlines())
+    else:
+        titles = (request.get_json(silent=True) or {}).get('titles')
+        if not isinstance(titles, list) or not all(isinstance(title, str) for title in titles):
+            return jsonify({"error": "'titles' must be a list of strings"}), 400
+
+    try:
+        report = data_manager.import_movies(user_id, titles)
+    except UserNotFoundError as e:
+        return jsonify({"error": f"{e}"}), 404
+
+    return jsonify(report)
+
+
 @api.route('/movies', methods=["GET"])
+@cached
 def get_movies():
     """
-    getting a list of all the movies in the database
+    getting a page of the movies in the database
+    """
+    from app import data_manager
+    return _list_response(data_manager.get_movies_page, data_manager.iter_movies)
+
+
+@api.route('/movies/top', methods=["GET"])
+@cached
+def get_top_movies():
+    """
+    getting the movies with the best average user rating, with at least 'min_reviews' reviews
     """
     from app import data_manager
-    movies = [{"title": movie.title, "id": movie.id} for movie in data_manager.get_all_movies()]
+    try:
+        limit = _limit_arg()
+        min_reviews = int(request.args.get('min_reviews', 1))
+    except ValueError:
+        return jsonify({"error": "'limit' and 'min_reviews' must be positive integers"}), 400
 
-    return jsonify(movies)
+    return jsonify({"items": data_manager.get_top_rated_movies(limit=limit, min_reviews=min_reviews)})
+
+
+@api.route('/movies/popular', methods=["GET"])
+@cached
+def get_popular_movies():
+    """
+    getting the movies in the most users' lists
+    """
+    from app import data_manager
+    try:
+        limit = _limit_arg()
+    except ValueError:
+        return jsonify({"error": "'limit' must be a positive integer"}), 400
+
+    return jsonify({"items": data_manager.get_most_popular_movies(limit=limit)})
+
+
+@api.route('/movies/most-reviewed', methods=["GET"])
+@cached
+def get_most_reviewed_movies():
+    """
+    getting the movies with the most reviews
+    """
+    from app import data_manager
+    try:
+        limit = _limit_arg()
+    except ValueError:
+        return jsonify({"error": "'limit' must be a positive integer"}), 400
+
+    return jsonify({"items": data_manager.get_most_reviewed_movies(limit=limit)})
+
+
+@api.route('/movies/trending', methods=["GET"])
+def get_trending_movies():
+    """
+    getting the movies with the most reviews in the last days
+    """
+    from app import data_manager
+    try:
+        limit = _limit_arg()
+    except ValueError:
+        return jsonify({"error": "'limit' must be a positive integer"}), 400
+
+    return jsonify({"items": data_manager.get_trending_movies(limit=limit)})
+
+
+@api.route('/movies/<movie_id>', methods=["GET"])
+@cached
+def get_movie(movie_id):
+    """
+    getting the details of a movie, its status is "pending" while its info is being fetched
+    """
+    from app import data_manager
+    try:
+        return jsonify(data_manager.get_movie(movie_id))
+    except MovieNotFound as e:
+        return jsonify({"error": f"{e}"}), 404
+
+
+@api.route('/movies/<movie_id>/similar', methods=["GET"])
+@cached
+def get_similar_movies(movie_id):
+    """
+    getting the movies most often liked by the users who like this movie
+    """
+    from app import data_manager
+    try:
+        limit = _limit_arg(default=10)
+        return jsonify({"items": data_manager.get_similar_movies(movie_id, limit=limit)})
+    except ValueError:
+        return jsonify({"error": "'limit' must be a positive integer"}), 400
+    except MovieNotFound as e:
+        return jsonify({"error": f"{e}"}), 404
 
 
 @api.route('/movies/<movie_id>/reviews', methods=["GET"])
+@cached
 def get_movie_reviews(movie_id):
+    """
+    getting a page of the reviews of a movie
+    """
+    from app import data_manager
+    try:
+        return _list_response(data_manager.get_movie_reviews_page, data_manager.iter_movie_reviews, movie_id)
+    except MovieNotFound as e:
+        return jsonify({"error": f"{e}"}), 404
+
+
+@api.route('/search', methods=["GET"])
+@cached
+def search():
+    """
+    full-text search of movies (by title and director) or of reviews (with ?type=reviews).
+    results are ranked best match first and paginated with 'limit' and 'offset',
+    the 'next' offset is null on the last page.
+    """
     from app import data_manager
-    reviews = data_manager.get_movie_reviews(movie_id)
+    query = request.args.get('q', '')
+    search_type = request.args.get('type', 'movies')
+    if search_type not in ('movies', 'reviews'):
+        return jsonify({"error": "'type' must be 'movies' or 'reviews'"}), 400
+
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        if offset < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "'offset' and 'limit' must be positive integers"}), 400
 
-    return jsonify(reviews)
+    search_method = data_manager.search_movies if search_type == 'movies' else data_manager.search_reviews
+    try:
+        items, next_offset = search_method(query, offset=offset, limit=limit)
+    except SearchUnavailable as e:
+        return jsonify({"error": f"{e}"}), 501
+    return jsonify({"items": items, "next": next_offset})
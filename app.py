@@ -1,11 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, send_file
 import os
 from dotenv import load_dotenv
 from flask_login import LoginManager, login_required, login_user, logout_user, current_user
 from datamanager.sql_data_manager import SQLiteDataManager, db, Movie, User, UserNotFoundError, UserAlreadyExists, MovieNotFound, \
-    WrongPassword
+    WrongPassword, InvalidRating
 from datamanager.user_data_manager import User
 from api import api  # Importing the API blueprint
+from helpers.response_cache import create_response_cache, cached
+from helpers.db_config import configure_database
+from helpers.metrics import Metrics
+from helpers.poster_cache import PosterCache, PosterUnavailable
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -19,10 +23,60 @@ login_manager.login_view = 'login'
 app.register_blueprint(api, url_prefix='/api')  # Registering the blueprint
 
 # Initialize the data manager object
-db_path = os.path.join(os.path.dirname(__file__), "data", "database_file.db")
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+configure_database(app)
+# Create the missing tables and apply the migrations of helpers/migrations.py on startup,
+# set MIGRATE_ON_STARTUP=false to leave it to db_init.py
+app.config["MIGRATE_ON_STARTUP"] = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+# Cache of logged-in users, set USER_CACHE_TTL=0 to disable it
+app.config["USER_CACHE_TTL"] = int(os.getenv("USER_CACHE_TTL", 300))
+app.config["USER_CACHE_SIZE"] = int(os.getenv("USER_CACHE_SIZE", 1024))
+# Reviews from the last TRENDING_WINDOW_DAYS make a movie trending, the list is recomputed
+# in the background every TRENDING_REFRESH_SECONDS (0 disables it)
+app.config["TRENDING_WINDOW_DAYS"] = int(os.getenv("TRENDING_WINDOW_DAYS", 7))
+app.config["TRENDING_REFRESH_SECONDS"] = int(os.getenv("TRENDING_REFRESH_SECONDS", 300))
+# Number of neighbours kept per movie and full rebuild interval of the recommendation index
+app.config["RECOMMENDER_TOP_K"] = int(os.getenv("RECOMMENDER_TOP_K", 20))
+app.config["RECOMMENDER_REBUILD_SECONDS"] = int(os.getenv("RECOMMENDER_REBUILD_SECONDS", 3600))
+# bcrypt work factor of new password hashes and number of hashing processes
+app.config["PASSWORD_HASH_ROUNDS"] = int(os.getenv("PASSWORD_HASH_ROUNDS", 12))
+app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+# Fetch the info of new movies in the background instead of during the request
+app.config["ASYNC_ENRICHMENT"] = os.getenv("ASYNC_ENRICHMENT", "false").lower() == "true"
 data_manager = SQLiteDataManager(app)
 
+# Async variants of the API under /api/async, served by an asyncio data manager over aiosqlite
+app.config["ASYNC_API"] = os.getenv("ASYNC_API", "false").lower() == "true"
+async_data_manager = None
+if app.config["ASYNC_API"]:
+    from datamanager.async_sql_data_manager import AsyncSQLDataManager
+    from async_api import async_api
+    async_data_manager = AsyncSQLDataManager(app, data_manager)
+    app.register_blueprint(async_api, url_prefix='/api/async')
+
+# Cache of rendered pages and API responses: "memory", "disk" or "none"
+app.config["RESPONSE_CACHE_BACKEND"] = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+app.config["RESPONSE_CACHE_PATH"] = os.path.join(os.path.dirname(__file__), "data", "response_cache.db")
+app.config["RESPONSE_CACHE_SIZE"] = int(os.getenv("RESPONSE_CACHE_SIZE", 1024))
+app.config["RESPONSE_CACHE_TTL"] = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+response_cache = create_response_cache(app, data_manager.get_data_version_info)
+
+# Per-route costs of the requests on /metrics, requests slower than SLOW_REQUEST_SECONDS are logged with their SQL
+slow_request_seconds = os.getenv("SLOW_REQUEST_SECONDS")
+app.config["SLOW_REQUEST_SECONDS"] = float(slow_request_seconds) if slow_request_seconds else None
+metrics = Metrics(app, db)
+if async_data_manager is not None:
+    metrics.watch_engine(async_data_manager.engine.sync_engine)
+
+# Local copies of the posters, served from /posters/<movie_id> as thumbnails of POSTER_WIDTHS pixels
+app.config["POSTER_CACHE_DIR"] = os.getenv("POSTER_CACHE_DIR",
+                                           os.path.join(os.path.dirname(__file__), "data", "posters"))
+app.config["POSTER_WIDTHS"] = [int(width) for width in os.getenv("POSTER_WIDTHS", "170,340").split(",")]
+app.config["POSTER_WORKERS"] = int(os.getenv("POSTER_WORKERS", 4))
+poster_cache = PosterCache(app.config["POSTER_CACHE_DIR"], widths=app.config["POSTER_WIDTHS"],
+                           workers=app.config["POSTER_WORKERS"])
+# Thumbnail URLs carry the version of the poster, so browsers can keep them for good
+POSTER_MAX_AGE = 365 * 24 * 60 * 60
+
 
 # Set flash message duration
 app.config['MESSAGE_FLASHING_OPTIONS'] = {'duration': 5}
@@ -31,12 +85,10 @@ app.config['MESSAGE_FLASHING_OPTIONS'] = {'duration': 5}
 @login_manager.user_loader
 def loader_user(user_id):
     """
-    Creating user object from a user in the json file to use for the flask_login
+    Creating user object from a user in the database to use for the flask_login.
+    Served from the data manager's user cache when possible.
     """
-    users = data_manager.get_all_users()
-    user_data = data_manager.get_userinfo_by_id(user_id)
-    if user_data:
-        return User(user_id, user_data)
+    return data_manager.get_login_user(user_id)
 
 
 # Define route for the home page
@@ -47,6 +99,7 @@ def home():
 
 # Define route for the list of users
 @app.route('/users')
+@cached
 def list_users():
     users = data_manager.get_all_users()  # Get all users
     return render_template('users.html', users=users)
@@ -55,6 +108,7 @@ def list_users():
 # Define route for user movies, allowing both GET and POST requests
 @app.route('/users/<int:user_id>', methods=["POST", "GET"])
 @login_required
+@cached
 def user_movies(user_id):
     # Check if the logged-in user's id matches the user_id for this route
     if str(current_user.get_id()) != str(user_id):
@@ -125,6 +179,49 @@ def delete_movie(user_id, movie_id):
         return redirect(url_for("user_movies", user_id=user_id))
 
 
+@app.template_global()
+def poster_url(movie_id, poster, width):
+    """
+    Return the URL of a poster thumbnail for templates, or None if the movie has no poster.
+    The poster starts downloading in the background, so it's ready by the time the browser asks for it.
+    """
+    if not poster or poster == "N/A":
+        return None
+    poster_cache.prefetch(poster)
+    return url_for("poster", movie_id=movie_id, w=width, v=poster_cache.version(poster))
+
+
+@app.route('/posters/<int:movie_id>')
+def poster(movie_id):
+    """
+    Serve a thumbnail of a movie's poster, as WebP to the browsers that accept it and as JPEG to the others.
+    """
+    width = request.args.get("w", type=int)
+    if width not in poster_cache.widths:
+        width = poster_cache.widths[0]
+    try:
+        poster = data_manager.get_movie(movie_id)["poster"]
+    except MovieNotFound:
+        abort(404)
+    if not poster or poster == "N/A":
+        abort(404)
+
+    image_format = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpeg"
+    try:
+        path, etag = poster_cache.thumbnail(poster, width, image_format)
+    except PosterUnavailable:
+        abort(502)
+
+    # Only URLs with the current version of the poster are cached for good, the poster of a movie may change
+    current = request.args.get("v") == poster_cache.version(poster)
+    response = send_file(path, mimetype=f"image/{image_format}", etag=etag, conditional=True,
+                         max_age=POSTER_MAX_AGE if current else 3600)
+    if current:
+        response.cache_control.immutable = True
+    response.vary.add("Accept")
+    return response
+
+
 # Define error handler for 404 errors
 @app.errorhandler(404)
 def page_not_found(e):
@@ -149,7 +246,7 @@ def login(user_id):
             if request.method == 'POST':
                 login_password = request.form.get('password')
                 hashed_pass = user['password']
-                data_manager.authenticate_user(login_password, hashed_pass)
+                data_manager.authenticate_user(login_password, hashed_pass, user_id)
                 user_obj = User(user_id, user)
                 login_user(user_obj)
                 return redirect(url_for("user_movies", user_id=user_id))
@@ -208,6 +305,9 @@ def add_review_route(user_id, movie_id):
             data_manager.add_review(user_id, movie_id, review_text, rating)
             flash("Review added successfully!")
             return redirect(url_for("user_movies", user_id=user_id))
+        except InvalidRating as e:
+            flash(f"{e}")
+            return redirect(url_for("add_review_route", user_id=user_id, movie_id=movie_id))
         except (UserNotFoundError, MovieNotFound) as e:
             flash(f"{e}")
             return redirect(url_for("user_movies", user_id=user_id))
@@ -224,19 +324,17 @@ def add_review_route(user_id, movie_id):
 
 
 @app.route('/movie_reviews/<int:movie_id>', methods=['GET'])
+@cached
 def movie_reviews(movie_id):
-    # Fetch the movie from the database using the movie_id
-    movie = Movie.query.get(movie_id)
-
-    if not movie:
+    try:
+        # Fetch the movie along with its reviews and their authors
+        movie = data_manager.get_movie_with_reviews(movie_id)
+    except MovieNotFound:
         # Handle the case where the movie doesn't exist
         flash("Movie not found!")
         return redirect(url_for('home'))
 
-    # Access the associated reviews
-    reviews = movie.reviews
-
-    return render_template('movie_reviews.html', movie=movie, reviews=reviews)
+    return render_template('movie_reviews.html', movie=movie, reviews=movie["reviews"])
 
 
 # Start the Flask application
@@ -0,0 +1,135 @@
+from flask import Blueprint, jsonify, request
+from flask_login import current_user
+from datamanager.sql_data_manager import (MovieNotFound, UserNotFoundError, ProblemFetchingInfo, SearchUnavailable,
+                                          DEFAULT_PAGE_SIZE)
+from api import _cursor_args
+
+
+# Async variants of the API endpoints, served by the AsyncSQLDataManager
+async_api = Blueprint('async_api', __name__)
+
+
+async def _page_response(get_page, *args):
+    """
+    Build the response for a list endpoint: a single page along with the cursor of the next page.
+    """
+    try:
+        after, limit = _cursor_args()
+    except ValueError:
+        return jsonify({"error": "'after' and 'limit' must be positive integers"}), 400
+
+    items, next_cursor = await get_page(*args, after=after, limit=limit)
+    return jsonify({"items": items, "next": next_cursor})
+
+
+@async_api.route('/users', methods=['GET'])
+async def get_users():
+    """
+    getting a page of the users in the database
+    """
+    from app import async_data_manager
+    return await _page_response(async_data_manager.get_users_page)
+
+
+@async_api.route('/users/<user_id>/movies', methods=['GET'])
+async def get_user_movies(user_id):
+    """
+    getting a list of all the movies of the user
+    """
+    from app import async_data_manager
+    try:
+        user_movies = await async_data_manager.get_user_movies(user_id)
+    except UserNotFoundError as e:
+        return jsonify({"error": f"{e}"}), 404
+
+    return jsonify([movie_info['name'] for movie_info in user_movies.values()])
+
+
+@async_api.route('/users/<user_id>/movies', methods=['POST'])
+async def add_user_movie(user_id):
+    """
+    adding a movie to the user's list, sent as JSON {"title": ...}.
+    the movie's info is fetched from the API if it is new.
+    """
+    from app import async_data_manager
+    if not current_user.is_authenticated:
+        return jsonify({"error": "Login required"}), 401
+    if str(current_user.get_id()) != str(user_id):
+        return jsonify({"error": "Unauthorized!"}), 403
+
+    title = (request.get_json(silent=True) or {}).get('title')
+    if not isinstance(title, str) or not title.strip():
+        return jsonify({"error": "'title' must be a non-empty string"}), 400
+
+    try:
+        await async_data_manager.add_movie(user_id, title)
+    except UserNotFoundError as e:
+        return jsonify({"error": f"{e}"}), 404
+    except ProblemFetchingInfo as e:
+        return jsonify({"error": f"{e}"}), 502
+
+    return jsonify({"title": title}), 201
+
+
+@async_api.route('/movies', methods=["GET"])
+async def get_movies():
+    """
+    getting a page of the movies in the database
+    """
+    from app import async_data_manager
+    return await _page_response(async_data_manager.get_movies_page)
+
+
+@async_api.route('/movies/<movie_id>', methods=["GET"])
+async def get_movie(movie_id):
+    """
+    getting the details of a movie
+    """
+    from app import async_data_manager
+    try:
+        return jsonify(await async_data_manager.get_movie(movie_id))
+    except MovieNotFound as e:
+        return jsonify({"error": f"{e}"}), 404
+
+
+@async_api.route('/movies/<movie_id>/reviews', methods=["GET"])
+async def get_movie_reviews(movie_id):
+    """
+    getting a page of the reviews of a movie
+    """
+    from app import async_data_manager
+    try:
+        return await _page_response(async_data_manager.get_movie_reviews_page, movie_id)
+    except MovieNotFound as e:
+        return jsonify({"error": f"{e}"}), 404
+
+
+@async_api.route('/search', methods=["GET"])
+async def search():
+    """
+    full-text search of movies (by title and director) or of reviews (with ?type=reviews),
+    paginated with 'limit' and 'offset' like /api/search.
+    """
+    from app import async_data_manager
+    query = request.args.get('q', '')
+    search_type = request.args.get('type', 'movies')
+    if search_type not in ('movies', 'reviews'):
+        return jsonify({"error": "'type' must be 'movies' or 'reviews'"}), 400
+
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        if offset < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "'offset' and 'limit' must be positive integers"}), 400
+
+    if search_type == 'movies':
+        search_method = async_data_manager.search_movies
+    else:
+        search_method = async_data_manager.search_reviews
+    try:
+        items, next_offset = await search_method(query, offset=offset, limit=limit)
+    except SearchUnavailable as e:
+        return jsonify({"error": f"{e}"}), 501
+    return jsonify({"items": items, "next": next_offset})
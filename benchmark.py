@@ -0,0 +1,627 @@
+"""
+Benchmark of every route of app.py and of the api blueprint.
+
+A fresh database is filled with seeded synthetic data (helpers/data_generator.py),
+the movie API is replaced by a local stub, and every route is driven through the
+Flask test client and through a real WSGI server at several concurrency levels.
+The p50/p95/p99 latencies and the throughput of every route are written to a JSON
+file, and two such files (e.g. from two commits) can be compared:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json
+    python benchmark.py --compare before.json after.json
+
+Options select what is measured besides the routes:
+
+    # Cost of the writes on a movie of users with 10 to 100k favorites, which should stay flat
+    python benchmark.py --only none --favorites-sizes 10,1000,100000
+    # Login throughput with bcrypt inline and on a pool of 4 processes
+    python benchmark.py --only login --concurrency 1,4,16 --hash-workers 0 --output inline.json
+    python benchmark.py --only login --concurrency 1,4,16 --hash-workers 4 --output pool.json
+    # SQLite's own settings against the tuned profile (helpers/sqlite_profile.py) under concurrency
+    python benchmark.py --concurrency 1,8,32 --sqlite-profile default --output default.json
+    python benchmark.py --concurrency 1,8,32 --sqlite-profile tuned --output tuned.json
+    # Time and memory of the list paths on 1M-row tables, against loading ORM entities
+    python benchmark.py --only none --users 1000000 --movies 1000000 --list-paths
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubMovieAPIHandler(BaseHTTPRequestHandler):
+    """
+    Answers like the movie API after `latency` seconds. Titles starting with "Unknown" are not found.
+    Also serves the posters, a plain image of a different color for every /posters/<number>.jpg.
+    """
+    latency = 0.05
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.path.startswith("/posters/"):
+            return self._send_poster()
+        title = parse_qs(urlparse(self.path).query).get("t", [""])[0]
+        if title.startswith("Unknown"):
+            movie_data = {"Response": "False", "Error": "Movie not found!"}
+        else:
+            digest = int(hashlib.sha256(title.encode("utf-8")).hexdigest(), 16)
+            movie_data = {
+                "Response": "True",
+                "Title": title,
+                "Year": str(1950 + digest % 74),
+                "imdbRating": str(1 + digest % 90 / 10),
+                "Director": "Stub Director",
+                "Poster": f"http://127.0.0.1:{self.server.server_port}/posters/{digest % 1000000}.jpg",
+            }
+        self._send(json.dumps(movie_data).encode("utf-8"), "application/json")
+
+    def _send_poster(self):
+        from PIL import Image
+        number = int(self.path.rsplit("/", 1)[-1].split(".")[0])
+        output = io.BytesIO()
+        Image.new("RGB", (600, 900), (number % 256, number // 256 % 256, number // 65536 % 256)).save(output, "JPEG")
+        self._send(output.getvalue(), "image/jpeg")
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class TestClientSession:
+    """
+    Requests through the Flask test client, in the benchmark's process.
+    """
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data=None, json=None):
+        return self.client.post(path, data=data, json=json).status_code
+
+
+class WSGISession:
+    """
+    Requests over HTTP to the application served by a WSGI server.
+    """
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def get(self, path):
+        return self.session.get(self.base_url + path, allow_redirects=False).status_code
+
+    def post(self, path, data=None, json=None):
+        return self.session.post(self.base_url + path, data=data, json=json, allow_redirects=False).status_code
+
+
+class Worker:
+    """
+    One simulated client, logged in as its own user, with an anonymous session for the login routes.
+    """
+
+    def __init__(self, make_session, user_id, catalog, seed):
+        self.session = make_session()
+        self.anonymous = make_session()
+        self.make_session = make_session
+        self.user_id = user_id
+        self.catalog = catalog
+        self.rng = random.Random(seed)
+        self.counter = 0
+        self.latencies = []
+        self.errors = 0
+        self.session.post(f"/login/{user_id}", data={"password": catalog.password})
+        self.favorites = catalog.favorites_of(user_id)
+
+    def measure(self, request):
+        start = time.perf_counter()
+        try:
+            status = request()
+        except Exception:
+            status = 599
+        self.latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            self.errors += 1
+
+    def next_name(self, prefix):
+        self.counter += 1
+        return f"{prefix} {self.user_id}-{self.counter}-{self.rng.random():.6f}"
+
+    def movie(self):
+        return self.rng.choice(self.catalog.movie_ids)
+
+    def favorite(self):
+        if not self.favorites:
+            self.favorites.append(self.catalog.link(self.user_id, self.movie()))
+        return self.rng.choice(self.favorites)
+
+    def other_user(self):
+        return self.rng.choice(self.catalog.user_ids)
+
+
+class Catalog:
+    """
+    The IDs, titles and passwords the scenarios pick from.
+    Movies are sampled from the favorites, so they are picked as often as they are popular.
+    """
+
+    def __init__(self, app, data_manager, password):
+        from sqlalchemy import func, select
+        from helpers.sql_models import db, Movie, User, user_movie_association
+        self.app = app
+        self.data_manager = data_manager
+        self.password = password
+        with app.app_context():
+            self.user_ids = db.session.execute(select(User.id).where(User.name.like("user%"))).scalars().all()
+            self.movie_ids = db.session.execute(
+                select(user_movie_association.c.movie_id).order_by(func.random()).limit(2000)
+            ).scalars().all()
+            self.titles = dict(db.session.execute(select(Movie.id, Movie.title).where(Movie.id.in_(self.movie_ids))).all())
+
+    def favorites_of(self, user_id):
+        with self.app.app_context():
+            return list(self.data_manager.get_user_movies(user_id).keys())
+
+    def link(self, user_id, movie_id):
+        with self.app.app_context():
+            self.data_manager.add_movie(user_id, self.titles[movie_id])
+        return movie_id
+
+
+def _add_movie(worker):
+    if worker.counter % 4 == 0:
+        # A new title, fetched from the movie API
+        title = worker.next_name("Bench Movie")
+    else:
+        movie_id = worker.movie()
+        title = worker.catalog.titles[movie_id]
+        worker.counter += 1
+        if movie_id not in worker.favorites:
+            worker.favorites.append(movie_id)
+    worker.measure(lambda: worker.session.post(f"/users/{worker.user_id}", data={"name": title}))
+
+
+def _delete_movie(worker):
+    movie_id = worker.favorite()
+    worker.favorites.remove(movie_id)
+    worker.measure(lambda: worker.session.post(f"/users/{worker.user_id}/delete_movie/{movie_id}"))
+
+
+def _update_movie(worker):
+    movie_id = worker.favorite()
+    data = {"name": worker.catalog.titles.get(movie_id, f"Movie {movie_id}"), "year": "2000",
+            "rating": "7.5", "director": "Bench Director"}
+    worker.measure(lambda: worker.session.post(f"/users/{worker.user_id}/update_movie/{movie_id}", data=data))
+
+
+def _add_review(worker):
+    movie_id = worker.favorite()
+    data = {"review_text": worker.next_name("bench review"), "rating": str(worker.rng.randint(1, 10))}
+    worker.measure(lambda: worker.session.post(f"/users/{worker.user_id}/add_review/{movie_id}", data=data))
+
+
+def _login(worker):
+    worker.measure(lambda: worker.anonymous.post(f"/login/{worker.user_id}",
+                                                 data={"password": worker.catalog.password}))
+    worker.anonymous.get("/logout")
+
+
+def _logout(worker):
+    worker.anonymous.post(f"/login/{worker.user_id}", data={"password": worker.catalog.password})
+    worker.measure(lambda: worker.anonymous.get("/logout"))
+
+
+def _add_user(worker):
+    name = worker.next_name("bench_user").replace(" ", "_")
+    data = {"name": name, "password": "password", "confirm-password": "password"}
+    worker.measure(lambda: worker.anonymous.post("/add_user", data=data))
+
+
+def _import_movies(worker):
+    titles = [worker.catalog.titles[worker.movie()] for _ in range(5)] + [worker.next_name("Bench Import")]
+    worker.measure(lambda: worker.session.post(f"/api/users/{worker.user_id}/movies/import",
+                                               json={"titles": titles}))
+
+
+def _get(path):
+    return lambda worker: worker.measure(lambda: worker.session.get(path(worker)))
+
+
+# Scenario name, endpoint it drives, and the function running one request of it
+SCENARIOS = [
+    ("home", "home", _get(lambda w: "/")),
+    ("list_users", "list_users", _get(lambda w: "/users")),
+    ("user_movies", "user_movies", _get(lambda w: f"/users/{w.user_id}")),
+    ("add_movie", "user_movies", _add_movie),
+    ("update_movie_form", "update_movie", _get(lambda w: f"/users/{w.user_id}/update_movie/{w.favorite()}")),
+    ("update_movie", "update_movie", _update_movie),
+    ("delete_movie", "delete_movie", _delete_movie),
+    ("login_form", "login", _get(lambda w: f"/login/{w.other_user()}")),
+    ("login", "login", _login),
+    ("logout", "logout", _logout),
+    ("add_user_form", "new_user", _get(lambda w: "/add_user")),
+    ("add_user", "new_user", _add_user),
+    ("add_review_form", "add_review_route", _get(lambda w: f"/users/{w.user_id}/add_review/{w.favorite()}")),
+    ("add_review", "add_review_route", _add_review),
+    ("movie_reviews", "movie_reviews", _get(lambda w: f"/movie_reviews/{w.movie()}")),
+    ("poster", "poster", _get(lambda w: f"/posters/{w.movie()}?w=170")),
+    ("metrics", "metrics", _get(lambda w: "/metrics")),
+    ("api_users", "api.get_users", _get(lambda w: "/api/users")),
+    ("api_user_movies", "api.get_user_movies", _get(lambda w: f"/api/users/{w.other_user()}/movies")),
+    ("api_recommendations", "api.get_user_recommendations",
+     _get(lambda w: f"/api/users/{w.other_user()}/recommendations")),
+    ("api_import", "api.import_user_movies", _import_movies),
+    ("api_movies", "api.get_movies", _get(lambda w: "/api/movies")),
+    ("api_movies_top", "api.get_top_movies", _get(lambda w: "/api/movies/top")),
+    ("api_movies_popular", "api.get_popular_movies", _get(lambda w: "/api/movies/popular")),
+    ("api_movies_most_reviewed", "api.get_most_reviewed_movies", _get(lambda w: "/api/movies/most-reviewed")),
+    ("api_movies_trending", "api.get_trending_movies", _get(lambda w: "/api/movies/trending")),
+    ("api_movie", "api.get_movie", _get(lambda w: f"/api/movies/{w.movie()}")),
+    ("api_similar", "api.get_similar_movies", _get(lambda w: f"/api/movies/{w.movie()}/similar")),
+    ("api_movie_reviews", "api.get_movie_reviews", _get(lambda w: f"/api/movies/{w.movie()}/reviews")),
+    ("api_search", "api.search",
+     _get(lambda w: f"/api/search?q={w.catalog.titles[w.movie()].split()[0]}")),
+]
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of sorted values.
+    """
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(run_request, workers, requests_per_level):
+    """
+    Run the scenario on all the workers at once, splitting the requests between them.
+    Returns the latencies, the number of errors and the wall-clock time.
+    """
+    for worker in workers:
+        worker.latencies, worker.errors = [], 0
+    shares = [requests_per_level // len(workers) + (i < requests_per_level % len(workers))
+              for i in range(len(workers))]
+
+    def drive(worker, share):
+        for _ in range(share):
+            run_request(worker)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+        list(executor.map(drive, workers, shares))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for worker in workers for latency in worker.latencies)
+    return latencies, sum(worker.errors for worker in workers), elapsed
+
+
+def _timed_call(call):
+    """
+    Run call() and return its duration in seconds and its number of SQL statements.
+    """
+    from helpers.metrics import collect
+    with collect() as stats:
+        start = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - start
+    return elapsed, stats.statement_count
+
+
+def favorites_sweep(app, data_manager, sizes, requests_per_size, seed):
+    """
+    Measure the writes on a movie of a user, for users with each number of favorites.
+    Their cost should be the same whatever the size of the list.
+    """
+    from sqlalchemy import func, insert, select
+    from helpers.data_generator import _insert_batches
+    from helpers.migrations import rebuild_favorite_counts
+    from helpers.sql_models import db, Movie, User, user_movie_association
+    from helpers.text_helpers import normalize_title
+
+    rng = random.Random(seed)
+    results = []
+    with app.app_context():
+        # Enough movies for the largest list
+        movie_ids = db.session.execute(select(Movie.id).order_by(Movie.id).limit(max(sizes))).scalars().all()
+        if len(movie_ids) < max(sizes):
+            first_id = (db.session.execute(select(func.max(Movie.id))).scalar() or 0) + 1
+            _insert_batches(db.session.connection(), Movie.__table__, [
+                {"id": movie_id, "title": f"Sweep Movie {movie_id}",
+                 "normalized_title": normalize_title(f"Sweep Movie {movie_id}")}
+                for movie_id in range(first_id, first_id + max(sizes) - len(movie_ids))
+            ])
+            movie_ids = db.session.execute(select(Movie.id).order_by(Movie.id).limit(max(sizes))).scalars().all()
+        password = db.session.execute(select(User.password).limit(1)).scalar()
+
+        for size in sizes:
+            user_id = db.session.execute(insert(User).values(name=f"sweep_{size}_{seed}", password=password)
+                                         .returning(User.id)).scalar()
+            _insert_batches(db.session.connection(), user_movie_association,
+                            [{"user_id": user_id, "movie_id": movie_id} for movie_id in movie_ids[:size]])
+            rebuild_favorite_counts(db.session.connection())
+            db.session.commit()
+            titles = dict(db.session.execute(select(Movie.id, Movie.title)
+                                             .where(Movie.id.in_(movie_ids[:min(size, 1000)]))).all())
+
+            timings = {}
+            for i in range(requests_per_size):
+                movie_id = rng.choice(list(titles))
+                steps = [
+                    ("get_movie_by_id", lambda: data_manager.get_movie_by_id(user_id, movie_id)),
+                    ("add_review", lambda: data_manager.add_review(user_id, movie_id, f"sweep {i}", 7)),
+                    ("update_movie", lambda: data_manager.update_movie(user_id, movie_id, {"director": f"Sweep {i}"})),
+                    # Removed and added back, so the list keeps its size
+                    ("delete_movie", lambda: data_manager.delete_movie(user_id, movie_id)),
+                    ("add_movie", lambda: data_manager.add_movie(user_id, titles[movie_id])),
+                ]
+                for name, call in steps:
+                    db.session.expunge_all()
+                    timings.setdefault(name, []).append(_timed_call(call))
+
+            for name, measures in timings.items():
+                latencies = sorted(elapsed for elapsed, _ in measures)
+                result = {
+                    "scenario": f"{name}@{size}",
+                    "endpoint": None,
+                    "mode": "favorites_sweep",
+                    "concurrency": 1,
+                    "favorites": size,
+                    "requests": len(latencies),
+                    "errors": 0,
+                    "statements": max(statements for _, statements in measures),
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                    "throughput_rps": round(len(latencies) / sum(latencies), 1),
+                }
+                results.append(result)
+                print(f"favorites {size:<8} {name:16} p50 {result['p50_ms']:8.2f} ms  "
+                      f"p99 {result['p99_ms']:8.2f} ms  statements {result['statements']}")
+    return results
+
+
+def list_paths(app, data_manager):
+    """
+    Measure the time and peak memory of listing all the users and all the movies, with the
+    column-projected queries of the data manager and with whole ORM entities as they used to be.
+    """
+    import tracemalloc
+    from helpers.sql_models import db, Movie, User
+
+    def users_from_entities():
+        return [{"id": user.id, "name": user.name} for user in db.session.query(User).order_by(User.id).all()]
+
+    def movies_from_entities():
+        return [{"id": movie.id, "title": movie.title, "director": movie.director, "year": movie.year,
+                 "rating": movie.rating, "poster": movie.poster, "status": movie.status}
+                for movie in db.session.query(Movie).order_by(Movie.id).all()]
+
+    cases = [
+        ("all_users_projected", data_manager.get_all_users),
+        ("all_users_orm", users_from_entities),
+        ("all_movies_projected", data_manager.get_all_movies),
+        ("all_movies_orm", movies_from_entities),
+    ]
+    results = []
+    with app.app_context():
+        for name, call in cases:
+            # Timed without tracemalloc, which slows allocations down, then traced for the peak memory
+            db.session.remove()
+            start = time.perf_counter()
+            rows = len(call())
+            elapsed = time.perf_counter() - start
+            db.session.remove()
+            tracemalloc.start()
+            call()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            db.session.remove()
+
+            result = {
+                "scenario": name,
+                "endpoint": None,
+                "mode": "list_paths",
+                "concurrency": 1,
+                "rows": rows,
+                "requests": 1,
+                "errors": 0,
+                "p50_ms": round(elapsed * 1000, 3),
+                "p95_ms": round(elapsed * 1000, 3),
+                "p99_ms": round(elapsed * 1000, 3),
+                "throughput_rps": round(rows / elapsed, 1) if elapsed else None,
+                "peak_mib": round(peak / 1024 / 1024, 1),
+            }
+            results.append(result)
+            print(f"{name:22} {rows:>9} rows  {result['p50_ms']:10.1f} ms  peak {result['peak_mib']:8.1f} MiB")
+    return results
+
+
+def benchmark(args):
+    workdir = tempfile.mkdtemp(prefix="moviweb-bench-")
+    stub = start_server(ThreadingHTTPServer(("127.0.0.1", 0), StubMovieAPIHandler))
+    StubMovieAPIHandler.latency = args.api_latency_ms / 1000
+
+    # The application reads its configuration from the environment when it is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["MOVIE_CACHE_PATH"] = os.path.join(workdir, "movie_api_cache.db")
+    os.environ["REQUEST_URL"] = f"http://127.0.0.1:{stub.server_port}/"
+    os.environ["POSTER_CACHE_DIR"] = os.path.join(workdir, "posters")
+    os.environ.setdefault("API_KEY", "benchmark")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    if args.hash_workers is not None:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.hash_workers)
+    if args.sqlite_profile is not None:
+        os.environ["SQLITE_PROFILE"] = args.sqlite_profile
+
+    import db_init
+    from datamanager.sql_data_manager import db
+    from helpers.data_generator import generate, DEFAULT_PASSWORD
+    from sqlalchemy import text
+    db_init.create_tables()
+    db_init.migrate_tables()
+    with db_init.app.app_context():
+        with db.engine.begin() as conn:
+            counts = generate(conn, users=args.users, movies=args.movies, seed=args.seed,
+                              rounds=int(os.getenv("PASSWORD_HASH_ROUNDS", 12)))
+            # Generated movies have no posters, point them to the stub's
+            conn.execute(text("UPDATE movie SET poster = :base || id || '.jpg'"),
+                         {"base": f"http://127.0.0.1:{stub.server_port}/posters/"})
+
+    from app import app, data_manager
+    from werkzeug.serving import make_server
+    # The access log of every request would slow down the server it measures
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    wsgi_server = start_server(make_server("127.0.0.1", 0, app, threaded=True))
+    catalog = Catalog(app, data_manager, DEFAULT_PASSWORD)
+    make_sessions = {
+        "test_client": lambda: TestClientSession(app),
+        "wsgi": lambda: WSGISession(f"http://127.0.0.1:{wsgi_server.server_port}"),
+    }
+
+    scenarios = [scenario for scenario in SCENARIOS if not args.only or scenario[0] in args.only]
+    covered = {endpoint for _, endpoint, _ in SCENARIOS}
+    uncovered = sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                       if rule.endpoint != "static" and rule.endpoint not in covered)
+    if uncovered:
+        print(f"Routes without a scenario: {', '.join(uncovered)}", file=sys.stderr)
+
+    results = []
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            workers = [Worker(make_sessions[mode], catalog.user_ids[i % len(catalog.user_ids)],
+                              catalog, args.seed + i) for i in range(concurrency)]
+            for name, endpoint, run_request in scenarios:
+                # One untimed request first, so caches and lazily built indexes don't count
+                run_request(workers[0])
+                latencies, errors, elapsed = run_scenario(run_request, workers, args.requests)
+                result = {
+                    "scenario": name,
+                    "endpoint": endpoint,
+                    "mode": mode,
+                    "concurrency": concurrency,
+                    "requests": len(latencies),
+                    "errors": errors,
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                    "throughput_rps": round(len(latencies) / elapsed, 1),
+                }
+                results.append(result)
+                print(f"{mode:11} c={concurrency:<3} {name:22} p50 {result['p50_ms']:8.2f} ms  "
+                      f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                      f"{result['throughput_rps']:8.1f} req/s  errors {errors}")
+
+    if args.favorites_sizes:
+        results.extend(favorites_sweep(app, data_manager, args.favorites_sizes, args.requests, args.seed))
+    if args.list_paths:
+        results.extend(list_paths(app, data_manager))
+
+    wsgi_server.shutdown()
+    stub.shutdown()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    report = {
+        "meta": {
+            "commit": commit,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "requests_per_level": args.requests,
+            "api_latency_ms": args.api_latency_ms,
+            "password_hash_workers": int(os.getenv("PASSWORD_HASH_WORKERS", 2)),
+            "sqlite_profile": os.getenv("SQLITE_PROFILE", "tuned"),
+            "data": counts,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def compare(before_path, after_path):
+    """
+    Print the latency and throughput changes of every scenario present in both result files.
+    """
+    def load(path):
+        with open(path, encoding="utf-8") as result_file:
+            return {(r["scenario"], r["mode"], r["concurrency"]): r for r in json.load(result_file)["results"]}
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+7.1f}%" if old else "    n/a"
+
+    before, after = load(before_path), load(after_path)
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        scenario, mode, concurrency = key
+        print(f"{mode:11} c={concurrency:<3} {scenario:22} p50 {change(old['p50_ms'], new['p50_ms'])}  "
+              f"p99 {change(old['p99_ms'], new['p99_ms'])}  "
+              f"throughput {change(old['throughput_rps'], new['throughput_rps'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every route on seeded synthetic data.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    parser.add_argument("--output", default="benchmark_results.json", help="file the results are written to")
+    parser.add_argument("--users", type=int, default=1000, help="number of synthetic users")
+    parser.add_argument("--movies", type=int, default=5000, help="number of synthetic movies")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the data and of the request choices")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")],
+                        default=[1, 4, 16], help="comma-separated concurrency levels")
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=["test_client", "wsgi"],
+                        help="comma-separated modes: test_client, wsgi")
+    parser.add_argument("--api-latency-ms", type=float, default=50, help="latency of the stub movie API")
+    parser.add_argument("--only", type=lambda value: value.split(","),
+                        help="comma-separated scenarios to run, 'none' for none of the routes")
+    parser.add_argument("--favorites-sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        help="comma-separated favorites list sizes to measure the writes on a movie with")
+    parser.add_argument("--hash-workers", type=int,
+                        help="number of password hashing processes, 0 to hash on the request thread")
+    parser.add_argument("--sqlite-profile", choices=["default", "tuned"], help="SQLite connection profile")
+    parser.add_argument("--list-paths", action="store_true",
+                        help="measure the time and memory of the list paths against ORM entities")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        benchmark(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+import asyncio
+from sqlalchemy import exists, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from .data_manager_interface import DataManagerInterface
+from .sql_data_manager import (SQLiteDataManager, UserNotFoundError, WrongPassword, UserAlreadyExists,
+                               ProblemFetchingInfo, MovieNotFound, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+                               SEARCH_MOVIES_SQL, SEARCH_REVIEWS_SQL, SEARCH_DIALECTS, SearchUnavailable,
+                               UPSERT_INSERTS)
+from .read_models import UserSummary
+from helpers.api_helpers import MovieAPIUnavailable
+from helpers.async_api_helpers import AsyncMovieAPI
+from helpers.password_hasher import PasswordHasher
+from helpers.replica_routing import mark_written
+from helpers.sqlite_profile import apply_sqlite_pragmas
+from helpers.sql_models import *
+from helpers.text_helpers import normalize_title, fts_match_query
+
+
+class AsyncSQLDataManager(DataManagerInterface):
+    """
+    asyncio version of SQLiteDataManager over the same database, for async views.
+    Waiting for SQLite (through aiosqlite) or for the movie API doesn't block the
+    event loop, so one process can serve many slow requests at once.
+
+    It covers the API's read paths, adding users and adding movies. Writes go through
+    the same statements as SQLiteDataManager's, and the favorites added here are
+    recorded in the recommendation index of the SQLiteDataManager it is given.
+    """
+
+    def __init__(self, app, data_manager=None):
+        """
+        Args:
+            app (Flask): The application, whose database configuration is used.
+            data_manager (SQLiteDataManager): The synchronous data manager of the application,
+                whose recommendation index is told about the favorites changed here.
+        """
+        self.data_manager = data_manager
+        database_uri = app.config.get("ASYNC_DATABASE_URI")
+        if database_uri is None:
+            url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+            if url.drivername == "sqlite":
+                url = url.set(drivername="sqlite+aiosqlite")
+            elif url.drivername in ("postgresql", "postgresql+psycopg2"):
+                url = url.set(drivername="postgresql+asyncpg")
+            database_uri = url
+        # Connections belong to the event loop that opened them, and Flask runs every
+        # async view in its own event loop, so connections aren't kept between requests
+        self.engine = create_async_engine(database_uri, poolclass=NullPool)
+        apply_sqlite_pragmas(self.engine.sync_engine, app.config.get("SQLITE_PRAGMAS"))
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.password_hasher = PasswordHasher(
+            rounds=app.config.get("PASSWORD_HASH_ROUNDS", 12),
+            workers=app.config.get("PASSWORD_HASH_WORKERS", 2)
+        )
+
+    async def get_all_users(self):
+        """
+        Retrieves all users from the SQL.
+        """
+        async with self.session() as session:
+            rows = (await session.execute(select(User.id, User.name).order_by(User.id))).all()
+        return list(map(UserSummary._make, rows))
+
+    async def get_users_page(self, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve one page of users ordered by ID.
+
+        Args:
+            after (int): Only return users with an ID greater than this cursor.
+            limit (int): The maximum number of users to return.
+
+        Returns:
+            tuple: A list of user dictionaries and the cursor of the next page (None on the last page).
+        """
+        statement = select(User.id, User.name)
+        return await self._keyset_page(statement, User.id, SQLiteDataManager._user_row_to_dict, after, limit)
+
+    async def get_movies_page(self, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve one page of movies ordered by ID.
+
+        Args:
+            after (int): Only return movies with an ID greater than this cursor.
+            limit (int): The maximum number of movies to return.
+
+        Returns:
+            tuple: A list of movie dictionaries and the cursor of the next page (None on the last page).
+        """
+        statement = select(Movie.id, Movie.title, Movie.status)
+        return await self._keyset_page(statement, Movie.id, SQLiteDataManager._movie_row_to_dict, after, limit)
+
+    async def get_movie_reviews_page(self, movie_id, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve one page of reviews for a specific movie ordered by review ID.
+
+        Args:
+            movie_id (int): The ID of the movie.
+            after (int): Only return reviews with an ID greater than this cursor.
+            limit (int): The maximum number of reviews to return.
+
+        Returns:
+            tuple: A list of review dictionaries and the cursor of the next page (None on the last page).
+
+        Raises:
+            MovieNotFound: If no movie is associated with the movie ID.
+        """
+        async with self.session() as session:
+            if await session.scalar(select(Movie.id).filter_by(id=movie_id)) is None:
+                raise MovieNotFound(f"Movie ID {movie_id} does not exist")
+
+        statement = (
+            select(Review.id, User.name, Review.rating, Review.review_text)
+            .join(User, User.id == Review.user_id)
+            .where(Review.movie_id == movie_id)
+        )
+        return await self._keyset_page(statement, Review.id, SQLiteDataManager._review_row_to_dict, after, limit)
+
+    async def _keyset_page(self, statement, key_column, row_to_dict, after, limit):
+        """
+        Return one page of the statement ordered by key_column, starting after the given cursor.
+        One extra row is fetched to know whether another page follows.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        if after is not None:
+            statement = statement.where(key_column > after)
+        async with self.session() as session:
+            rows = (await session.execute(statement.order_by(key_column).limit(limit + 1))).all()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [row_to_dict(row) for row in rows[:limit]], next_cursor
+
+    async def search_movies(self, query, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Full-text search of movies by title and director, best matches first.
+        See SQLiteDataManager.search_movies.
+        """
+        return await self._search(SEARCH_MOVIES_SQL, query, offset, limit,
+                                  SQLiteDataManager._movie_search_row_to_dict)
+
+    async def search_reviews(self, query, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Full-text search of review texts, best matches first.
+        See SQLiteDataManager.search_reviews.
+        """
+        return await self._search(SEARCH_REVIEWS_SQL, query, offset, limit,
+                                  SQLiteDataManager._review_search_row_to_dict)
+
+    async def _search(self, statement, query, offset, limit, row_to_dict):
+        """
+        Run a full-text search statement for one page of results.
+        One extra row is fetched to know whether another page follows.
+        """
+        dialect = self.engine.dialect.name
+        if dialect not in SEARCH_DIALECTS:
+            raise SearchUnavailable(f"Full-text search isn't available on {dialect} databases")
+
+        match = fts_match_query(query)
+        if match is None:
+            return [], None
+
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+        async with self.session() as session:
+            result = await session.execute(statement, {"match": match, "limit": limit + 1, "offset": offset})
+            rows = result.all()
+
+        next_offset = offset + limit if len(rows) > limit else None
+        return [row_to_dict(row) for row in rows[:limit]], next_offset
+
+    async def get_movie(self, movie_id):
+        """
+        Retrieve a movie's details by movie ID.
+
+        Args:
+            movie_id (int): The ID of the movie.
+
+        Returns:
+            dict: Movie details, including whether its info is still being fetched.
+
+        Raises:
+            MovieNotFound: If no movie is associated with the movie ID.
+        """
+        async with self.session() as session:
+            movie = await session.get(Movie, movie_id)
+
+        if not movie:
+            raise MovieNotFound(f"Movie ID {movie_id} does not exist")
+
+        return SQLiteDataManager._movie_details(movie)
+
+    async def get_user_movies(self, user_id):
+        """
+        Retrieve the movies associated with a specific user ID.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            dict: The movies associated with the user ID.
+
+        Raises:
+            UserNotFoundError: If no user is associated with the user ID.
+        """
+        async with self.session() as session:
+            rows = (await session.execute(SQLiteDataManager._user_movies_statement(user_id))).all()
+
+        if not rows:
+            raise UserNotFoundError(f"User ID {user_id} does not exist")
+
+        return SQLiteDataManager._user_movies_to_dict(rows)
+
+    async def get_data_version(self):
+        """
+        Retrieve the data version, which changes with every write to the users, movies or reviews.
+        """
+        async with self.session() as session:
+            version = await session.scalar(select(DataVersion.version).filter_by(name=DATA_VERSION_NAME))
+        return version or 0
+
+    async def add_user(self, user_name, password, confirm_password):
+        """
+        Add a new user.
+
+        Args:
+            user_name (str): The name of the new user.
+            password (str): The users password
+            confirm_password (str): Confirmation of password
+
+        Returns:
+            int: The ID of the new user.
+
+        Raises:
+            UserAlreadyExists: If the username already exists.
+        """
+        if password != confirm_password:
+            raise TypeError("passwords don't match!")
+        if len(password) < 8:
+            raise WrongPassword("Password needs to be at least 8 characters")
+
+        async with self.session() as session:
+            if await session.scalar(select(User.id).filter_by(name=user_name)) is not None:
+                raise UserAlreadyExists("Username already exists. Please choose a different username.")
+
+            # The hasher waits for its worker process, so it is waited for in a thread
+            hashed_pass = await asyncio.to_thread(self.password_hasher.hash, password)
+
+            new_user = User(name=user_name, password=hashed_pass)
+            session.add(new_user)
+            await self._bump_data_version(session)
+            await session.commit()
+            mark_written()
+            return new_user.id
+
+    async def add_movie(self, user_id, title):
+        """
+        Add a new movie for a specific user, fetching its info from the API if it is new.
+
+        Args:
+            user_id (str): The ID of the user.
+            title (str): The title of the movie.
+
+        Returns:
+            None.
+
+        Raises:
+            UserNotFoundError: If no user is associated with the user ID.
+            ProblemFetchingInfo: If there is a problem fetching movie info from the API.
+        """
+        is_favorite = exists().where(
+            user_movie_association.c.user_id == User.id,
+            user_movie_association.c.movie_id == Movie.id
+        )
+        statement = (
+            select(User.id, Movie, is_favorite.label("is_favorite"))
+            .select_from(User)
+            .outerjoin(Movie, Movie.normalized_title == normalize_title(title))
+            .where(User.id == user_id)
+        )
+
+        async with self.session() as session:
+            row = (await session.execute(statement)).first()
+
+            if row is None:
+                raise UserNotFoundError(f"User ID {user_id} does not exist")
+
+            if row.Movie is not None:
+                retried = row.Movie.status == MOVIE_FAILED
+                if retried:
+                    # Its info couldn't be fetched before, try again rather than linking a failed movie
+                    await self._retry_failed_movie(session, row.Movie)
+                # If the movie already exists, just link it to the user (if not already linked)
+                linked = not row.is_favorite and await self._link_movie_to_user(session, row.id, row.Movie.id)
+                if linked or retried:
+                    await self._bump_data_version(session)
+                    await session.commit()
+                    mark_written()
+                if linked:
+                    self._record_favorite_changes(row.id, [row.Movie.id], 1)
+                return
+
+            movie_info_from_api = await AsyncMovieAPI.fetch_movie_info(title)
+
+            if movie_info_from_api is None:
+                raise ProblemFetchingInfo("There was a problem fetching movie info")
+
+            new_movie = Movie(title=title)
+            SQLiteDataManager._apply_movie_info(new_movie, movie_info_from_api)
+
+            # Add the movie and associate it with the user as a favorite in one transaction
+            session.add(new_movie)
+            await session.flush()
+            await self._link_movie_to_user(session, row.id, new_movie.id)
+            await self._bump_data_version(session)
+            await session.commit()
+            mark_written()
+            self._record_favorite_changes(row.id, [new_movie.id], 1)
+
+    async def _retry_failed_movie(self, session, movie):
+        """
+        Fetch the info of a movie whose info couldn't be fetched before, like SQLiteDataManager._retry_failed_movie.
+
+        Raises:
+            ProblemFetchingInfo: If the info still can't be fetched, or the API doesn't know the movie.
+        """
+        try:
+            movie_info_from_api = await AsyncMovieAPI.lookup_movie_info(movie.title)
+        except MovieAPIUnavailable:
+            raise ProblemFetchingInfo("There was a problem fetching movie info")
+
+        if movie_info_from_api is None:
+            # Discarded, with its reviews and its links to the users' favorites
+            user_ids = (await session.execute(SQLiteDataManager._movie_fans_statement(movie.id))).scalars().all()
+            for statement in SQLiteDataManager._discard_movie_statements(movie.id):
+                await session.execute(statement)
+            await self._bump_data_version(session)
+            await session.commit()
+            mark_written()
+            for user_id in user_ids:
+                self._record_favorite_changes(user_id, [movie.id], -1)
+            raise ProblemFetchingInfo("There was a problem fetching movie info")
+
+        SQLiteDataManager._apply_movie_info(movie, movie_info_from_api)
+
+    def _record_favorite_changes(self, user_id, movie_ids, sign):
+        """
+        Update the recommendation index of the synchronous data manager, if there is one.
+        """
+        if self.data_manager is not None:
+            self.data_manager._record_favorite_changes(user_id, movie_ids, sign)
+
+    @staticmethod
+    async def _link_movie_to_user(session, user_id, movie_id):
+        """
+        Add a movie to a user's favorites and count it in the movie's favorite_count.
+        Returns False if the movie was already linked, e.g. by a concurrent request.
+        """
+        upsert_insert = UPSERT_INSERTS.get(session.bind.dialect.name)
+        if upsert_insert is not None:
+            statement = upsert_insert(user_movie_association).on_conflict_do_nothing(
+                index_elements=["user_id", "movie_id"])
+        else:
+            statement = insert(user_movie_association)
+        result = await session.execute(statement.values(user_id=user_id, movie_id=movie_id))
+        if result.rowcount == 0:
+            return False
+        await session.execute(
+            update(Movie)
+            .where(Movie.id == movie_id)
+            .values(favorite_count=Movie.favorite_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return True
+
+    @staticmethod
+    async def _bump_data_version(session):
+        """
+        Increment the data version in the session's transaction.
+        """
+        updated = await session.execute(
+            update(DataVersion)
+            .where(DataVersion.name == DATA_VERSION_NAME)
+            .values(version=DataVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount == 0:
+            session.add(DataVersion(name=DATA_VERSION_NAME, version=1))
+
+    async def dispose(self):
+        await self.engine.dispose()
@@ -6,7 +6,7 @@ class DataManagerInterface(ABC):
     @abstractmethod
     def get_all_users(self):
         """ Input: This method takes no arguments
-         Output: returns a list of dictionaries representing users"""
+         Output: returns a list of users, each with an id and a name"""
         pass
 
     @abstractmethod
@@ -0,0 +1,72 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichmentQueue:
+    """
+    Background workers that fetch the info of pending movies from the API,
+    so adding a movie doesn't wait for the API.
+
+    The pending movies themselves are the durable part of the queue: they are
+    queued again by start() when the application restarts, along with the movies
+    whose info couldn't be fetched before.
+    """
+
+    def __init__(self, app, enrich, workers=2, max_attempts=3, retry_delay=5):
+        """
+        Args:
+            app (Flask): The application, its context is pushed around every attempt.
+            enrich (callable): Called as enrich(movie_id, final_attempt). Returns True once
+                the movie is done with, False if the attempt should be retried.
+            workers (int): The number of worker threads.
+            max_attempts (int): The number of attempts per movie.
+            retry_delay (float): Seconds to wait before the first retry, doubled after every retry.
+        """
+        self.app = app
+        self.enrich = enrich
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue()
+
+    def start(self, pending_ids=()):
+        """
+        Queue the movies left pending or failed by a previous run and start the worker threads.
+        """
+        for movie_id in pending_ids:
+            self._queue.put(movie_id)
+        for _ in range(self.workers):
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def enqueue(self, movie_id):
+        self._queue.put(movie_id)
+
+    def join(self):
+        """
+        Wait until every queued movie has been processed.
+        """
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            movie_id = self._queue.get()
+            try:
+                self._process(movie_id)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, movie_id):
+        for attempt in range(1, self.max_attempts + 1):
+            final_attempt = attempt == self.max_attempts
+            with self.app.app_context():
+                try:
+                    if self.enrich(movie_id, final_attempt):
+                        return
+                except Exception:
+                    logger.exception("Enriching movie %s failed", movie_id)
+            if not final_attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
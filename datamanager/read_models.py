@@ -0,0 +1,30 @@
+"""
+Read-only rows returned by the list methods of the data manager.
+
+They are filled from queries selecting only the columns the pages show, so listing
+rows doesn't load whole ORM entities into the session's identity map, nor columns
+like the users' password hashes. Being named tuples, they are compact, immutable,
+and their fields are read as attributes in templates.
+"""
+from typing import NamedTuple, Optional
+
+
+class UserSummary(NamedTuple):
+    id: int
+    name: str
+
+
+class MovieSummary(NamedTuple):
+    id: int
+    title: str
+    director: Optional[str]
+    year: Optional[int]
+    rating: Optional[float]
+    poster: Optional[str]
+    status: str
+
+
+class ReviewSummary(NamedTuple):
+    user_name: str
+    rating: float
+    review_text: Optional[str]
@@ -0,0 +1,43 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """
+    A background thread running a maintenance job every interval seconds,
+    so requests never wait for it nor take the write locks it needs.
+    """
+
+    def __init__(self, app, job, interval, name="periodic-job"):
+        """
+        Args:
+            app (Flask): The application, its context is pushed around every run.
+            job (callable): Called without arguments.
+            interval (float): Seconds between the start of a run and the next one.
+            name (str): The name of the thread, also used in the logs.
+        """
+        self.app = app
+        self.job = job
+        self.interval = interval
+        self.name = name
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Run the job right away, then every interval seconds.
+        """
+        threading.Thread(target=self._run, name=self.name, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self.app.app_context():
+                try:
+                    self.job()
+                except Exception:
+                    logger.exception("The %s job failed", self.name)
+            self._stopped.wait(self.interval)
@@ -1,12 +1,78 @@
 from flask_sqlalchemy import SQLAlchemy
+import multiprocessing
 import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 from .data_manager_interface import DataManagerInterface
-from helpers.api_helpers import MovieAPI
+from .user_data_manager import User as LoginUser
+from helpers.cache import TTLCache
+from helpers.recommender import ItemSimilarityIndex
+from helpers.password_hasher import PasswordHasher
+from .enrichment import EnrichmentQueue
+from .scheduler import PeriodicJob
+from .read_models import MovieSummary, ReviewSummary, UserSummary
+from helpers.api_helpers import MovieAPI, MovieAPIUnavailable
+from helpers.text_helpers import normalize_title, fts_match_query
+from helpers.sqlite_profile import apply_sqlite_pragmas
+from helpers.migrations import apply_migrations
+from helpers.replica_routing import mark_written, replica_read
+from helpers.metrics import bind_stats
 from helpers.sql_models import *
-import bcrypt
+from sqlalchemy import and_, case, delete, exists, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+import numpy as np
 
 movie_api = MovieAPI
 
+# Page sizes for the keyset-paginated list methods
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Number of rows fetched from the cursor at a time when streaming
+STREAM_BATCH_SIZE = 500
+# Maximum number of values bound in a single IN (...) clause
+IN_CLAUSE_CHUNK_SIZE = 500
+# Number of favorites read from the cursor at a time when building the recommendation index
+RECOMMENDER_BATCH_SIZE = 50000
+# Favorites rated below this don't count as liked by the recommendations
+LIKE_THRESHOLD = 5
+# PostgreSQL advisory lock taken while refreshing the trending movies
+TRENDING_REFRESH_LOCK_KEY = 7210001
+
+# Range of the review ratings, also enforced by the review table's CHECK constraint
+MIN_RATING = 1
+MAX_RATING = 10
+
+# Returned by the API lookups of import_movies when the API couldn't be reached
+LOOKUP_FAILED = object()
+
+# INSERT statements supporting ON CONFLICT clauses, by dialect name
+UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Full-text searches, every word of the query must match as a whole word or a word prefix.
+# They use SQLite's FTS5 tables, created by the migrations, and only run on SQLite.
+SEARCH_DIALECTS = ("sqlite",)
+SEARCH_MOVIES_SQL = text(
+    "SELECT movie.id, movie.title, movie.director, movie.year, movie.status "
+    "FROM movie_fts JOIN movie ON movie.id = movie_fts.rowid "
+    "WHERE movie_fts MATCH :match "
+    # Matches in the title weigh more than matches in the director
+    "ORDER BY bm25(movie_fts, 10.0, 1.0), movie.id "
+    "LIMIT :limit OFFSET :offset"
+)
+SEARCH_REVIEWS_SQL = text(
+    "SELECT review.id, review.movie_id, movie.title, \"user\".name, review.rating, review.review_text "
+    "FROM review_fts "
+    "JOIN review ON review.id = review_fts.rowid "
+    "JOIN movie ON movie.id = review.movie_id "
+    "JOIN \"user\" ON \"user\".id = review.user_id "
+    "WHERE review_fts MATCH :match "
+    "ORDER BY bm25(review_fts), review.id "
+    "LIMIT :limit OFFSET :offset"
+)
+
 
 # Define our custom Exceptions
 class UserNotFoundError(Exception):
@@ -33,27 +99,366 @@ class MovieNotFound(Exception):
     pass
 
 
+class SearchUnavailable(Exception):
+    pass
+
+
+class InvalidRating(Exception):
+    pass
+
+
 class SQLiteDataManager(DataManagerInterface):
     def __init__(self, app):
         db.init_app(app)
+        with app.app_context():
+            # The primary and the read replicas
+            for engine in db.engines.values():
+                apply_sqlite_pragmas(engine, app.config.get("SQLITE_PRAGMAS"))
+            # Bring the database up to date like db_init.py does, before anything queries it.
+            # Both steps do nothing on an up-to-date database. Not in the password hashing processes.
+            if app.config.get("MIGRATE_ON_STARTUP") and multiprocessing.parent_process() is None:
+                # The primary only, the replicas get its changes from it
+                db.create_all(bind_key=None)
+                apply_migrations(db.engine)
+        # Cache of the flask_login users, a TTL of 0 disables it
+        self.user_cache = TTLCache(
+            maxsize=app.config.get("USER_CACHE_SIZE", 1024),
+            ttl=app.config.get("USER_CACHE_TTL", 300)
+        )
+        # bcrypt runs on a pool of worker processes, hashes with another work factor are redone on login
+        self.password_hasher = PasswordHasher(
+            rounds=app.config.get("PASSWORD_HASH_ROUNDS", 12),
+            workers=app.config.get("PASSWORD_HASH_WORKERS", 2)
+        )
+        # Number of concurrent API requests when importing movies in bulk
+        self.import_max_workers = app.config.get("IMPORT_MAX_WORKERS", 8)
+
+        # Sliding window of the trending movies, their table is refreshed by a background
+        # job every TRENDING_REFRESH_SECONDS (0 disables it), never by the requests reading it
+        self.trending_window = timedelta(days=app.config.get("TRENDING_WINDOW_DAYS", 7))
+        self._trending_lock = threading.Lock()
+        self.trending_job = None
+        # Not in the password hashing processes, which import the main script again when it is app.py
+        if app.config.get("TRENDING_REFRESH_SECONDS", 300) > 0 and multiprocessing.parent_process() is None:
+            self.trending_job = PeriodicJob(app, self.refresh_trending_movies,
+                                            app.config.get("TRENDING_REFRESH_SECONDS", 300), name="trending-refresh")
+            self.trending_job.start()
+
+        # "Users who liked this also liked" index, built on first use and rebuilt
+        # from scratch every RECOMMENDER_REBUILD_SECONDS, updated incrementally in between
+        self.recommender = ItemSimilarityIndex(top_k=app.config.get("RECOMMENDER_TOP_K", 20))
+        self.recommender_rebuild_interval = app.config.get("RECOMMENDER_REBUILD_SECONDS", 3600)
+        self._recommender_built_at = None
+        self._recommender_lock = threading.Lock()
+
+        # With async enrichment, add_movie saves the movie as pending and its info
+        # is fetched from the API by background workers
+        self.enrichment_queue = None
+        # Not in the password hashing processes, which import the main script again when it is app.py
+        if app.config.get("ASYNC_ENRICHMENT") and multiprocessing.parent_process() is None:
+            self.enrichment_queue = EnrichmentQueue(
+                app,
+                self.enrich_movie,
+                workers=app.config.get("ENRICHMENT_WORKERS", 2),
+                max_attempts=app.config.get("ENRICHMENT_MAX_ATTEMPTS", 3),
+                retry_delay=app.config.get("ENRICHMENT_RETRY_DELAY", 5)
+            )
+            # Movies whose info couldn't be fetched in a previous run are tried again too
+            with app.app_context():
+                pending_ids = [movie_id for movie_id, in db.session.query(Movie.id)
+                               .filter(Movie.status.in_([MOVIE_PENDING, MOVIE_FAILED]))]
+            self.enrichment_queue.start(pending_ids)
 
+    @replica_read
     def get_all_users(self):
         """
         Retrieves all users from the SQL.
-        """
-        users = db.session.query(User).all()
 
-        # Return the list of User objects
-        return users
+        Returns:
+            list[UserSummary]: The ID and name of every user, without the password hashes.
+        """
+        rows = db.session.execute(select(User.id, User.name).order_by(User.id))
+        return list(map(UserSummary._make, rows))
 
+    @replica_read
     def get_all_movies(self):
         """
         Retrieves all movies from the SQL.
+
+        Returns:
+            list[MovieSummary]: The details of every movie.
+        """
+        rows = db.session.execute(
+            select(Movie.id, Movie.title, Movie.director, Movie.year, Movie.rating, Movie.poster, Movie.status)
+            .order_by(Movie.id)
+        )
+        return list(map(MovieSummary._make, rows))
+
+    @replica_read
+    def get_users_page(self, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve one page of users ordered by ID.
+
+        Args:
+            after (int): Only return users with an ID greater than this cursor.
+            limit (int): The maximum number of users to return.
+
+        Returns:
+            tuple: A list of user dictionaries and the cursor of the next page (None on the last page).
+        """
+        query = db.session.query(User.id, User.name)
+        return self._keyset_page(query, User.id, self._user_row_to_dict, after, limit)
+
+    @replica_read
+    def iter_users(self, after=None):
+        """
+        Stream all users ordered by ID, fetching them from the cursor in batches.
+
+        Args:
+            after (int): Only return users with an ID greater than this cursor.
+
+        Returns:
+            generator: User dictionaries.
+        """
+        query = db.session.query(User.id, User.name)
+        return self._stream_rows(query, User.id, self._user_row_to_dict, after)
+
+    @replica_read
+    def get_movies_page(self, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve one page of movies ordered by ID.
+
+        Args:
+            after (int): Only return movies with an ID greater than this cursor.
+            limit (int): The maximum number of movies to return.
+
+        Returns:
+            tuple: A list of movie dictionaries and the cursor of the next page (None on the last page).
+        """
+        query = db.session.query(Movie.id, Movie.title, Movie.status)
+        return self._keyset_page(query, Movie.id, self._movie_row_to_dict, after, limit)
+
+    @replica_read
+    def iter_movies(self, after=None):
+        """
+        Stream all movies ordered by ID, fetching them from the cursor in batches.
+
+        Args:
+            after (int): Only return movies with an ID greater than this cursor.
+
+        Returns:
+            generator: Movie dictionaries.
+        """
+        query = db.session.query(Movie.id, Movie.title, Movie.status)
+        return self._stream_rows(query, Movie.id, self._movie_row_to_dict, after)
+
+    @replica_read
+    def get_movie_reviews_page(self, movie_id, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve one page of reviews for a specific movie ordered by review ID.
+
+        Args:
+            movie_id (int): The ID of the movie.
+            after (int): Only return reviews with an ID greater than this cursor.
+            limit (int): The maximum number of reviews to return.
+
+        Returns:
+            tuple: A list of review dictionaries and the cursor of the next page (None on the last page).
+
+        Raises:
+            MovieNotFound: If no movie is associated with the movie ID.
+        """
+        query = self._movie_reviews_query(movie_id)
+        return self._keyset_page(query, Review.id, self._review_row_to_dict, after, limit)
+
+    @replica_read
+    def iter_movie_reviews(self, movie_id, after=None):
+        """
+        Stream all reviews for a specific movie ordered by review ID.
+
+        Args:
+            movie_id (int): The ID of the movie.
+            after (int): Only return reviews with an ID greater than this cursor.
+
+        Returns:
+            generator: Review dictionaries.
+
+        Raises:
+            MovieNotFound: If no movie is associated with the movie ID.
+        """
+        query = self._movie_reviews_query(movie_id)
+        return self._stream_rows(query, Review.id, self._review_row_to_dict, after)
+
+    def _movie_reviews_query(self, movie_id):
+        """
+        Build the query selecting a movie's reviews with their authors' names.
+        Raises MovieNotFound if the movie doesn't exist.
+        """
+        if db.session.query(Movie.id).filter_by(id=movie_id).first() is None:
+            raise MovieNotFound(f"Movie ID {movie_id} does not exist")
+
+        return (
+            db.session.query(Review.id, User.name, Review.rating, Review.review_text)
+            .join(User, User.id == Review.user_id)
+            .filter(Review.movie_id == movie_id)
+        )
+
+    @staticmethod
+    def _keyset_page(query, key_column, row_to_dict, after, limit):
+        """
+        Return one page of the query ordered by key_column, starting after the given cursor.
+        One extra row is fetched to know whether another page follows.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        if after is not None:
+            query = query.filter(key_column > after)
+        rows = query.order_by(key_column).limit(limit + 1).all()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [row_to_dict(row) for row in rows[:limit]], next_cursor
+
+    @staticmethod
+    def _stream_rows(query, key_column, row_to_dict, after):
+        """
+        Yield every row of the query ordered by key_column, starting after the given cursor.
+        Rows are pulled from the cursor in batches so memory use doesn't grow with the table.
+        """
+        if after is not None:
+            query = query.filter(key_column > after)
+        for row in query.order_by(key_column).yield_per(STREAM_BATCH_SIZE):
+            yield row_to_dict(row)
+
+    @staticmethod
+    def _user_row_to_dict(row):
+        return {"username": row.name, "id": row.id}
+
+    @staticmethod
+    def _movie_row_to_dict(row):
+        return {"title": row.title, "id": row.id, "status": row.status}
+
+    @staticmethod
+    def _review_row_to_dict(row):
+        return {
+            'user_name': row.name,
+            'rating': row.rating,
+            'review_text': row.review_text
+        }
+
+    def search_movies(self, query, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Full-text search of movies by title and director, best matches first.
+        Every word of the query must match, as a whole word or as a word prefix.
+
+        Args:
+            query (str): The search query.
+            offset (int): The number of results to skip.
+            limit (int): The maximum number of results to return.
+
+        Returns:
+            tuple: A list of movie dictionaries and the offset of the next page (None on the last page).
+
+        Raises:
+            SearchUnavailable: If the database isn't SQLite, whose full-text indexes the search uses.
+        """
+        return self._search(SEARCH_MOVIES_SQL, query, offset, limit, self._movie_search_row_to_dict)
+
+    def search_reviews(self, query, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Full-text search of review texts, best matches first.
+        Every word of the query must match, as a whole word or as a word prefix.
+
+        Args:
+            query (str): The search query.
+            offset (int): The number of results to skip.
+            limit (int): The maximum number of results to return.
+
+        Returns:
+            tuple: A list of review dictionaries and the offset of the next page (None on the last page).
+
+        Raises:
+            SearchUnavailable: If the database isn't SQLite, whose full-text indexes the search uses.
+        """
+        return self._search(SEARCH_REVIEWS_SQL, query, offset, limit, self._review_search_row_to_dict)
+
+    @staticmethod
+    def _movie_search_row_to_dict(row):
+        return {
+            "id": row.id,
+            "title": row.title,
+            "director": row.director,
+            "year": row.year,
+            "status": row.status
+        }
+
+    @staticmethod
+    def _review_search_row_to_dict(row):
+        return {
+            "id": row.id,
+            "movie_id": row.movie_id,
+            "movie_title": row.title,
+            "user_name": row.name,
+            "rating": row.rating,
+            "review_text": row.review_text
+        }
+
+    @staticmethod
+    def _search(statement, query, offset, limit, row_to_dict):
+        """
+        Run a full-text search statement for one page of results.
+        One extra row is fetched to know whether another page follows.
+        """
+        dialect = db.session.get_bind().dialect.name
+        if dialect not in SEARCH_DIALECTS:
+            raise SearchUnavailable(f"Full-text search isn't available on {dialect} databases")
+
+        match = fts_match_query(query)
+        if match is None:
+            return [], None
+
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+        rows = db.session.execute(statement, {"match": match, "limit": limit + 1, "offset": offset}).all()
+
+        next_offset = offset + limit if len(rows) > limit else None
+        return [row_to_dict(row) for row in rows[:limit]], next_offset
+
+    @replica_read
+    def get_data_version(self):
+        """
+        Retrieve the data version, which changes with every write to the users, movies or reviews.
+        It is read from the same database as the other reads, so it matches the data they see.
+        """
+        return db.session.query(DataVersion.version).filter_by(name=DATA_VERSION_NAME).scalar() or 0
+
+    @replica_read
+    def get_data_version_info(self):
+        """
+        Retrieve the data version and when it last changed, in a single query.
+
+        Returns:
+            tuple: The version, and the naive UTC datetime of its last change (None if unknown).
         """
-        movies = db.session.query(Movie).all()
+        row = (
+            db.session.query(DataVersion.version, DataVersion.updated_at)
+            .filter_by(name=DATA_VERSION_NAME)
+            .first()
+        )
+        return (row.version, row.updated_at) if row is not None else (0, None)
 
-        # Return the list of Movie objects
-        return movies
+    @staticmethod
+    def _bump_data_version():
+        """
+        Increase the data version in the caller's transaction, so responses cached
+        before the write are no longer used.
+        """
+        updated = db.session.execute(
+            update(DataVersion)
+            .where(DataVersion.name == DATA_VERSION_NAME)
+            .values(version=DataVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount == 0:
+            db.session.add(DataVersion(name=DATA_VERSION_NAME, version=1))
 
     def get_username_by_id(self, user_id):
         """
@@ -78,6 +483,7 @@ class SQLiteDataManager(DataManagerInterface):
 
         return user.name
 
+    @replica_read
     def get_userinfo_by_id(self, user_id):
         """
         Retrieve the userinfo associated with a specific user ID.
@@ -89,8 +495,8 @@ class SQLiteDataManager(DataManagerInterface):
             dict: The user info associated with the user ID.
         """
 
-        # Query the User model by ID
-        user = db.session.query(User).filter_by(id=user_id).first()
+        # Look the user up by primary key
+        user = db.session.get(User, user_id)
 
         # Check if the user was found
         if not user:
@@ -105,6 +511,35 @@ class SQLiteDataManager(DataManagerInterface):
 
         return user_info
 
+    def get_login_user(self, user_id):
+        """
+        Retrieve the flask_login user object for a user ID, from the user cache when possible.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            LoginUser: The user object, or None if no user is associated with the user ID.
+        """
+        user = self.user_cache.get(str(user_id))
+        if user is not None:
+            return user
+
+        user_data = self.get_userinfo_by_id(user_id)
+        if not user_data:
+            return None
+
+        user = LoginUser(user_id, user_data)
+        self.user_cache.set(str(user_id), user)
+        return user
+
+    def invalidate_user(self, user_id):
+        """
+        Drop a user from the user cache. Must be called whenever a user's data changes.
+        """
+        self.user_cache.invalidate(str(user_id))
+
+    @replica_read
     def get_user_movies(self, user_id):
         """
         Retrieve the movies associated with a specific user ID.
@@ -119,29 +554,81 @@ class SQLiteDataManager(DataManagerInterface):
             UserNotFoundError: If no user is associated with the user ID.
         """
 
-        # Query the User model by ID
-        user = db.session.query(User).filter_by(id=user_id).first()
-
-        if not user:
+        rows = db.session.execute(self._user_movies_statement(user_id)).all()
+        if not rows:
             raise UserNotFoundError(f"User ID {user_id} does not exist")
 
+        return self._user_movies_to_dict(rows)
+
+    @staticmethod
+    def _user_movies_statement(user_id):
+        # The user, their movies and their own reviews in a single query,
+        # with only the movie columns the page shows instead of whole Movie objects
+        return (
+            select(User.id, Movie.id.label("movie_id"), Movie.title, Movie.director, Movie.year,
+                   Movie.rating, Movie.poster, Movie.status,
+                   Review.review_text, Review.rating.label("my_rating"))
+            .select_from(User)
+            .outerjoin(user_movie_association, user_movie_association.c.user_id == User.id)
+            .outerjoin(Movie, Movie.id == user_movie_association.c.movie_id)
+            .outerjoin(Review, and_(Review.movie_id == Movie.id, Review.user_id == User.id))
+            .where(User.id == user_id)
+        )
+
+    @staticmethod
+    def _user_movies_to_dict(rows):
         movies_dict = {}
-        for movie in user.favorite_movies:
-            user_movie_review = self.get_user_review_for_movie(user_id, movie.id)
-            review_text = user_movie_review.review_text if user_movie_review else None
-            my_rating = user_movie_review.rating if user_movie_review else None
-            movies_dict[movie.id] = {
-                "name": movie.title,
-                "director": movie.director,
-                "year": movie.year,
-                "rating": movie.rating,
-                "poster": movie.poster,
-                "review": review_text,
-                "my_rating": my_rating
+        for row in rows:
+            # A user without movies comes back as a single row with no movie
+            if row.movie_id is None or row.movie_id in movies_dict:
+                continue
+            movies_dict[row.movie_id] = {
+                "name": row.title,
+                "director": row.director,
+                "year": row.year,
+                "rating": row.rating,
+                "poster": row.poster,
+                "status": row.status,
+                "review": row.review_text,
+                "my_rating": row.my_rating
             }
-
         return movies_dict
 
+    def get_movie(self, movie_id):
+        """
+        Retrieve a movie's details by movie ID.
+
+        Args:
+            movie_id (int): The ID of the movie.
+
+        Returns:
+            dict: Movie details, including whether its info is still being fetched.
+
+        Raises:
+            MovieNotFound: If no movie is associated with the movie ID.
+        """
+        movie = db.session.get(Movie, movie_id)
+
+        if not movie:
+            raise MovieNotFound(f"Movie ID {movie_id} does not exist")
+
+        return self._movie_details(movie)
+
+    @staticmethod
+    def _movie_details(movie):
+        return {
+            "id": movie.id,
+            "name": movie.title,
+            "director": movie.director,
+            "year": movie.year,
+            "rating": movie.rating,
+            "poster": movie.poster,
+            "status": movie.status,
+            "avg_user_rating": movie.avg_user_rating,
+            "review_count": movie.review_count,
+            "favorite_count": movie.favorite_count
+        }
+
     def get_movie_by_id(self, user_id, movie_id):
         """
         Retrieve movie info by movie ID for a specific user.
@@ -158,21 +645,7 @@ class SQLiteDataManager(DataManagerInterface):
             MovieNotFound: If no movie is associated with the movie ID.
         """
 
-        user = db.session.query(User).filter_by(id=user_id).first()
-
-        if not user:
-            raise UserNotFoundError(f"User ID {user_id} does not exist")
-
-        matching_movie = None
-        for movie in user.favorite_movies:
-            if movie.id == int(movie_id):
-                matching_movie = movie
-                break
-
-        if not matching_movie:
-            raise MovieNotFound(f"Movie ID {movie_id} does not exist for user {user_id}")
-
-        user_movie_review = self.get_user_review_for_movie(user_id, movie_id)
+        movie, user_movie_review = self._get_user_movie(user_id, movie_id)
         review_text = user_movie_review.review_text if user_movie_review else None
         my_rating = user_movie_review.rating if user_movie_review else None
 
@@ -184,27 +657,102 @@ class SQLiteDataManager(DataManagerInterface):
             "year": movie.year,
             "rating": movie.rating,
             "poster": movie.poster,
+            "status": movie.status,
             "review": review_text,
             "my_rating": my_rating
         }
 
         return movie_info
 
+    def _get_user_movie(self, user_id, movie_id):
+        """
+        Retrieve a movie from a user's favorites, along with the user's review of it,
+        checking the user, the movie and the link between them in a single query.
+
+        Args:
+            user_id (int): The ID of the user.
+            movie_id (int): The ID of the movie.
+
+        Returns:
+            tuple: The Movie object and the user's Review object (None if there is no review).
+
+        Raises:
+            UserNotFoundError: If no user is associated with the user ID.
+            MovieNotFound: If the movie doesn't exist or isn't in the user's favorites.
+        """
+        # Single-row lookup on the association table's primary key
+        is_favorite = exists().where(
+            user_movie_association.c.user_id == User.id,
+            user_movie_association.c.movie_id == Movie.id
+        )
+        row = (
+            db.session.query(User.id, Movie, Review, is_favorite.label("is_favorite"))
+            .select_from(User)
+            .outerjoin(Movie, Movie.id == movie_id)
+            .outerjoin(Review, and_(Review.user_id == User.id, Review.movie_id == Movie.id))
+            .filter(User.id == user_id)
+            .first()
+        )
+
+        if row is None:
+            raise UserNotFoundError(f"User ID {user_id} does not exist")
+
+        if row.Movie is None or not row.is_favorite:
+            raise MovieNotFound(f"Movie ID {movie_id} does not exist for User ID {user_id}")
+
+        return row.Movie, row.Review
+
     @staticmethod
-    def create_user_password(password, confirm_password):
+    def _upsert_insert(table):
+        """
+        Return an INSERT statement of the table supporting ON CONFLICT clauses,
+        or None if the database doesn't have one.
+        """
+        upsert_insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+        return upsert_insert(table) if upsert_insert is not None else None
+
+    @staticmethod
+    def _link_movie_to_user(user_id, movie_id):
+        """
+        Add a movie to a user's favorites without loading the favorites collection,
+        and count the new favorite in the movie's favorite_count.
+        Returns False if the movie was already linked, e.g. by a concurrent request.
+        """
+        statement = SQLiteDataManager._upsert_insert(user_movie_association)
+        if statement is not None:
+            statement = statement.on_conflict_do_nothing(index_elements=["user_id", "movie_id"])
+        else:
+            statement = user_movie_association.insert()
+        result = db.session.execute(statement.values(user_id=user_id, movie_id=movie_id))
+        if result.rowcount == 0:
+            return False
+        SQLiteDataManager._update_favorite_counts([movie_id], 1)
+        return True
+
+    @staticmethod
+    def _update_favorite_counts(movie_ids, delta):
+        """
+        Add delta to the favorite_count of the given movies, in the caller's transaction.
+        """
+        for i in range(0, len(movie_ids), IN_CLAUSE_CHUNK_SIZE):
+            db.session.execute(
+                update(Movie)
+                .where(Movie.id.in_(movie_ids[i:i + IN_CLAUSE_CHUNK_SIZE]))
+                .values(favorite_count=Movie.favorite_count + delta)
+                .execution_options(synchronize_session=False)
+            )
+
+    def create_user_password(self, password, confirm_password):
         """
         Checking that password is at least 8 characters and same as confirm_password
          Then hashing the password.
          return the hashed password
         """
-        salt = bcrypt.gensalt()
         if password != confirm_password:
             raise TypeError("passwords don't match!")
         if len(password) < 8:
             raise WrongPassword("Password needs to be at least 8 characters")
-        password = password.encode("utf-8")
-        hashed_password = bcrypt.hashpw(password, salt).decode("utf-8")
-        return hashed_password
+        return self.password_hasher.hash(password)
 
     def add_user(self, user_name, password, confirm_password):
         """
@@ -216,37 +764,53 @@ class SQLiteDataManager(DataManagerInterface):
             confirm_password (str): Confirmation of password
 
         Returns:
-            users_data (dict): All user data after the addition of the new user.
+            int: The ID of the new user.
 
         Raises:
             UserAlreadyExists: If the username already exists.
         """
-        users_data = self.get_all_users()
-
-        # Check if the username already exists in users_data
-        for user in users_data:
-            if user.name == user_name:
-                raise UserAlreadyExists("Username already exists. Please choose a different username.")
+        # Check if the username already exists before hashing, on the primary since replicas may lag behind
+        if db.session.query(User.id).filter_by(name=user_name).first() is not None:
+            raise UserAlreadyExists("Username already exists. Please choose a different username.")
 
         hashed_pass = self.create_user_password(password, confirm_password)
 
         new_user_info = User(name=user_name, password=hashed_pass)
         db.session.add(new_user_info)
-        db.session.commit()
-
-        return users_data
-
-    @staticmethod
-    def authenticate_user(user_pass, hashed_pass):
+        self._bump_data_version()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # The unique name constraint, when the same name was added concurrently
+            db.session.rollback()
+            raise UserAlreadyExists("Username already exists. Please choose a different username.")
+        mark_written()
+        self.invalidate_user(new_user_info.id)
+
+        return new_user_info.id
+
+    def authenticate_user(self, user_pass, hashed_pass, user_id=None):
         """
         Checks that the password the user entered on the website
-        matches the password that is stored in the json file
+        matches the password that is stored in the database.
+        If it does and the user_id is given, a hash made with an outdated
+        work factor is replaced with a new one.
         """
-        if bcrypt.checkpw(user_pass.encode("utf-8"), hashed_pass.encode("utf-8")):
-            return
-        else:
+        if not self.password_hasher.verify(user_pass, hashed_pass):
             raise WrongPassword
 
+        if user_id is not None and self.password_hasher.needs_rehash(hashed_pass):
+            new_hash = self.password_hasher.hash(user_pass)
+            # Only replace the hash that was checked, in case the password changed meanwhile
+            db.session.execute(
+                update(User)
+                .where(User.id == user_id, User.password == hashed_pass)
+                .values(password=new_hash)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            self.invalidate_user(user_id)
+
     def get_user_review_for_movie(self, user_id, movie_id):
         return Review.query.filter_by(user_id=user_id, movie_id=movie_id).first()
 
@@ -267,20 +831,51 @@ class SQLiteDataManager(DataManagerInterface):
             ProblemFetchingInfo: If there is a problem fetching movie info from the API.
         """
 
-        # Query the User model by ID
-        user = db.session.query(User).filter_by(id=user_id).first()
+        # Check the user, look for the movie in the Movie table by its normalized title
+        # and whether the user already has it, all in one query
+        is_favorite = exists().where(
+            user_movie_association.c.user_id == User.id,
+            user_movie_association.c.movie_id == Movie.id
+        )
+        row = (
+            db.session.query(User.id, Movie, is_favorite.label("is_favorite"))
+            .select_from(User)
+            .outerjoin(Movie, Movie.normalized_title == normalize_title(title))
+            .filter(User.id == user_id)
+            .first()
+        )
 
-        if not user:
+        if row is None:
             raise UserNotFoundError(f"User ID {user_id} does not exist")
 
-        # Check if the movie already exists in the Movie table
-        existing_movie = db.session.query(Movie).filter_by(title=title).first()
-
-        if existing_movie:
+        if row.Movie is not None:
+            retried = row.Movie.status == MOVIE_FAILED
+            if retried:
+                # Its info couldn't be fetched before, try again rather than linking a failed movie
+                self._retry_failed_movie(row.Movie)
             # If the movie already exists, just link it to the user (if not already linked)
-            if existing_movie not in user.favorite_movies:
-                user.favorite_movies.append(existing_movie)
+            linked = not row.is_favorite and self._link_movie_to_user(row.id, row.Movie.id)
+            if linked or retried:
+                self._bump_data_version()
                 db.session.commit()
+                mark_written()
+            if linked:
+                self._record_favorite_changes(row.id, [row.Movie.id], 1)
+            if retried and self.enrichment_queue is not None:
+                self.enrichment_queue.enqueue(row.Movie.id)
+            return
+
+        if self.enrichment_queue is not None:
+            # Save the movie right away, its info is fetched in the background
+            new_movie = Movie(title=title, status=MOVIE_PENDING)
+            db.session.add(new_movie)
+            db.session.flush()
+            self._link_movie_to_user(row.id, new_movie.id)
+            self._bump_data_version()
+            db.session.commit()
+            mark_written()
+            self._record_favorite_changes(row.id, [new_movie.id], 1)
+            self.enrichment_queue.enqueue(new_movie.id)
             return
 
         # If the movie does not exist, fetch its info from the API and add it
@@ -290,58 +885,610 @@ class SQLiteDataManager(DataManagerInterface):
             raise ProblemFetchingInfo("There was a problem fetching movie info")
 
         # Create a new movie object
-        new_movie = Movie(
-            title=title,
-            director=movie_info_from_api.get("director", ""),
-            year=movie_info_from_api.get("year"),
-            rating=movie_info_from_api.get("rating"),
-            poster=movie_info_from_api.get("poster", ""),
-        )
+        new_movie = Movie(title=title)
+        self._apply_movie_info(new_movie, movie_info_from_api)
 
-        # Add movie to the session and commit
+        # Add the movie and associate it with the user as a favorite in one transaction
         db.session.add(new_movie)
+        db.session.flush()
+        self._link_movie_to_user(row.id, new_movie.id)
+        self._bump_data_version()
         db.session.commit()
+        mark_written()
+        self._record_favorite_changes(row.id, [new_movie.id], 1)
+
+    def _retry_failed_movie(self, movie):
+        """
+        Give a movie whose info couldn't be fetched another chance, before add_movie links it.
+        With async enrichment it becomes pending again, otherwise its info is fetched right away.
+
+        Raises:
+            ProblemFetchingInfo: If the info still can't be fetched, or the API doesn't know the movie.
+        """
+        if self.enrichment_queue is not None:
+            movie.status = MOVIE_PENDING
+            return
+
+        try:
+            movie_info_from_api = MovieAPI.lookup_movie_info(movie.title)
+        except MovieAPIUnavailable:
+            raise ProblemFetchingInfo("There was a problem fetching movie info")
+
+        if movie_info_from_api is None:
+            user_ids = self._discard_unknown_movie(movie)
+            self._bump_data_version()
+            db.session.commit()
+            mark_written()
+            for user_id in user_ids:
+                self._record_favorite_changes(user_id, [movie.id], -1)
+            raise ProblemFetchingInfo("There was a problem fetching movie info")
 
-        # Associate the movie with the user as a favorite
-        user.favorite_movies.append(new_movie)
+        self._apply_movie_info(movie, movie_info_from_api)
+
+    def enrich_movie(self, movie_id, final_attempt=False):
+        """
+        Fetch the info of a pending (or previously failed) movie from the API and save it.
+        A movie the API doesn't know is deleted, with its reviews and its links to favorites.
+
+        Args:
+            movie_id (int): The ID of the movie.
+            final_attempt (bool): Mark the movie as failed if the API can't be reached.
+
+        Returns:
+            bool: True if the movie is done with, False if its info couldn't be fetched and should be retried.
+        """
+        movie = db.session.get(Movie, movie_id)
+        if movie is None or movie.status not in (MOVIE_PENDING, MOVIE_FAILED):
+            return True
+
+        try:
+            movie_info_from_api = MovieAPI.lookup_movie_info(movie.title)
+        except MovieAPIUnavailable:
+            if not final_attempt:
+                return False
+            # Tried again on the next start, or when the title is added again
+            movie.status = MOVIE_FAILED
+            self._bump_data_version()
+            db.session.commit()
+            return True
+
+        user_ids = []
+        if movie_info_from_api is None:
+            user_ids = self._discard_unknown_movie(movie)
+        else:
+            self._apply_movie_info(movie, movie_info_from_api)
+
+        self._bump_data_version()
         db.session.commit()
+        for user_id in user_ids:
+            self._record_favorite_changes(user_id, [movie_id], -1)
+        return True
 
-    def add_review(self, user_id, movie_id, review_text, rating):
-        # Query for the specific user
-        user = db.session.query(User).filter_by(id=user_id).first()
-        if not user:
+    @staticmethod
+    def _discard_unknown_movie(movie):
+        """
+        Delete a movie the API doesn't know, with its reviews and its links to the users' favorites.
+        Returns the IDs of the users who had it, to update the recommendation index after the commit.
+        """
+        user_ids = db.session.execute(SQLiteDataManager._movie_fans_statement(movie.id)).scalars().all()
+        for statement in SQLiteDataManager._discard_movie_statements(movie.id):
+            db.session.execute(statement)
+        return user_ids
+
+    @staticmethod
+    def _movie_fans_statement(movie_id):
+        """
+        Return the statement selecting the IDs of the users who have a movie in their favorites.
+        """
+        return select(user_movie_association.c.user_id).where(user_movie_association.c.movie_id == movie_id)
+
+    @staticmethod
+    def _discard_movie_statements(movie_id):
+        """
+        Return the statements deleting a movie with its reviews, its trending row and its links to the users' favorites.
+        """
+        return [
+            user_movie_association.delete().where(user_movie_association.c.movie_id == movie_id),
+            delete(Review).where(Review.movie_id == movie_id),
+            delete(TrendingMovie).where(TrendingMovie.movie_id == movie_id),
+            delete(Movie).where(Movie.id == movie_id),
+        ]
+
+    @staticmethod
+    def _apply_movie_info(movie, movie_info_from_api):
+        """
+        Copy the info fetched from the API to a movie object and mark it as ready.
+        """
+        movie.director = movie_info_from_api.get("director", "")
+        movie.year = movie_info_from_api.get("year")
+        movie.rating = movie_info_from_api.get("rating")
+        movie.poster = movie_info_from_api.get("poster", "")
+        movie.status = MOVIE_READY
+
+    def import_movies(self, user_id, titles):
+        """
+        Add many movies to a user's favorites at once.
+        Titles already in the Movie table are linked directly, the others are
+        fetched from the API concurrently, and all movies and links are saved in one transaction.
+
+        Args:
+            user_id (str): The ID of the user.
+            titles (list[str]): The titles of the movies.
+
+        Returns:
+            list[dict]: The result for each title, with its status: "added", "linked",
+            "already_in_list", "duplicate" (repeated in the input, ignoring case and punctuation),
+            "not_found" (unknown to the API) or "failed" (the API couldn't be reached, the title can be imported again later).
+
+        Raises:
+            UserNotFoundError: If no user is associated with the user ID.
+        """
+        if db.session.query(User.id).filter_by(id=user_id).scalar() is None:
             raise UserNotFoundError(f"User ID {user_id} does not exist")
+        user_id = int(user_id)
+
+        # Dedupe the titles the same way add_movie matches them
+        report = []
+        unique_titles = {}
+        for title in titles:
+            title = title.strip()
+            if not title:
+                continue
+            if normalize_title(title) in unique_titles:
+                report.append({"title": title, "status": "duplicate"})
+                continue
+            unique_titles[normalize_title(title)] = title
+
+        # Find the movies that already exist and which of them the user already has
+        normalized_titles = list(unique_titles)
+        existing_movies = {}
+        for i in range(0, len(normalized_titles), IN_CLAUSE_CHUNK_SIZE):
+            chunk = normalized_titles[i:i + IN_CLAUSE_CHUNK_SIZE]
+            rows = (
+                db.session.query(Movie.normalized_title, Movie.id)
+                .filter(Movie.normalized_title.in_(chunk))
+                .all()
+            )
+            for normalized_title, movie_id in rows:
+                existing_movies.setdefault(normalized_title, movie_id)
+
+        existing_ids = list(existing_movies.values())
+        favorite_ids = set()
+        for i in range(0, len(existing_ids), IN_CLAUSE_CHUNK_SIZE):
+            chunk = existing_ids[i:i + IN_CLAUSE_CHUNK_SIZE]
+            favorite_ids.update(
+                movie_id for movie_id, in db.session.query(user_movie_association.c.movie_id).filter(
+                    user_movie_association.c.user_id == user_id,
+                    user_movie_association.c.movie_id.in_(chunk)
+                )
+            )
 
-        # Query for the specific movie linked to that user
-        movie = db.session.query(Movie).filter_by(id=movie_id).first()
-        if not movie or movie not in user.favorite_movies:
-            raise MovieNotFound(f"Movie ID {movie_id} does not exist for User ID {user_id}")
+        # Fetch the missing movies from the API concurrently
+        missing_titles = [title for normalized_title, title in unique_titles.items()
+                          if normalized_title not in existing_movies]
+        with ThreadPoolExecutor(max_workers=self.import_max_workers) as executor:
+            fetched = dict(zip(missing_titles, executor.map(bind_stats(self._lookup_for_import), missing_titles)))
+
+        new_movies = {}
+        for title in missing_titles:
+            movie_info_from_api = fetched[title]
+            if movie_info_from_api is not None and movie_info_from_api is not LOOKUP_FAILED:
+                new_movies[title] = Movie(title=title)
+                self._apply_movie_info(new_movies[title], movie_info_from_api)
+        db.session.add_all(new_movies.values())
+        db.session.flush()
+
+        # Link every movie the user doesn't have yet, in the same transaction
+        links = []
+        for normalized_title, title in unique_titles.items():
+            if normalized_title in existing_movies:
+                movie_id = existing_movies[normalized_title]
+                status = "already_in_list" if movie_id in favorite_ids else "linked"
+            elif title in new_movies:
+                movie_id = new_movies[title].id
+                status = "added"
+            else:
+                status = "failed" if fetched[title] is LOOKUP_FAILED else "not_found"
+                report.append({"title": title, "status": status})
+                continue
+            if status != "already_in_list":
+                links.append({"user_id": user_id, "movie_id": movie_id})
+            report.append({"title": title, "status": status, "movie_id": movie_id})
+
+        linked_ids = self._insert_links(links)
+        if linked_ids:
+            self._update_favorite_counts(linked_ids, 1)
+        # Links a concurrent request added since the favorites were read
+        for entry in report:
+            if entry["status"] == "linked" and entry["movie_id"] not in linked_ids:
+                entry["status"] = "already_in_list"
+        self._bump_data_version()
+        db.session.commit()
+        mark_written()
+        self._record_favorite_changes(user_id, linked_ids, 1)
+
+        return report
+
+    @staticmethod
+    def _lookup_for_import(title):
+        """
+        Look a title up in the API, returning LOOKUP_FAILED instead of raising if the API couldn't be reached.
+        """
+        try:
+            return MovieAPI.lookup_movie_info(title)
+        except MovieAPIUnavailable:
+            return LOOKUP_FAILED
 
-        # Check if the review already exists
-        existing_review = db.session.query(Review).filter_by(user_id=user_id, movie_id=movie_id).first()
+    @staticmethod
+    def _insert_links(links):
+        """
+        Add favorite links, skipping the ones that already exist, e.g. added by a concurrent request.
+        Returns the movie IDs of the links actually inserted.
+        """
+        if not links:
+            return []
+        statement = SQLiteDataManager._upsert_insert(user_movie_association)
+        if statement is None:
+            db.session.execute(user_movie_association.insert(), links)
+            return [link["movie_id"] for link in links]
+        statement = (statement.on_conflict_do_nothing(index_elements=["user_id", "movie_id"])
+                     .returning(user_movie_association.c.movie_id))
+        return list(db.session.execute(statement, links).scalars())
+
+    def add_review(self, user_id, movie_id, review_text, rating):
+        """
+        Add or update a user's review of one of their movies.
 
-        if existing_review:
-            # Update the existing review
+        Args:
+            user_id (int): The ID of the user.
+            movie_id (int): The ID of the movie.
+            review_text (str): The text of the review.
+            rating (float): The user's rating of the movie, from MIN_RATING to MAX_RATING.
+
+        Raises:
+            InvalidRating: If the rating isn't a number in the allowed range.
+            UserNotFoundError: If no user is associated with the user ID.
+            MovieNotFound: If the movie is not associated with the user.
+        """
+        # Checked before any write, the aggregates are updated before the review
+        rating = self._validate_rating(rating)
+
+        # Query for the movie linked to that user, along with any existing review
+        movie, existing_review = self._get_user_movie(user_id, movie_id)
+
+        # The previous rating is read under the movie's lock, a concurrent review of the
+        # same movie can't change it before this one is committed
+        self._lock_movie(movie.id)
+        previous_rating = db.session.execute(
+            select(Review.rating).where(Review.user_id == user_id, Review.movie_id == movie.id)
+        ).scalar()
+        if previous_rating is not None:
+            # Update the movie's rating aggregates with the difference
+            self._update_rating_aggregates(movie.id, 0, rating - previous_rating)
+        else:
+            self._update_rating_aggregates(movie.id, 1, rating)
+
+        statement = self._upsert_insert(Review)
+        if statement is not None:
+            # Insert or update the review in one statement, a review written concurrently
+            # is overwritten instead of failing on the unique (user_id, movie_id) index
+            statement = statement.values(user_id=user_id, movie_id=movie.id, review_text=review_text, rating=rating)
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "movie_id"],
+                set_={
+                    "review_text": statement.excluded.review_text,
+                    "rating": statement.excluded.rating,
+                    "updated_at": db.func.current_timestamp()
+                }
+            )
+            db.session.execute(statement)
+        elif existing_review:
             existing_review.review_text = review_text
             existing_review.rating = rating
         else:
-            # Create a new review object
+            # Create a new review object and add it to the session
             new_review = Review(
                 user_id=user_id,
-                movie_id=movie_id,
+                movie_id=movie.id,
                 review_text=review_text,
                 rating=rating
             )
-
-            # Add review to the session
             db.session.add(new_review)
 
-            # Associate the movie with the user as a favorite
-            user.reviews.append(new_review)
-            movie.reviews.append(new_review)
-
-        # Commit the changes
+        # Commit the review and the aggregates together
+        self._bump_data_version()
         db.session.commit()
+        mark_written()
+
+    @staticmethod
+    def _validate_rating(rating):
+        """
+        Return the rating as a float, raising InvalidRating if it isn't a number from MIN_RATING to MAX_RATING.
+        """
+        try:
+            rating = float(rating)
+        except (TypeError, ValueError):
+            raise InvalidRating("The rating must be a number")
+        # Also false for NaN
+        if not MIN_RATING <= rating <= MAX_RATING:
+            raise InvalidRating(f"The rating must be between {MIN_RATING} and {MAX_RATING}")
+        return rating
+
+    @staticmethod
+    def _lock_movie(movie_id):
+        """
+        Lock a movie's row until the end of the transaction, the whole database on SQLite,
+        so concurrent changes to its aggregates are made one after the other.
+        """
+        db.session.execute(
+            update(Movie)
+            .where(Movie.id == movie_id)
+            .values(review_count=Movie.review_count)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _update_rating_aggregates(movie_id, count_delta, sum_delta):
+        """
+        Incrementally update a movie's review count, rating sum and average user rating.
+        The new values are computed by the database from the current ones, in the caller's transaction.
+        """
+        new_count = Movie.review_count + count_delta
+        new_sum = Movie.rating_sum + sum_delta
+        db.session.execute(
+            update(Movie)
+            .where(Movie.id == movie_id)
+            .values(
+                review_count=new_count,
+                rating_sum=new_sum,
+                avg_user_rating=case((new_count > 0, new_sum / new_count), else_=None)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def get_top_rated_movies(self, limit=DEFAULT_PAGE_SIZE, min_reviews=1):
+        """
+        Retrieve the movies with the best average user rating, served by the avg_user_rating index.
+
+        Args:
+            limit (int): The maximum number of movies to return.
+            min_reviews (int): Only include movies with at least this many reviews.
+
+        Returns:
+            list[dict]: Movie dictionaries with their average user rating and review count.
+        """
+        rows = (
+            db.session.query(Movie.id, Movie.title, Movie.avg_user_rating, Movie.review_count)
+            .filter(Movie.avg_user_rating.isnot(None), Movie.review_count >= min_reviews)
+            .order_by(Movie.avg_user_rating.desc(), Movie.id)
+            .limit(max(1, min(int(limit), MAX_PAGE_SIZE)))
+            .all()
+        )
+        return [self._rated_movie_row_to_dict(row) for row in rows]
+
+    def get_most_reviewed_movies(self, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve the movies with the most reviews, served by the review_count index.
+
+        Args:
+            limit (int): The maximum number of movies to return.
+
+        Returns:
+            list[dict]: Movie dictionaries with their average user rating and review count.
+        """
+        rows = (
+            db.session.query(Movie.id, Movie.title, Movie.avg_user_rating, Movie.review_count)
+            .filter(Movie.review_count > 0)
+            .order_by(Movie.review_count.desc(), Movie.id)
+            .limit(max(1, min(int(limit), MAX_PAGE_SIZE)))
+            .all()
+        )
+        return [self._rated_movie_row_to_dict(row) for row in rows]
+
+    def get_most_popular_movies(self, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve the movies in the most users' favorites, served by the favorite_count index.
+
+        Args:
+            limit (int): The maximum number of movies to return.
+
+        Returns:
+            list[dict]: Movie dictionaries with the number of users that have them.
+        """
+        rows = (
+            db.session.query(Movie.id, Movie.title, Movie.favorite_count)
+            .filter(Movie.favorite_count > 0)
+            .order_by(Movie.favorite_count.desc(), Movie.id)
+            .limit(max(1, min(int(limit), MAX_PAGE_SIZE)))
+            .all()
+        )
+        return [{"id": row.id, "title": row.title, "favorite_count": row.favorite_count} for row in rows]
+
+    @replica_read
+    def get_trending_movies(self, limit=DEFAULT_PAGE_SIZE):
+        """
+        Retrieve the movies with the most reviews in the trending window.
+        They are read from the trending_movie table, which is kept up to date in the background.
+
+        Args:
+            limit (int): The maximum number of movies to return.
+
+        Returns:
+            list[dict]: Movie dictionaries with their number and average rating of recent reviews.
+        """
+        rows = (
+            db.session.query(Movie.id, Movie.title, TrendingMovie.review_count, TrendingMovie.avg_rating)
+            .join(Movie, Movie.id == TrendingMovie.movie_id)
+            .order_by(TrendingMovie.review_count.desc(), TrendingMovie.avg_rating.desc(), Movie.id)
+            .limit(max(1, min(int(limit), MAX_PAGE_SIZE)))
+            .all()
+        )
+        return [{
+            "id": row.id,
+            "title": row.title,
+            "recent_review_count": row.review_count,
+            "recent_avg_rating": row.avg_rating
+        } for row in rows]
+
+    def refresh_trending_movies(self):
+        """
+        Recompute the trending_movie table from the reviews written in the trending window.
+        Only the window is aggregated, found through the review.created_at index.
+
+        The rows are upserted and the movies that left the window deleted, so concurrent
+        refreshes from several processes don't conflict, and on PostgreSQL an advisory
+        lock lets a single one of them run at a time.
+        """
+        with self._trending_lock:
+            if db.session.get_bind().dialect.name == "postgresql" and not db.session.execute(
+                    text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": TRENDING_REFRESH_LOCK_KEY}).scalar():
+                # Another process is refreshing it
+                db.session.rollback()
+                return
+
+            since = datetime.now(timezone.utc).replace(tzinfo=None) - self.trending_window
+            recent_reviews = (
+                select(Review.movie_id, db.func.count(), db.func.avg(Review.rating))
+                .where(Review.created_at >= since)
+                .group_by(Review.movie_id)
+            )
+            columns = ["movie_id", "review_count", "avg_rating"]
+            upsert = self._upsert_insert(TrendingMovie)
+            if upsert is None:
+                # No upsert on this database, replace all the rows
+                db.session.execute(delete(TrendingMovie))
+                db.session.execute(insert(TrendingMovie).from_select(columns, recent_reviews))
+            else:
+                db.session.execute(
+                    delete(TrendingMovie).where(TrendingMovie.movie_id.not_in(
+                        select(Review.movie_id).where(Review.created_at >= since)
+                    )).execution_options(synchronize_session=False)
+                )
+                upsert = upsert.from_select(columns, recent_reviews)
+                db.session.execute(upsert.on_conflict_do_update(
+                    index_elements=["movie_id"],
+                    set_={"review_count": upsert.excluded.review_count, "avg_rating": upsert.excluded.avg_rating}
+                ))
+            db.session.commit()
+
+    def get_similar_movies(self, movie_id, limit=10):
+        """
+        Retrieve the movies most often liked by the users who like a specific movie.
+
+        Args:
+            movie_id (int): The ID of the movie.
+            limit (int): The maximum number of movies to return.
+
+        Returns:
+            list[dict]: Movie dictionaries with their cosine similarity score, most similar first.
+
+        Raises:
+            MovieNotFound: If no movie is associated with the movie ID.
+        """
+        if db.session.query(Movie.id).filter_by(id=movie_id).first() is None:
+            raise MovieNotFound(f"Movie ID {movie_id} does not exist")
+
+        self._ensure_recommender()
+        return self._scored_movies(self.recommender.similar(movie_id, limit=limit))
+
+    def get_recommendations(self, user_id, limit=10):
+        """
+        Recommend movies to a user based on their favorites.
+        Favorites the user rated below LIKE_THRESHOLD are left out, the others weigh by their rating.
+
+        Args:
+            user_id (int): The ID of the user.
+            limit (int): The maximum number of movies to return.
+
+        Returns:
+            list[dict]: Movie dictionaries with their recommendation score, best first.
+
+        Raises:
+            UserNotFoundError: If no user is associated with the user ID.
+        """
+        rows = (
+            db.session.query(User.id, user_movie_association.c.movie_id, Review.rating)
+            .select_from(User)
+            .outerjoin(user_movie_association, user_movie_association.c.user_id == User.id)
+            .outerjoin(Review, and_(Review.user_id == User.id,
+                                    Review.movie_id == user_movie_association.c.movie_id))
+            .filter(User.id == user_id)
+            .all()
+        )
+        if not rows:
+            raise UserNotFoundError(f"User ID {user_id} does not exist")
+
+        seeds = {}
+        excluded = set()
+        for _, movie_id, rating in rows:
+            if movie_id is None:
+                continue
+            if rating is not None and rating < LIKE_THRESHOLD:
+                # Still never recommend a movie the user already has
+                excluded.add(movie_id)
+                continue
+            seeds[movie_id] = 1.0 if rating is None else rating / LIKE_THRESHOLD
+
+        self._ensure_recommender()
+        recommendations = self.recommender.recommend(seeds, limit=limit + len(excluded))
+        recommendations = [(movie_id, score) for movie_id, score in recommendations if movie_id not in excluded]
+        return self._scored_movies(recommendations[:limit])
+
+    def rebuild_recommender(self):
+        """
+        Build the recommendation index from scratch from all the favorites,
+        reading them from the cursor in batches.
+        """
+        with self._recommender_lock:
+            result = db.session.execute(
+                select(user_movie_association.c.user_id, user_movie_association.c.movie_id)
+                .execution_options(yield_per=RECOMMENDER_BATCH_SIZE)
+            )
+            user_ids, movie_ids = [], []
+            for partition in result.partitions():
+                batch = np.asarray(partition, dtype=np.int64).reshape(-1, 2)
+                user_ids.append(batch[:, 0])
+                movie_ids.append(batch[:, 1])
+            self.recommender.build(
+                np.concatenate(user_ids) if user_ids else [],
+                np.concatenate(movie_ids) if movie_ids else []
+            )
+            self._recommender_built_at = time.monotonic()
+
+    def _ensure_recommender(self):
+        """
+        Build the recommendation index if it was never built, was dropped or is older than the rebuild interval.
+        """
+        built_at = self._recommender_built_at
+        if (built_at is None or not self.recommender.built
+                or time.monotonic() - built_at >= self.recommender_rebuild_interval):
+            self.rebuild_recommender()
+
+    def _record_favorite_changes(self, user_id, movie_ids, sign):
+        """
+        Update the recommendation index after favorites were added (sign=1) or removed (sign=-1).
+        Must be called after the change was written.
+        """
+        for movie_id in movie_ids:
+            self.recommender.record_change(user_id, movie_id, sign)
+
+    def _scored_movies(self, scored_movie_ids):
+        """
+        Turn (movie ID, score) pairs into movie dictionaries with their titles, keeping their order.
+        """
+        movie_ids = [movie_id for movie_id, _ in scored_movie_ids]
+        titles = dict(db.session.query(Movie.id, Movie.title).filter(Movie.id.in_(movie_ids))) if movie_ids else {}
+        return [{"id": movie_id, "title": titles[movie_id], "score": round(score, 4)}
+                for movie_id, score in scored_movie_ids if movie_id in titles]
+
+    @staticmethod
+    def _rated_movie_row_to_dict(row):
+        return {
+            "id": row.id,
+            "title": row.title,
+            "avg_user_rating": row.avg_user_rating,
+            "review_count": row.review_count
+        }
 
     def update_movie(self, user_id, movie_id, updated_movie_data):
         """
@@ -357,15 +1504,8 @@ class SQLiteDataManager(DataManagerInterface):
             MovieNotFound: If the movie is not associated with the user.
         """
 
-        # Query for the specific user
-        user = db.session.query(User).filter_by(id=user_id).first()
-        if not user:
-            raise UserNotFoundError(f"User ID {user_id} does not exist")
-
         # Query for the specific movie linked to that user
-        movie = db.session.query(Movie).filter_by(id=movie_id).first()
-        if not movie or movie not in user.favorite_movies:
-            raise MovieNotFound(f"Movie ID {movie_id} does not exist for User ID {user_id}")
+        movie, _ = self._get_user_movie(user_id, movie_id)
 
         # Update the movie attributes
         movie.title = updated_movie_data.get('name', movie.title)
@@ -375,7 +1515,9 @@ class SQLiteDataManager(DataManagerInterface):
         movie.poster = updated_movie_data.get('poster', movie.poster)
 
         # Commit the changes to the database
+        self._bump_data_version()
         db.session.commit()
+        mark_written()
 
     def delete_movie(self, user_id, movie_id):
         """
@@ -390,22 +1532,23 @@ class SQLiteDataManager(DataManagerInterface):
             MovieNotFound: If the movie is not found in the user's movie list.
         """
 
-        # Query the User model by ID
-        # user = self.db.User.filter_by(id=user_id).first()
-        user = db.session.query(User).filter_by(id=user_id).first()
-
-        if not user:
-            raise UserNotFoundError(f"User ID {user_id} does not exist")
-
-        movie = db.session.query(Movie).filter_by(id=movie_id).first()
-
-        if not movie or movie not in user.favorite_movies:
-            raise MovieNotFound(f"Movie ID {movie_id} does not exist for user {user_id}")
+        # Make sure the user exists and has this movie
+        self._get_user_movie(user_id, movie_id)
 
         # Delete movie from user's favorite movies
-        user.favorite_movies.remove(movie)
+        db.session.execute(
+            user_movie_association.delete().where(
+                user_movie_association.c.user_id == user_id,
+                user_movie_association.c.movie_id == movie_id
+            )
+        )
+        self._update_favorite_counts([movie_id], -1)
+        self._bump_data_version()
         db.session.commit()
+        mark_written()
+        self._record_favorite_changes(user_id, [int(movie_id)], -1)
 
+    @replica_read
     def get_movie_reviews(self, movie_id):
         """
         Retrieve all reviews for a specific movie.
@@ -415,26 +1558,49 @@ class SQLiteDataManager(DataManagerInterface):
 
         Returns:
             list[dict]: A list of dictionaries, each representing a review for the movie.
+
+        Raises:
+            MovieNotFound: If no movie is associated with the movie ID.
         """
+        # The movie page reads ReviewSummary rows, the callers of this method get the dictionaries they always had
+        return [review._asdict() for review in self.get_movie_with_reviews(movie_id)["reviews"]]
 
-        # Query the Movie model by ID
-        movie = db.session.query(Movie).filter_by(id=movie_id).first()
+    @replica_read
+    def get_movie_with_reviews(self, movie_id):
+        """
+        Retrieve a movie together with all of its reviews and their authors.
+
+        Args:
+            movie_id (int): The ID of the movie.
+
+        Returns:
+            dict: The movie id and title, and a list of ReviewSummary rows.
+
+        Raises:
+            MovieNotFound: If no movie is associated with the movie ID.
+        """
+
+        # Fetch the movie, its reviews and the reviewers' names in a single query
+        rows = (
+            db.session.query(Movie.id, Movie.title, User.name, Review.rating, Review.review_text)
+            .select_from(Movie)
+            .outerjoin(Review, Review.movie_id == Movie.id)
+            .outerjoin(User, User.id == Review.user_id)
+            .filter(Movie.id == movie_id)
+            .order_by(Review.id)
+            .all()
+        )
 
         # Ensure the movie exists
-        if not movie:
+        if not rows:
             raise MovieNotFound(f"Movie ID {movie_id} does not exist")
 
-        # Fetch all reviews associated with this movie
-        reviews_for_movie = movie.reviews
-
-        # Convert each review object to a dictionary for easier use in the template
-        reviews_list = []
-        for review in reviews_for_movie:
-            user = db.session.query(User).filter_by(id=review.user_id).first()
-            reviews_list.append({
-                'user_name': user.name,
-                'rating': review.rating,
-                'review_text': review.review_text
-            })
+        # A movie without reviews comes back as a single row with no review
+        reviews_list = [ReviewSummary(user_name, rating, review_text)
+                        for _, _, user_name, rating, review_text in rows if rating is not None]
 
-        return reviews_list
+        return {
+            "id": rows[0].id,
+            "title": rows[0].title,
+            "reviews": reviews_list
+        }
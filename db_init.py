@@ -1,7 +1,10 @@
+import argparse
 from flask import Flask
-import os
 from dotenv import load_dotenv
 from datamanager.sql_data_manager import db
+from helpers.migrations import apply_migrations, rebuild_rating_aggregates
+from helpers.db_config import configure_database
+from helpers.sqlite_profile import apply_sqlite_pragmas
 
 
 # Load environment variables from the .env file
@@ -10,10 +13,11 @@ load_dotenv()
 # Initialize the Flask application just for the purpose of database creation
 app = Flask(__name__)
 
-# Set database path and configuration
-db_path = os.path.join(os.path.dirname(__file__), "data", "database_file.db")
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+# Same database configuration as the application
+configure_database(app)
 db.init_app(app)
+with app.app_context():
+    apply_sqlite_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
 
 
 def create_tables():
@@ -21,6 +25,34 @@ def create_tables():
         db.create_all()
 
 
+def migrate_tables():
+    """
+    Bring the tables of an existing database up to date with the models.
+    Returns the number of migrations applied.
+    """
+    with app.app_context():
+        return apply_migrations(db.engine)
+
+
+def rebuild_ratings():
+    """
+    Recompute the rating aggregates of every movie from the reviews.
+    """
+    with app.app_context():
+        with db.engine.begin() as conn:
+            rebuild_rating_aggregates(conn)
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create and migrate the database tables.")
+    parser.add_argument("--rebuild-ratings", action="store_true",
+                        help="recompute the rating aggregates of every movie from the reviews")
+    args = parser.parse_args()
+
     create_tables()
     print("Tables created successfully!")
+    applied = migrate_tables()
+    print(f"Applied {applied} migration(s).")
+    if args.rebuild_ratings:
+        rebuild_ratings()
+        print("Rating aggregates rebuilt.")
@@ -0,0 +1,35 @@
+import argparse
+import json
+import os
+import db_init
+from datamanager.sql_data_manager import db
+from helpers.data_generator import generate, DEFAULT_PASSWORD
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fill the database (DATABASE_URL, the data/ file by default) with synthetic data."
+    )
+    parser.add_argument("--users", type=int, default=1000, help="number of users")
+    parser.add_argument("--movies", type=int, default=5000, help="number of movies")
+    parser.add_argument("--favorites-per-user", type=float, default=20, help="average number of favorites per user")
+    parser.add_argument("--review-fraction", type=float, default=0.3, help="fraction of the favorites with a review")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of the movie popularity, 0 for uniform")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="password of every user")
+    args = parser.parse_args()
+
+    db_init.create_tables()
+    db_init.migrate_tables()
+    with db_init.app.app_context():
+        with db.engine.begin() as conn:
+            counts = generate(conn, users=args.users, movies=args.movies,
+                              favorites_per_user=args.favorites_per_user, review_fraction=args.review_fraction,
+                              zipf_exponent=args.zipf, seed=args.seed, password=args.password,
+                              rounds=int(os.getenv("PASSWORD_HASH_ROUNDS", 12)))
+
+    print(json.dumps(counts))
+
+
+if __name__ == '__main__':
+    main()
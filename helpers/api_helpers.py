@@ -1,46 +1,111 @@
 import requests
 import os
 from dotenv import load_dotenv
+from helpers.cache import SQLiteCache, MISSING
+from helpers.http_client import MetadataClient, CircuitBreaker
+from helpers.metrics import timed
+from helpers.text_helpers import normalize_title
 
 load_dotenv()  # Load environment variables from the .env file
 
 API_KEY = os.getenv("API_KEY")
 REQUEST_URL = os.getenv("REQUEST_URL")
 
+# Timeouts, retries and circuit breaker of the API client
+API_CONNECT_TIMEOUT = float(os.getenv("MOVIE_API_CONNECT_TIMEOUT", 3.05))
+API_READ_TIMEOUT = float(os.getenv("MOVIE_API_READ_TIMEOUT", 10))
+API_MAX_RETRIES = int(os.getenv("MOVIE_API_MAX_RETRIES", 1))
+# Upper bound of a lookup in seconds, all attempts and backoffs included
+API_TOTAL_TIMEOUT = float(os.getenv("MOVIE_API_TOTAL_TIMEOUT", 15))
+API_BREAKER_THRESHOLD = int(os.getenv("MOVIE_API_BREAKER_THRESHOLD", 5))
+API_BREAKER_RESET = float(os.getenv("MOVIE_API_BREAKER_RESET", 30))
+
+# Local cache of the API answers, so the same title is never fetched twice
+CACHE_PATH = os.getenv("MOVIE_CACHE_PATH",
+                       os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "movie_api_cache.db"))
+CACHE_SIZE = int(os.getenv("MOVIE_CACHE_SIZE", 10000))
+CACHE_TTL = int(os.getenv("MOVIE_CACHE_TTL", 30 * 24 * 60 * 60))
+# Titles the API doesn't know are remembered for a shorter time
+CACHE_NEGATIVE_TTL = int(os.getenv("MOVIE_CACHE_NEGATIVE_TTL", 60 * 60))
+
+
+class MovieAPIUnavailable(Exception):
+    """ Raised when the API can't be reached or is considered down, as opposed to not knowing a title. """
+    pass
+
 
 class MovieAPI:
+    cache = SQLiteCache(CACHE_PATH, maxsize=CACHE_SIZE)
+    client = MetadataClient(
+        REQUEST_URL,
+        api_key=API_KEY,
+        connect_timeout=API_CONNECT_TIMEOUT,
+        read_timeout=API_READ_TIMEOUT,
+        max_retries=API_MAX_RETRIES,
+        total_timeout=API_TOTAL_TIMEOUT,
+        breaker=CircuitBreaker(failure_threshold=API_BREAKER_THRESHOLD, reset_timeout=API_BREAKER_RESET)
+    )
+
     @staticmethod
     def fetch_movie_info(title):
-        """ this function takes a title of a movie and fetches its info from the API.
-        it returns a dictionary with the info of the movie. """
+        """ this function takes a title of a movie and fetches its info from the API,
+        or from the local cache if the title was looked up before.
+        it returns a dictionary with the info of the movie, or None if it couldn't be fetched. """
         try:
-            params = {
-                "t": title,
-                "apikey": API_KEY
-            }
-            response = requests.get(REQUEST_URL, params=params)
-
-            if response.status_code == 200:
-                movie_data = response.json()
-                if movie_data["Response"] == "False":
-                    return None
-                movie_title = movie_data["Title"]
-                year = movie_data["Year"]
-                rating = movie_data["imdbRating"]
-                director = movie_data["Director"]
-                poster = movie_data["Poster"]
-                review = ""
-
-                new_movie = {
-                    "name": movie_title,
-                    "director": director,
-                    "year": year,
-                    "rating": rating,
-                    "poster": poster,
-                    "review": review
-                }
-                return new_movie
-            else:
-                return None
-        except requests.exceptions.RequestException:
+            return MovieAPI.lookup_movie_info(title)
+        except MovieAPIUnavailable:
             return None
+
+    @staticmethod
+    def lookup_movie_info(title):
+        """ like fetch_movie_info, but tells an unknown title from an API failure:
+        it returns None if the API doesn't know the movie, and raises
+        MovieAPIUnavailable if the API couldn't be reached. """
+        key = normalize_title(title)
+        cached_movie = MovieAPI.cache.get(key)
+        if cached_movie is not MISSING:
+            return cached_movie
+
+        try:
+            new_movie = MovieAPI._request_movie_info(title)
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            # Don't cache failures that may be temporary, nor malformed answers
+            raise MovieAPIUnavailable(f"The movie API couldn't be reached or gave a malformed answer: {e}")
+
+        ttl = CACHE_TTL if new_movie is not None else CACHE_NEGATIVE_TTL
+        MovieAPI.cache.set(key, new_movie, ttl)
+        return new_movie
+
+    @staticmethod
+    def _request_movie_info(title):
+        """ fetches the info of a movie from the API.
+        it returns None if the API doesn't know the movie, and raises
+        requests.exceptions.RequestException if the request failed
+        or the API is considered down. """
+        with timed("movie_api"):
+            response = MovieAPI.client.get({"t": title})
+
+        return MovieAPI.parse_movie_info(response.json())
+
+    @staticmethod
+    def parse_movie_info(movie_data):
+        """ turns the JSON answer of the API into the info of a movie,
+        or None if the API doesn't know the movie. """
+        if movie_data["Response"] == "False":
+            return None
+        movie_title = movie_data["Title"]
+        year = movie_data["Year"]
+        rating = movie_data["imdbRating"]
+        director = movie_data["Director"]
+        poster = movie_data["Poster"]
+        review = ""
+
+        new_movie = {
+            "name": movie_title,
+            "director": director,
+            "year": year,
+            "rating": rating,
+            "poster": poster,
+            "review": review
+        }
+        return new_movie
@@ -0,0 +1,55 @@
+import asyncio
+import httpx
+from helpers.api_helpers import (MovieAPI, MovieAPIUnavailable, API_KEY, REQUEST_URL, API_CONNECT_TIMEOUT,
+                                 API_READ_TIMEOUT, API_MAX_RETRIES, API_TOTAL_TIMEOUT, CACHE_TTL, CACHE_NEGATIVE_TTL)
+from helpers.async_http_client import AsyncMetadataClient
+from helpers.cache import MISSING
+from helpers.http_client import CircuitOpenError
+from helpers.metrics import timed
+from helpers.text_helpers import normalize_title
+
+
+class AsyncMovieAPI:
+    # Shares the answers cache and the circuit breaker of MovieAPI, both talk to the same API
+    cache = MovieAPI.cache
+    client = AsyncMetadataClient(
+        REQUEST_URL,
+        api_key=API_KEY,
+        connect_timeout=API_CONNECT_TIMEOUT,
+        read_timeout=API_READ_TIMEOUT,
+        max_retries=API_MAX_RETRIES,
+        total_timeout=API_TOTAL_TIMEOUT,
+        breaker=MovieAPI.client.breaker
+    )
+
+    @staticmethod
+    async def fetch_movie_info(title):
+        """ async version of MovieAPI.fetch_movie_info: fetches the info of a movie
+        from the API, or from the local cache if the title was looked up before.
+        it returns a dictionary with the info of the movie, or None. """
+        try:
+            return await AsyncMovieAPI.lookup_movie_info(title)
+        except MovieAPIUnavailable:
+            return None
+
+    @staticmethod
+    async def lookup_movie_info(title):
+        """ async version of MovieAPI.lookup_movie_info: returns None if the API
+        doesn't know the movie, and raises MovieAPIUnavailable if the API couldn't be reached. """
+        key = normalize_title(title)
+        # The cache is a SQLite file, read and written off the event loop
+        cached_movie = await asyncio.to_thread(AsyncMovieAPI.cache.get, key)
+        if cached_movie is not MISSING:
+            return cached_movie
+
+        try:
+            with timed("movie_api"):
+                response = await AsyncMovieAPI.client.get({"t": title})
+            new_movie = MovieAPI.parse_movie_info(response.json())
+        except (httpx.HTTPError, CircuitOpenError, ValueError, KeyError) as e:
+            # Don't cache failures that may be temporary, nor malformed answers
+            raise MovieAPIUnavailable(f"The movie API couldn't be reached or gave a malformed answer: {e}")
+
+        ttl = CACHE_TTL if new_movie is not None else CACHE_NEGATIVE_TTL
+        await asyncio.to_thread(AsyncMovieAPI.cache.set, key, new_movie, ttl)
+        return new_movie
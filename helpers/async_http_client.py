@@ -0,0 +1,79 @@
+import asyncio
+import time
+import httpx
+from helpers.http_client import (RETRY_STATUSES, CircuitBreaker, CircuitOpenError, attempt_timeouts,
+                                 backoff_delay, may_retry)
+
+
+class AsyncMetadataClient:
+    """
+    asyncio version of MetadataClient: same timeouts, overall deadline, retries
+    with backoff and circuit breaker, over httpx. Waiting for the API doesn't block the event loop.
+
+    httpx connection pools belong to the event loop that opened them, and Flask
+    runs every async view on a new event loop (through asgiref), so a client is
+    opened for every call and closed when it returns, with its connections.
+    """
+
+    def __init__(self, base_url, api_key=None, connect_timeout=3.05, read_timeout=10, max_retries=1,
+                 total_timeout=15, backoff_factor=0.5, max_backoff=8, pool_size=10, breaker=None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.max_retries = max_retries
+        self.total_timeout = total_timeout
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+
+    async def get(self, params):
+        """
+        Send a GET request to the API with the given query parameters.
+
+        Args:
+            params (dict): The query parameters, the API key is added to them.
+
+        Returns:
+            httpx.Response: The successful response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            httpx.HTTPError: If the request failed after all retries, or when no time was left for another one.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("The movie API is unavailable, try again later")
+
+        params = dict(params, apikey=self.api_key)
+        async with httpx.AsyncClient(limits=self.limits) as client:
+            return await self._get(client, params)
+
+    async def _get(self, client, params):
+        deadline = time.monotonic() + self.total_timeout
+        for attempt in range(self.max_retries + 1):
+            connect_timeout, read_timeout = attempt_timeouts(self.connect_timeout, self.read_timeout, deadline)
+            try:
+                response = await client.get(self.base_url, params=params,
+                                            timeout=httpx.Timeout(read_timeout, connect=connect_timeout))
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                delay = backoff_delay(attempt, self.backoff_factor, self.max_backoff)
+                if not may_retry(attempt, self.max_retries, self.breaker, deadline, delay):
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                self.breaker.record_failure()
+                delay = backoff_delay(attempt, self.backoff_factor, self.max_backoff,
+                                      response.headers.get("Retry-After"))
+                if not may_retry(attempt, self.max_retries, self.breaker, deadline, delay):
+                    response.raise_for_status()
+                await asyncio.sleep(delay)
+                continue
+
+            # Anything else is an answer from a healthy upstream, even a client error
+            self.breaker.record_success()
+            response.raise_for_status()
+            return response
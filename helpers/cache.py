@@ -0,0 +1,160 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+
+class TTLCache:
+    """
+    A thread-safe in-process cache with a time-to-live per entry and
+    least-recently-used eviction once it holds maxsize entries.
+    A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for the key, or default if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Store the value under the key for ttl seconds (the cache's ttl by default),
+        evicting the least recently used entry if the cache is full.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Remove the key from the cache if it is there.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Return the hit and miss counters and the current size of the cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+# Returned by SQLiteCache.get for missing keys, since None is a valid cached value
+MISSING = object()
+
+
+class SQLiteCache:
+    """
+    A persistent cache of JSON-serializable values stored in an SQLite file.
+    Every entry has its own time-to-live, and once the cache holds maxsize
+    entries the least recently used ones are evicted.
+    """
+
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, key, default=MISSING):
+        """
+        Return the cached value for the key, or default if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.misses += 1
+                return default
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        """
+        Store the value under the key for ttl seconds, evicting expired
+        and least recently used entries if the cache is full.
+        """
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now)
+            )
+            size = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if size > self.maxsize:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed_at LIMIT "
+                    "max(0, (SELECT COUNT(*) FROM cache) - ?))",
+                    (self.maxsize,)
+                )
+
+    def invalidate(self, key):
+        """
+        Remove the key from the cache if it is there.
+        """
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM cache")
+
+    def stats(self):
+        """
+        Return the hit and miss counters of this process and the current size of the cache.
+        """
+        with self._lock, closing(self._connect()) as conn:
+            size = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
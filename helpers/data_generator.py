@@ -0,0 +1,124 @@
+"""
+Seeded generator of synthetic users, movies, favorites and reviews, for benchmarks.
+
+Rows are bulk-loaded with Core executemany. Movie popularity follows a Zipf-like
+law: the movie of popularity rank r is picked as a favorite with a probability
+proportional to 1 / r ** zipf_exponent, so a few movies are in most users' lists
+and most movies are in few. The same seed always generates the same rows, only
+the review times move with the time of generation.
+"""
+from datetime import datetime, timedelta, timezone
+import bcrypt
+import numpy as np
+from sqlalchemy import func, insert, select
+from helpers.migrations import bump_data_version, rebuild_favorite_counts, rebuild_rating_aggregates
+from helpers.sql_models import Movie, Review, User, user_movie_association
+from helpers.text_helpers import normalize_title
+
+# Rows per executemany
+INSERT_BATCH_SIZE = 10000
+# Password of every generated user
+DEFAULT_PASSWORD = "password"
+
+TITLE_WORDS = ["Silent", "River", "Midnight", "Empire", "Shadow", "Garden", "Storm", "Last", "Golden",
+               "Winter", "Secret", "City", "Broken", "Ocean", "Iron", "Dream", "Wild", "Glass", "Red", "Echo"]
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Eva", "Frank", "Grace", "Hugo", "Iris", "Jonas"]
+LAST_NAMES = ["Levi", "Martin", "Nolan", "Ortiz", "Park", "Quinn", "Rossi", "Smith", "Tanaka", "Weber"]
+REVIEW_WORDS = ["great", "boring", "moving", "funny", "slow", "beautiful", "confusing", "brilliant",
+                "predictable", "tense", "acting", "story", "ending", "music", "visuals", "pacing"]
+
+
+def _insert_batches(conn, table, rows):
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        conn.execute(insert(table), rows[i:i + INSERT_BATCH_SIZE])
+
+
+def generate(conn, users=1000, movies=5000, favorites_per_user=20, review_fraction=0.3,
+             zipf_exponent=1.1, review_days=30, seed=0, password=DEFAULT_PASSWORD, rounds=12):
+    """
+    Add synthetic data to the database, after the rows it already has.
+
+    Args:
+        conn: A connection in a transaction, e.g. from engine.begin().
+        users (int): The number of users.
+        movies (int): The number of movies.
+        favorites_per_user (float): The average number of favorites per user.
+        review_fraction (float): The fraction of the favorites that get a review.
+        zipf_exponent (float): The skew of the movie popularity, 0 for uniform.
+        review_days (int): Reviews are spread over this many days until now.
+        seed (int): The seed of the random generator.
+        password (str): The password of every user.
+        rounds (int): The bcrypt work factor of the password hash.
+
+    Returns:
+        dict: The number of rows added to every table.
+    """
+    rng = np.random.default_rng(seed)
+    first_user_id = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+    first_movie_id = (conn.execute(select(func.max(Movie.id))).scalar() or 0) + 1
+
+    # Every user gets the same hash, hashing them one by one would take minutes
+    hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    user_ids = first_user_id + np.arange(users)
+    _insert_batches(conn, User.__table__, [
+        {"id": int(user_id), "name": f"user{user_id}", "password": hashed_password} for user_id in user_ids
+    ])
+
+    movie_ids = first_movie_id + np.arange(movies)
+    words = rng.integers(len(TITLE_WORDS), size=(movies, 2))
+    directors = rng.integers(len(FIRST_NAMES), size=(movies, 2))
+    years = rng.integers(1950, 2024, size=movies)
+    # Hidden quality of every movie, the IMDb rating and the user ratings are noisy views of it
+    quality = np.clip(rng.normal(6.5, 1.5, size=movies), 1, 10)
+    movie_rows = []
+    for i, movie_id in enumerate(movie_ids):
+        title = f"{TITLE_WORDS[words[i, 0]]} {TITLE_WORDS[words[i, 1]]} {movie_id}"
+        movie_rows.append({
+            "id": int(movie_id),
+            "title": title,
+            "normalized_title": normalize_title(title),
+            "director": f"{FIRST_NAMES[directors[i, 0]]} {LAST_NAMES[directors[i, 1]]}",
+            "year": int(years[i]),
+            "rating": round(float(np.clip(quality[i] + rng.normal(0, 0.5), 1, 10)), 1),
+            "poster": "",
+        })
+    _insert_batches(conn, Movie.__table__, movie_rows)
+
+    # Sample the favorites of all users at once from the Zipf-like popularity,
+    # dropping the movies a user got twice
+    popularity_rank = rng.permutation(movies) + 1
+    cumulative = np.cumsum(1.0 / popularity_rank ** zipf_exponent)
+    cumulative /= cumulative[-1]
+    counts = np.minimum(rng.poisson(favorites_per_user, size=users), movies)
+    owners = np.repeat(np.arange(users), counts)
+    picks = np.minimum(np.searchsorted(cumulative, rng.random(len(owners))), movies - 1)
+    pairs = np.unique(owners.astype(np.int64) * movies + picks)
+    owners, picks = pairs // movies, pairs % movies
+    _insert_batches(conn, user_movie_association, [
+        {"user_id": int(user_ids[owner]), "movie_id": int(movie_ids[pick])} for owner, pick in zip(owners, picks)
+    ])
+
+    reviewed = rng.random(len(pairs)) < review_fraction
+    ratings = np.clip(np.rint(quality[picks[reviewed]] + rng.normal(0, 1.5, size=reviewed.sum())), 1, 10)
+    ages = rng.random(reviewed.sum()) * review_days * 24 * 60 * 60
+    review_words = rng.integers(len(REVIEW_WORDS), size=(reviewed.sum(), 3))
+    # Naive UTC, like the current_timestamp() defaults of the review timestamps
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    review_rows = []
+    for i, (owner, pick) in enumerate(zip(owners[reviewed], picks[reviewed])):
+        written_at = now - timedelta(seconds=float(ages[i]))
+        review_rows.append({
+            "user_id": int(user_ids[owner]),
+            "movie_id": int(movie_ids[pick]),
+            "review_text": " ".join(REVIEW_WORDS[word] for word in review_words[i]),
+            "rating": float(ratings[i]),
+            "created_at": written_at,
+            "updated_at": written_at,
+        })
+    _insert_batches(conn, Review.__table__, review_rows)
+
+    rebuild_rating_aggregates(conn)
+    rebuild_favorite_counts(conn)
+    bump_data_version(conn)
+
+    return {"users": users, "movies": movies, "favorites": len(pairs), "reviews": len(review_rows)}
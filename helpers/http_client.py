@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt, backoff_factor, max_backoff, retry_after=None):
+    """
+    Return how long to wait before the next attempt: exponential backoff with full jitter,
+    or the Retry-After header of the response if it has one.
+    """
+    if retry_after is not None and retry_after.isdigit():
+        return min(int(retry_after), max_backoff)
+    return random.uniform(0, min(max_backoff, backoff_factor * 2 ** attempt))
+
+
+def may_retry(attempt, max_retries, breaker, deadline, delay):
+    """
+    Return True if a failed attempt may be retried after waiting delay seconds: retries are
+    left, the circuit breaker didn't open and the retry would start before the deadline.
+    """
+    return attempt < max_retries and not breaker.is_open and time.monotonic() + delay < deadline
+
+
+def attempt_timeouts(connect_timeout, read_timeout, deadline):
+    """
+    Return the connect and read timeouts of an attempt, shortened to the time left before the deadline.
+    """
+    remaining = max(deadline - time.monotonic(), 0.001)
+    return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """ Raised instead of calling the upstream while the circuit breaker is open. """
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream for reset_timeout seconds after
+    failure_threshold consecutive failures. After the timeout a single
+    trial call is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow_request(self):
+        """
+        Return True if a call may be made now.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: let one trial call through and keep the others out until it finishes
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class MetadataClient:
+    """
+    HTTP client for the movie metadata API. Connections are kept alive in a
+    pooled session, every request has connect and read timeouts, rate limited
+    and server errors are retried with exponential backoff and jitter, and a
+    circuit breaker fails fast while the upstream is down.
+
+    A call never takes much more than total_timeout seconds, whatever the
+    number of retries: the attempts share that budget and no retry starts after it.
+    """
+
+    def __init__(self, base_url, api_key=None, connect_timeout=3.05, read_timeout=10, max_retries=1,
+                 total_timeout=15, backoff_factor=0.5, max_backoff=8, pool_size=10, breaker=None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.total_timeout = total_timeout
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, params):
+        """
+        Send a GET request to the API with the given query parameters.
+
+        Args:
+            params (dict): The query parameters, the API key is added to them.
+
+        Returns:
+            requests.Response: The successful response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            requests.exceptions.RequestException: If the request failed after all retries,
+                or when no time was left for another one.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("The movie API is unavailable, try again later")
+
+        params = dict(params, apikey=self.api_key)
+        deadline = time.monotonic() + self.total_timeout
+        for attempt in range(self.max_retries + 1):
+            timeout = attempt_timeouts(self.connect_timeout, self.read_timeout, deadline)
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                # Every failed attempt counts, so a down upstream opens the circuit quickly
+                self.breaker.record_failure()
+                delay = self._backoff(attempt)
+                if not may_retry(attempt, self.max_retries, self.breaker, deadline, delay):
+                    raise
+                time.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                self.breaker.record_failure()
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                if not may_retry(attempt, self.max_retries, self.breaker, deadline, delay):
+                    response.raise_for_status()
+                time.sleep(delay)
+                continue
+
+            # Anything else is an answer from a healthy upstream, even a client error
+            self.breaker.record_success()
+            response.raise_for_status()
+            return response
+
+    def _backoff(self, attempt, retry_after=None):
+        return backoff_delay(attempt, self.backoff_factor, self.max_backoff, retry_after)
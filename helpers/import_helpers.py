@@ -0,0 +1,22 @@
+import csv
+
+
+def read_titles(lines):
+    """
+    Read movie titles from CSV lines: the first column of every row is a title.
+    A header row whose first column is "title" is skipped.
+
+    Args:
+        lines (iterable[str]): The lines of the CSV file.
+
+    Returns:
+        list[str]: The titles, in the order they appear.
+    """
+    titles = []
+    for row_number, row in enumerate(csv.reader(lines)):
+        if not row or not row[0].strip():
+            continue
+        if row_number == 0 and row[0].strip().lower() == "title":
+            continue
+        titles.append(row[0].strip())
+    return titles
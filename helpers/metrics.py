@@ -0,0 +1,252 @@
+"""
+Per-request instrumentation: what every request costs in SQL statements, database
+time, movie API calls, bcrypt and template rendering, exported as Prometheus
+histograms on /metrics.
+
+The costs of the current request are gathered in a RequestStats. collect() gives
+one for any block of code, which lets tests assert query budgets:
+
+    with collect() as stats:
+        data_manager.get_user_movies(user_id)
+    assert stats.statement_count == 1
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import Response, g, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Buckets of the durations (seconds) and of the numbers of statements or calls per request
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current_stats = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    """
+    The costs gathered while it is the current RequestStats.
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.db_time = 0.0
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    @property
+    def statement_count(self):
+        return len(self.statements)
+
+    def add_statement(self, statement, seconds):
+        with self._lock:
+            self.statements.append((statement, seconds))
+            self.db_time += seconds
+
+    def add_timing(self, kind, seconds):
+        with self._lock:
+            self.timings.setdefault(kind, []).append(seconds)
+
+    def total(self, kind):
+        return sum(self.timings.get(kind, ()))
+
+    def count(self, kind):
+        return len(self.timings.get(kind, ()))
+
+
+@contextmanager
+def collect():
+    """
+    Gather the costs of the code run inside the block in a new RequestStats.
+    """
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def timed(kind):
+    """
+    Add the duration of the block to the current RequestStats, if there is one, as a timing of the given kind.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_timing(kind, time.perf_counter() - start)
+
+
+def bind_stats(function):
+    """
+    Wrap a function so that it adds its costs to the current RequestStats even when
+    it runs in another thread, e.g. in a ThreadPoolExecutor.
+    """
+    stats = _current_stats.get()
+
+    def wrapper(*args, **kwargs):
+        token = _current_stats.set(stats)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current_stats.reset(token)
+
+    return wrapper
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per route.
+    """
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, value):
+        with self._lock:
+            counts, total = self._series.get(route, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[route] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((route, list(counts), total) for route, (counts, total) in self._series.items())
+        for route, counts, total in series:
+            label = route.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{route="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{route="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{route="{label}"}} {cumulative}')
+        return "\n".join(lines)
+
+
+def _record_statement(statement, context):
+    """
+    Add a statement that ran, with its time since before_cursor_execute, to the current RequestStats.
+    """
+    start = getattr(context, "query_start", None)
+    stats = _current_stats.get()
+    if stats is not None and start is not None:
+        stats.add_statement(statement, time.perf_counter() - start)
+
+
+class Metrics:
+    """
+    Records the costs of every request per route and serves them on /metrics.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.histograms = {
+            "duration": Histogram("http_request_duration_seconds", "Request latency.", TIME_BUCKETS),
+            "statements": Histogram("db_statements_per_request", "SQL statements per request.", COUNT_BUCKETS),
+            "db_time": Histogram("db_time_seconds", "Time spent in SQL statements per request.", TIME_BUCKETS),
+            "api_calls": Histogram("movie_api_calls_per_request", "Movie API calls per request.", COUNT_BUCKETS),
+            "api_call": Histogram("movie_api_call_seconds", "Latency of the movie API calls.", TIME_BUCKETS),
+            "bcrypt": Histogram("bcrypt_seconds", "Time spent hashing passwords per request.", TIME_BUCKETS),
+            "render": Histogram("template_render_seconds", "Time spent rendering templates per request.",
+                                TIME_BUCKETS),
+        }
+        self.slow_request_seconds = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        """
+        Hook the request signals and the engines of db, and add the /metrics endpoint.
+        SLOW_REQUEST_SECONDS enables the log of the requests slower than it, with their SQL.
+        """
+        self.slow_request_seconds = app.config.get("SLOW_REQUEST_SECONDS")
+        with app.app_context():
+            for engine in db.engines.values():
+                self.watch_engine(engine)
+
+        app.before_request(self._start_request)
+        app.teardown_request(self._end_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._end_render, app)
+        app.add_url_rule("/metrics", "metrics", self.render)
+        app.extensions["metrics"] = self
+
+    def watch_engine(self, engine):
+        """
+        Count the statements of an engine and their time in the current RequestStats.
+        """
+        # The start time is kept on the statement's execution context, which a failed statement
+        # takes away with it, rather than on the connection where it would be left behind
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context.query_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            _record_statement(statement, context)
+
+        @event.listens_for(engine, "handle_error")
+        def handle_error(exception_context):
+            # Failed statements took time too, e.g. an INSERT failing on a constraint
+            if exception_context.execution_context is not None and exception_context.statement is not None:
+                _record_statement(exception_context.statement, exception_context.execution_context)
+
+    def render(self):
+        body = "\n".join(histogram.render() for histogram in self.histograms.values()) + "\n"
+        return Response(body, mimetype="text/plain; version=0.0.4")
+
+    @staticmethod
+    def _start_request():
+        g.request_stats = RequestStats()
+        g.request_stats_token = _current_stats.set(g.request_stats)
+        g.request_start = time.perf_counter()
+
+    def _end_request(self, exception=None):
+        stats = g.pop("request_stats", None)
+        if stats is None:
+            return
+        _current_stats.reset(g.pop("request_stats_token"))
+        duration = time.perf_counter() - g.pop("request_start")
+
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        self.histograms["duration"].observe(route, duration)
+        self.histograms["statements"].observe(route, stats.statement_count)
+        self.histograms["db_time"].observe(route, stats.db_time)
+        self.histograms["api_calls"].observe(route, stats.count("movie_api"))
+        for seconds in stats.timings.get("movie_api", ()):
+            self.histograms["api_call"].observe(route, seconds)
+        self.histograms["bcrypt"].observe(route, stats.total("bcrypt"))
+        self.histograms["render"].observe(route, stats.total("render"))
+
+        if self.slow_request_seconds is not None and duration >= self.slow_request_seconds:
+            statements = "\n".join(f"  {seconds * 1000:.1f} ms: {statement}"
+                                   for statement, seconds in stats.statements)
+            logger.warning("Slow request %s %s: %.3f s, %d statements in %.3f s\n%s",
+                           request.method, request.full_path, duration,
+                           stats.statement_count, stats.db_time, statements)
+
+    @staticmethod
+    def _start_render(sender, template, context, **extra):
+        g.render_start = time.perf_counter()
+
+    @staticmethod
+    def _end_render(sender, template, context, **extra):
+        stats = _current_stats.get()
+        start = g.pop("render_start", None)
+        if stats is not None and start is not None:
+            stats.add_timing("render", time.perf_counter() - start)
@@ -0,0 +1,289 @@
+"""
+Migrations that bring an existing database up to date with helpers/sql_models.py.
+
+db.create_all() only creates missing tables, so changes to tables that already
+exist are applied here. Every step is safe to run more than once, and the number
+of applied steps is stored in SQLite's user_version pragma so they only run once.
+"""
+import logging
+from sqlalchemy import insert, text, update
+from sqlalchemy.schema import CreateIndex
+from helpers.sql_models import db, user_movie_association, DataVersion, DATA_VERSION_NAME
+from helpers.text_helpers import normalize_title
+
+logger = logging.getLogger(__name__)
+
+
+def _add_association_primary_key(conn):
+    """
+    Rebuild user_movie_association with a (user_id, movie_id) primary key.
+    SQLite can't add a primary key to an existing table, so the links are
+    copied to a new table, dropping duplicates and incomplete rows.
+    """
+    has_primary_key = conn.execute(text(
+        "SELECT COUNT(*) FROM pragma_table_info('user_movie_association') WHERE pk > 0"
+    )).scalar()
+    if has_primary_key:
+        return
+
+    conn.execute(text("ALTER TABLE user_movie_association RENAME TO user_movie_association_old"))
+    user_movie_association.create(conn)
+    conn.execute(text(
+        "INSERT OR IGNORE INTO user_movie_association (user_id, movie_id) "
+        "SELECT user_id, movie_id FROM user_movie_association_old "
+        "WHERE user_id IS NOT NULL AND movie_id IS NOT NULL"
+    ))
+    conn.execute(text("DROP TABLE user_movie_association_old"))
+
+
+def _remove_duplicate_reviews(conn):
+    """
+    Fold the reviews a user wrote of the same movie into the latest one, so the unique index can be created.
+    The latest review keeps its rating and gets the texts of the older ones before its own.
+    The older rows are copied to the review_duplicate table before they are deleted.
+    """
+    rows = conn.execute(text(
+        "SELECT id, user_id, movie_id, review_text FROM review WHERE (user_id, movie_id) IN "
+        "(SELECT user_id, movie_id FROM review GROUP BY user_id, movie_id HAVING COUNT(*) > 1) "
+        "ORDER BY id"
+    )).fetchall()
+    if not rows:
+        return
+
+    texts = {}
+    latest_ids = {}
+    for review_id, user_id, movie_id, review_text in rows:
+        if review_text:
+            texts.setdefault((user_id, movie_id), []).append(review_text)
+        latest_ids[(user_id, movie_id)] = review_id
+    kept_ids = set(latest_ids.values())
+    older_ids = [review_id for review_id, _, _, _ in rows if review_id not in kept_ids]
+
+    conn.execute(text("CREATE TABLE IF NOT EXISTS review_duplicate AS SELECT * FROM review WHERE 0"))
+    conn.execute(text("INSERT INTO review_duplicate SELECT * FROM review WHERE id NOT IN "
+                      "(SELECT MAX(id) FROM review GROUP BY user_id, movie_id)"))
+    conn.execute(
+        text("UPDATE review SET review_text = :review_text WHERE id = :id"),
+        [{"id": latest_ids[key], "review_text": "\n\n".join(folded)} for key, folded in texts.items()]
+    )
+    conn.execute(text("DELETE FROM review WHERE id NOT IN "
+                      "(SELECT MAX(id) FROM review GROUP BY user_id, movie_id)"))
+    logger.warning("Folded %d duplicate reviews into %d, the originals are kept in the review_duplicate table",
+                   len(older_ids), len(latest_ids))
+
+
+def _create_indexes(conn, *names):
+    """
+    Create the named indexes declared on the models if they don't exist yet.
+    """
+    indexes = {index.name: index for table in db.metadata.sorted_tables for index in table.indexes}
+    for name in names:
+        conn.execute(CreateIndex(indexes[name], if_not_exists=True))
+
+
+def _create_lookup_indexes(conn):
+    """
+    Create the indexes of the hot lookup columns.
+    Title lookups use the normalized title, whose index comes with the column in _add_movie_normalized_title.
+    """
+    _create_indexes(conn, "ix_user_movie_association_movie_id", "uq_review_user_movie", "ix_review_movie_id")
+
+
+def _column_exists(conn, table, column):
+    return conn.execute(
+        text(f"SELECT COUNT(*) FROM pragma_table_info('{table}') WHERE name = :column"),
+        {"column": column}
+    ).scalar() > 0
+
+
+def _add_movie_status(conn):
+    """
+    Add the status column of the background enrichment, existing movies are complete.
+    """
+    if not _column_exists(conn, "movie", "status"):
+        conn.execute(text("ALTER TABLE movie ADD COLUMN status VARCHAR NOT NULL DEFAULT 'ready'"))
+
+
+def _add_movie_normalized_title(conn):
+    """
+    Add the normalized title used to find existing movies and fill it for the existing ones.
+    """
+    if not _column_exists(conn, "movie", "normalized_title"):
+        conn.execute(text("ALTER TABLE movie ADD COLUMN normalized_title VARCHAR"))
+
+    rows = conn.execute(text("SELECT id, title FROM movie WHERE normalized_title IS NULL")).fetchall()
+    if rows:
+        conn.execute(
+            text("UPDATE movie SET normalized_title = :normalized_title WHERE id = :id"),
+            [{"id": movie_id, "normalized_title": normalize_title(title)} for movie_id, title in rows]
+        )
+    _create_indexes(conn, "ix_movie_normalized_title")
+
+
+# Full-text search over movie titles and directors and over review texts.
+# The FTS5 tables only index the rows of the movie and review tables, and the triggers keep them in sync.
+SEARCH_TABLES_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5("
+    "title, director, content='movie', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_insert AFTER INSERT ON movie BEGIN "
+    "INSERT INTO movie_fts (rowid, title, director) VALUES (new.id, new.title, new.director); END",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_delete AFTER DELETE ON movie BEGIN "
+    "INSERT INTO movie_fts (movie_fts, rowid, title, director) "
+    "VALUES ('delete', old.id, old.title, old.director); END",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_update AFTER UPDATE OF title, director ON movie BEGIN "
+    "INSERT INTO movie_fts (movie_fts, rowid, title, director) "
+    "VALUES ('delete', old.id, old.title, old.director); "
+    "INSERT INTO movie_fts (rowid, title, director) VALUES (new.id, new.title, new.director); END",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS review_fts USING fts5("
+    "review_text, content='review', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS review_fts_insert AFTER INSERT ON review BEGIN "
+    "INSERT INTO review_fts (rowid, review_text) VALUES (new.id, new.review_text); END",
+    "CREATE TRIGGER IF NOT EXISTS review_fts_delete AFTER DELETE ON review BEGIN "
+    "INSERT INTO review_fts (review_fts, rowid, review_text) VALUES ('delete', old.id, old.review_text); END",
+    "CREATE TRIGGER IF NOT EXISTS review_fts_update AFTER UPDATE OF review_text ON review BEGIN "
+    "INSERT INTO review_fts (review_fts, rowid, review_text) VALUES ('delete', old.id, old.review_text); "
+    "INSERT INTO review_fts (rowid, review_text) VALUES (new.id, new.review_text); END",
+]
+
+
+SEARCH_TRIGGERS = ["movie_fts_insert", "movie_fts_delete", "movie_fts_update",
+                   "review_fts_insert", "review_fts_delete", "review_fts_update"]
+
+
+def drop_search_triggers(conn):
+    """
+    Drop the triggers of the full-text search tables, e.g. before a bulk load.
+    rebuild_search_tables() creates them again and indexes the rows loaded in the meantime.
+    """
+    for trigger in SEARCH_TRIGGERS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+
+
+def rebuild_search_tables(conn):
+    """
+    Create the full-text search tables and their triggers, and index the existing rows.
+    """
+    for statement in SEARCH_TABLES_DDL:
+        conn.execute(text(statement))
+    conn.execute(text("INSERT INTO movie_fts (movie_fts) VALUES ('rebuild')"))
+    conn.execute(text("INSERT INTO review_fts (review_fts) VALUES ('rebuild')"))
+
+
+def rebuild_rating_aggregates(conn):
+    """
+    Recompute the review count, rating sum and average user rating of every movie from the review table.
+    """
+    conn.execute(text(
+        "UPDATE movie SET "
+        "review_count = (SELECT COUNT(*) FROM review WHERE review.movie_id = movie.id), "
+        "rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM review WHERE review.movie_id = movie.id), "
+        "avg_user_rating = (SELECT AVG(rating) FROM review WHERE review.movie_id = movie.id)"
+    ))
+
+
+def _add_movie_rating_aggregates(conn):
+    """
+    Add the community rating aggregates of the movies and compute them for the existing reviews.
+    """
+    if not _column_exists(conn, "movie", "review_count"):
+        conn.execute(text("ALTER TABLE movie ADD COLUMN review_count INTEGER NOT NULL DEFAULT 0"))
+    if not _column_exists(conn, "movie", "rating_sum"):
+        conn.execute(text("ALTER TABLE movie ADD COLUMN rating_sum FLOAT NOT NULL DEFAULT 0"))
+    if not _column_exists(conn, "movie", "avg_user_rating"):
+        conn.execute(text("ALTER TABLE movie ADD COLUMN avg_user_rating FLOAT"))
+
+    rebuild_rating_aggregates(conn)
+    _create_indexes(conn, "ix_movie_avg_user_rating", "ix_movie_review_count")
+
+
+def rebuild_favorite_counts(conn):
+    """
+    Recompute the number of users having every movie in their favorites from the links.
+    """
+    conn.execute(text(
+        "UPDATE movie SET favorite_count = "
+        "(SELECT COUNT(*) FROM user_movie_association WHERE user_movie_association.movie_id = movie.id)"
+    ))
+
+
+def bump_data_version(conn):
+    """
+    Increase the data version, so the cached responses from before a bulk change aren't served anymore.
+    """
+    updated = conn.execute(update(DataVersion).where(DataVersion.name == DATA_VERSION_NAME)
+                           .values(version=DataVersion.version + 1))
+    if updated.rowcount == 0:
+        conn.execute(insert(DataVersion).values(name=DATA_VERSION_NAME, version=1))
+
+
+def _add_favorite_counts_and_review_timestamps(conn):
+    """
+    Add the number of users per movie, computed from the existing links, and the review timestamps.
+    The existing reviews keep no timestamps, since when they were written is unknown.
+    """
+    if not _column_exists(conn, "movie", "favorite_count"):
+        conn.execute(text("ALTER TABLE movie ADD COLUMN favorite_count INTEGER NOT NULL DEFAULT 0"))
+    rebuild_favorite_counts(conn)
+    if not _column_exists(conn, "review", "created_at"):
+        conn.execute(text("ALTER TABLE review ADD COLUMN created_at DATETIME"))
+    if not _column_exists(conn, "review", "updated_at"):
+        conn.execute(text("ALTER TABLE review ADD COLUMN updated_at DATETIME"))
+    _create_indexes(conn, "ix_movie_favorite_count", "ix_review_created_at")
+
+
+def _drop_title_lower_index(conn):
+    """
+    Drop the lower(title) index of the databases migrated before titles were looked up by their normalized form.
+    """
+    conn.execute(text("DROP INDEX IF EXISTS ix_movie_title_lower"))
+
+
+def _add_data_version_timestamp(conn):
+    """
+    Add the time of the last change of the data version.
+    """
+    if not _column_exists(conn, "data_version", "updated_at"):
+        conn.execute(text("ALTER TABLE data_version ADD COLUMN updated_at DATETIME"))
+
+
+# The steps in the order they were added. Append new steps, never reorder them.
+MIGRATIONS = [
+    _add_association_primary_key,
+    _remove_duplicate_reviews,
+    _create_lookup_indexes,
+    _add_movie_status,
+    _add_movie_normalized_title,
+    rebuild_search_tables,
+    _add_movie_rating_aggregates,
+    _add_favorite_counts_and_review_timestamps,
+    _drop_title_lower_index,
+    _add_data_version_timestamp,
+]
+
+
+def apply_migrations(engine):
+    """
+    Apply the migrations that haven't run on this database yet.
+
+    Args:
+        engine: The SQLAlchemy engine of the database.
+
+    Returns:
+        int: The number of migrations that were applied.
+    """
+    # The steps only concern SQLite databases created before the models changed,
+    # on other databases db.create_all() creates the tables as they are now
+    if engine.dialect.name != "sqlite":
+        return 0
+
+    with engine.begin() as conn:
+        version = conn.execute(text("PRAGMA user_version")).scalar()
+        pending = MIGRATIONS[version:]
+        for migration in pending:
+            migration(conn)
+        # PRAGMA doesn't accept bound parameters
+        conn.execute(text(f"PRAGMA user_version = {len(MIGRATIONS)}"))
+
+    return len(pending)
@@ -0,0 +1,83 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+from helpers.metrics import timed
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check_password(password, hashed_password):
+    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+def _worker_context():
+    # Forking the server, whose other threads may hold locks, could deadlock the workers. They are
+    # forked from a separate single-threaded server process instead, which only imports this module
+    # and not the application's __main__.
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+class PasswordHasher:
+    """
+    Hashes and checks bcrypt passwords on a pool of worker processes.
+
+    bcrypt is pure CPU work, so running it in the request thread holds up
+    the other requests of the worker for as long as it takes. The pool is
+    bounded, so a burst of logins queues up instead of starving the server.
+    """
+
+    def __init__(self, rounds=12, workers=2):
+        """
+        Args:
+            rounds (int): The bcrypt work factor of new hashes (each extra round doubles the cost).
+            workers (int): The number of worker processes, 0 hashes in the calling thread.
+        """
+        self.rounds = rounds
+        self.workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def hash(self, password):
+        """
+        Hash a password with the current work factor.
+        """
+        return self._run(_hash_password, password, self.rounds)
+
+    def verify(self, password, hashed_password):
+        """
+        Return True if the password matches the hash.
+        """
+        return self._run(_check_password, password, hashed_password)
+
+    def needs_rehash(self, hashed_password):
+        """
+        Return True if the hash was made with a different work factor than the current one.
+        """
+        # bcrypt hashes look like $2b$<rounds>$<salt and hash>
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _run(self, function, *args):
+        with timed("bcrypt"):
+            if not self.workers:
+                return function(*args)
+
+            # The pool is started on first use, not when the application is imported
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_worker_context())
+                pool = self._pool
+            return pool.submit(function, *args).result()
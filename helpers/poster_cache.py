@@ -0,0 +1,204 @@
+"""
+Local copies of the movie posters and their thumbnails.
+
+Every poster is downloaded once and stored on disk under the hash of its content,
+and the thumbnails of all the configured widths, as WebP and JPEG, are generated
+from it right away on a pool of background threads. A small index file maps the
+poster URL to the content hash, so the same image linked from several URLs is
+stored once.
+
+    <directory>/urls/<hash of the URL>            the content hash of the poster
+    <directory>/originals/<ab>/<content hash>     the poster as downloaded
+    <directory>/thumbnails/<ab>/<content hash>-<width>.<format>
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as WaitTimeout
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image, UnidentifiedImageError
+
+# Thumbnail formats and the Pillow options they are saved with
+THUMBNAIL_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 80, "optimize": True, "progressive": True},
+}
+
+
+class PosterUnavailable(Exception):
+    """ Raised when a poster can't be downloaded or isn't an image. """
+    pass
+
+
+def _write_atomically(path, data):
+    # Readers never see a partly written file, and concurrent writers of the same content don't clash
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as temp_file:
+        temp_file.write(data)
+    os.replace(temp_path, path)
+
+
+class PosterCache:
+    """
+    Downloads posters once and serves resized copies of them from disk.
+    """
+
+    def __init__(self, directory, widths=(170, 340), workers=2, connect_timeout=3.05, read_timeout=10,
+                 max_bytes=10 * 1024 * 1024, wait_timeout=30, retry_after=600):
+        """
+        Args:
+            directory (str): Where the posters and thumbnails are stored.
+            widths (tuple[int]): The widths of the thumbnails, in pixels.
+            workers (int): The number of threads downloading posters and generating thumbnails.
+            connect_timeout (float): Seconds to wait for a connection to the image host.
+            read_timeout (float): Seconds to wait for data from the image host.
+            max_bytes (int): Larger posters aren't downloaded.
+            wait_timeout (float): Seconds a request waits for its thumbnail before giving up.
+            retry_after (float): Seconds before a poster that couldn't be downloaded is tried again.
+        """
+        self.directory = directory
+        self.widths = tuple(widths)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="posters")
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # URLs whose thumbnails are all on disk, so page renders don't have to check the files
+        self._ready = set()
+        # URLs that couldn't be downloaded, and when
+        self._failed = {}
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_maxsize=workers))
+        self._session.mount("https://", HTTPAdapter(pool_maxsize=workers))
+
+    @staticmethod
+    def version(url):
+        """
+        Return a short hash of the poster URL, added to the thumbnail URLs so they change when the poster does.
+        """
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()[:12]
+
+    def prefetch(self, url):
+        """
+        Start downloading the poster and generating its thumbnails in the background, if they aren't on disk yet.
+        """
+        if url not in self._ready and not self._failed_recently(url):
+            self._submit(url)
+
+    def thumbnail(self, url, width, image_format):
+        """
+        Return the path and ETag of a thumbnail, waiting for it to be generated if needed.
+
+        Args:
+            url (str): The URL of the poster.
+            width (int): One of the configured widths.
+            image_format (str): "webp" or "jpeg".
+
+        Returns:
+            tuple[str, str]: The path of the thumbnail file and its ETag.
+
+        Raises:
+            PosterUnavailable: If the poster can't be downloaded or isn't an image.
+        """
+        content_hash = self._content_hash(url)
+        if content_hash is None or not os.path.exists(self._thumbnail_path(content_hash, width, image_format)):
+            if self._failed_recently(url):
+                raise PosterUnavailable(f"The poster {url} couldn't be downloaded recently")
+            try:
+                content_hash = self._submit(url).result(timeout=self.wait_timeout)
+            except WaitTimeout:
+                raise PosterUnavailable(f"The poster {url} took too long to download")
+        return self._thumbnail_path(content_hash, width, image_format), f"{content_hash[:16]}-{width}-{image_format}"
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, url):
+        # One download per poster, however many requests ask for it at the same time
+        with self._pending_lock:
+            future = self._pending.get(url)
+            if future is None:
+                future = self._pool.submit(self._prepare, url)
+                self._pending[url] = future
+                future.add_done_callback(lambda done: self._forget(url, done))
+            return future
+
+    def _forget(self, url, future):
+        with self._pending_lock:
+            self._pending.pop(url, None)
+            if not future.cancelled() and future.exception() is not None:
+                self._failed[url] = time.monotonic()
+            else:
+                self._failed.pop(url, None)
+
+    def _failed_recently(self, url):
+        failed_at = self._failed.get(url)
+        return failed_at is not None and time.monotonic() - failed_at < self.retry_after
+
+    def _index_path(self, url):
+        return os.path.join(self.directory, "urls", hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def _original_path(self, content_hash):
+        return os.path.join(self.directory, "originals", content_hash[:2], content_hash)
+
+    def _thumbnail_path(self, content_hash, width, image_format):
+        return os.path.join(self.directory, "thumbnails", content_hash[:2], f"{content_hash}-{width}.{image_format}")
+
+    def _content_hash(self, url):
+        try:
+            with open(self._index_path(url), encoding="utf-8") as index_file:
+                return index_file.read()
+        except FileNotFoundError:
+            return None
+
+    def _download(self, url):
+        try:
+            with self._session.get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                data = response.raw.read(self.max_bytes + 1, decode_content=True)
+        except requests.exceptions.RequestException as e:
+            raise PosterUnavailable(f"The poster {url} couldn't be downloaded: {e}")
+        if len(data) > self.max_bytes:
+            raise PosterUnavailable(f"The poster {url} is larger than {self.max_bytes} bytes")
+        return data
+
+    def _prepare(self, url):
+        """
+        Download the poster if needed and generate its missing thumbnails. Runs on the pool.
+        Returns the content hash of the poster.
+        """
+        content_hash = self._content_hash(url)
+        if content_hash is None or not os.path.exists(self._original_path(content_hash)):
+            data = self._download(url)
+            content_hash = hashlib.sha256(data).hexdigest()
+            _write_atomically(self._original_path(content_hash), data)
+            _write_atomically(self._index_path(url), content_hash.encode("utf-8"))
+
+        missing = [(width, image_format) for width in self.widths for image_format in THUMBNAIL_FORMATS
+                   if not os.path.exists(self._thumbnail_path(content_hash, width, image_format))]
+        if missing:
+            try:
+                with Image.open(self._original_path(content_hash)) as original:
+                    # JPEG posters are decoded at a reduced scale when that's still larger than the thumbnails
+                    largest = max(self.widths)
+                    original.draft("RGB", (largest, largest * original.height // max(original.width, 1)))
+                    image = original.convert("RGB")
+            except (UnidentifiedImageError, OSError) as e:
+                raise PosterUnavailable(f"The poster {url} isn't a readable image: {e}")
+
+            for width, image_format in missing:
+                resized = image.copy()
+                resized.thumbnail((width, width * image.height // max(image.width, 1)), Image.LANCZOS)
+                output = io.BytesIO()
+                resized.save(output, **THUMBNAIL_FORMATS[image_format])
+                _write_atomically(self._thumbnail_path(content_hash, width, image_format), output.getvalue())
+
+        self._ready.add(url)
+        return content_hash
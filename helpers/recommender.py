@@ -0,0 +1,257 @@
+import threading
+import numpy as np
+from scipy import sparse
+
+
+class ItemSimilarityIndex:
+    """
+    "Users who liked this also liked" index over the user x movie favorites matrix.
+
+    The movie x movie co-occurrence matrix C = X.T @ X (X being the binary
+    favorites matrix) is kept in a sparse matrix indexed by movie ID, and the
+    top_k most similar movies of every movie by cosine similarity
+    C[a, b] / sqrt(C[a, a] * C[b, b]) are precomputed.
+
+    Writers only record which (user, movie) favorite was added or removed.
+    Reads fold at most max_changes_per_read of the recorded changes into the
+    index, looking up the user's other favorites in the in-memory copy of X,
+    and the neighbours of the movies they touch are recomputed when they are
+    next read, along with those of the movies co-occurring with them, whose
+    similarity to them changed. The co-occurrence changes are kept per movie
+    and merged into C once there are merge_threshold of them. Past max_pending
+    changes the index is dropped and has to be built again.
+    """
+
+    def __init__(self, top_k=20, max_changes_per_read=1000, max_pending=100000, merge_threshold=1000000):
+        self.top_k = top_k
+        self.max_changes_per_read = max_changes_per_read
+        self.max_pending = max_pending
+        self.merge_threshold = merge_threshold
+        self.built = False
+        self._favorites = sparse.csr_matrix((0, 0))
+        self._cooccurrence = sparse.csr_matrix((0, 0))
+        self._diagonal = np.zeros(0, dtype=np.float32)
+        # Favorites of the users changed since the build, and co-occurrence changes not merged into C yet
+        self._changed_favorites = {}
+        self._delta = {}
+        self._delta_size = 0
+        self._neighbors = {}
+        self._stale = set()
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def build(self, user_ids, movie_ids):
+        """
+        Build the index from all the favorites.
+
+        Args:
+            user_ids (array-like): The user ID of every favorite.
+            movie_ids (array-like): The movie ID of every favorite, in the same order.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        n_users = int(user_ids.max()) + 1 if len(user_ids) else 0
+        n_movies = int(movie_ids.max()) + 1 if len(movie_ids) else 0
+
+        favorites = sparse.csr_matrix(
+            (np.ones(len(user_ids), dtype=np.float32), (user_ids, movie_ids)),
+            shape=(n_users, n_movies)
+        )
+        cooccurrence = (favorites.T @ favorites).tocsr()
+
+        with self._lock:
+            self._favorites = favorites
+            self._cooccurrence = cooccurrence
+            self._diagonal = cooccurrence.diagonal()
+            self._changed_favorites = {}
+            self._delta = {}
+            self._delta_size = 0
+            self._pending = []
+            self._stale = set()
+            self._neighbors = {}
+            for movie_id in np.flatnonzero(self._diagonal):
+                self._neighbors[int(movie_id)] = self._top_neighbors(int(movie_id))
+            self.built = True
+
+    def record_change(self, user_id, movie_id, sign):
+        """
+        Record that a user added (sign=1) or removed (sign=-1) a favorite.
+        Only the change is stored, it is folded into the index by the next reads.
+
+        Args:
+            user_id (int): The user whose favorites changed.
+            movie_id (int): The movie that was added or removed.
+            sign (int): 1 for an added favorite, -1 for a removed one.
+        """
+        with self._lock:
+            if not self.built:
+                return
+            if len(self._pending) >= self.max_pending:
+                # Too far behind to catch up change by change
+                self.built = False
+                self._pending = []
+                return
+            self._pending.append((int(user_id), int(movie_id), sign))
+
+    def similar(self, movie_id, limit=10):
+        """
+        Return up to limit (movie ID, score) pairs of the movies most similar to the given one.
+        """
+        with self._lock:
+            self._apply_pending()
+            movie_ids, scores = self._neighbors_of(int(movie_id))
+            return [(int(other), float(score)) for other, score in zip(movie_ids[:limit], scores[:limit])]
+
+    def recommend(self, seeds, limit=10):
+        """
+        Score movies by their similarity to the seed movies and return the best ones.
+
+        Args:
+            seeds (dict): Weight of every seed movie ID, e.g. the user's favorites.
+            limit (int): The maximum number of recommendations.
+
+        Returns:
+            list[tuple]: (movie ID, score) pairs, best first, without the seed movies.
+        """
+        scores = {}
+        with self._lock:
+            self._apply_pending()
+            for seed, weight in seeds.items():
+                movie_ids, similarities = self._neighbors_of(int(seed))
+                for other, similarity in zip(movie_ids, similarities):
+                    other = int(other)
+                    if other not in seeds:
+                        scores[other] = scores.get(other, 0.0) + weight * float(similarity)
+
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return best[:limit]
+
+    def _user_favorites(self, user_id):
+        """
+        Return the set of the user's current favorites, copied from X the first time the user changes.
+        Must be called with the lock held.
+        """
+        favorites = self._changed_favorites.get(user_id)
+        if favorites is None:
+            favorites = set()
+            if user_id < self._favorites.shape[0]:
+                start, end = self._favorites.indptr[user_id], self._favorites.indptr[user_id + 1]
+                favorites.update(self._favorites.indices[start:end].tolist())
+            self._changed_favorites[user_id] = favorites
+        return favorites
+
+    def _add_delta(self, movie_id, other, value):
+        row = self._delta.setdefault(movie_id, {})
+        if other not in row:
+            self._delta_size += 1
+        row[other] = row.get(other, 0) + value
+
+    def _apply_pending(self):
+        """
+        Fold up to max_changes_per_read recorded changes into the index and mark the
+        movies they touch as stale. Must be called with the lock held.
+        """
+        if not self._pending:
+            return
+
+        changes = self._pending[:self.max_changes_per_read]
+        del self._pending[:self.max_changes_per_read]
+        for user_id, movie_id, sign in changes:
+            favorites = self._user_favorites(user_id)
+            # Changes recorded for favorites the index already has (or never had) are skipped
+            if (movie_id in favorites) == (sign > 0):
+                continue
+            if sign > 0:
+                others = list(favorites)
+                favorites.add(movie_id)
+            else:
+                favorites.discard(movie_id)
+                others = list(favorites)
+
+            # The favorite co-occurs with itself and with the user's other favorites
+            size = max([movie_id, *others]) + 1
+            if size > len(self._diagonal):
+                self._diagonal = np.concatenate([self._diagonal,
+                                                 np.zeros(size - len(self._diagonal), dtype=self._diagonal.dtype)])
+            self._diagonal[movie_id] += sign
+            self._add_delta(movie_id, movie_id, sign)
+            for other in others:
+                self._add_delta(movie_id, other, sign)
+                self._add_delta(other, movie_id, sign)
+            # The similarities to the movie changed for every movie co-occurring with it
+            self._stale.add(movie_id)
+            self._stale.update(others)
+            self._stale.update(self._cooccurring(movie_id))
+
+        if self._delta_size >= self.merge_threshold:
+            self._merge_delta()
+
+    def _cooccurring(self, movie_id):
+        """
+        Return the IDs of the movies co-occurring with a movie in C or in the changes not merged yet.
+        """
+        others = set(self._delta.get(movie_id, ()))
+        if movie_id < self._cooccurrence.shape[0]:
+            start, end = self._cooccurrence.indptr[movie_id], self._cooccurrence.indptr[movie_id + 1]
+            others.update(self._cooccurrence.indices[start:end].tolist())
+        return others
+
+    def _merge_delta(self):
+        """
+        Add the co-occurrence changes to C. Must be called with the lock held.
+        """
+        rows, cols, values = [], [], []
+        for movie_id, row in self._delta.items():
+            rows.extend([movie_id] * len(row))
+            cols.extend(row.keys())
+            values.extend(row.values())
+        size = max(self._cooccurrence.shape[0], len(self._diagonal))
+        if size > self._cooccurrence.shape[0]:
+            self._cooccurrence.resize((size, size))
+        delta = sparse.csr_matrix((np.asarray(values, dtype=np.float32), (rows, cols)), shape=(size, size))
+        self._cooccurrence = (self._cooccurrence + delta).tocsr()
+        self._cooccurrence.eliminate_zeros()
+        self._delta = {}
+        self._delta_size = 0
+
+    def _neighbors_of(self, movie_id):
+        """
+        Return the neighbours of a movie, recomputing them first if changes touched it.
+        Must be called with the lock held.
+        """
+        if movie_id in self._stale:
+            self._stale.discard(movie_id)
+            if movie_id < len(self._diagonal) and self._diagonal[movie_id] > 0:
+                self._neighbors[movie_id] = self._top_neighbors(movie_id)
+            else:
+                self._neighbors.pop(movie_id, None)
+        return self._neighbors.get(movie_id, ((), ()))
+
+    def _top_neighbors(self, movie_id):
+        """
+        Return the IDs and cosine similarities of the top_k neighbours of a movie, best first.
+        """
+        others = np.zeros(0, dtype=np.int64)
+        counts = np.zeros(0, dtype=np.float32)
+        if movie_id < self._cooccurrence.shape[0]:
+            start, end = self._cooccurrence.indptr[movie_id], self._cooccurrence.indptr[movie_id + 1]
+            others = self._cooccurrence.indices[start:end].astype(np.int64)
+            counts = self._cooccurrence.data[start:end]
+        delta = self._delta.get(movie_id)
+        if delta:
+            counts = dict(zip(others.tolist(), counts.tolist()))
+            for other, value in delta.items():
+                counts[other] = counts.get(other, 0) + value
+            others = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            counts = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        keep = (others != movie_id) & (counts > 0)
+        others, counts = others[keep], counts[keep]
+
+        similarities = counts / np.sqrt(self._diagonal[movie_id] * self._diagonal[others])
+        if len(others) > self.top_k:
+            # Keep the ties at the cut too, they are broken by movie ID below like the rest of the order
+            cut = np.partition(-similarities, self.top_k - 1)[self.top_k - 1]
+            best = -similarities <= cut
+            others, similarities = others[best], similarities[best]
+        order = np.lexsort((others, -similarities))[:self.top_k]
+        return others[order], similarities[order]
@@ -0,0 +1,104 @@
+"""
+Routing of read-only queries to read replicas.
+
+The replicas are the binds of SQLALCHEMY_BINDS whose key starts with "replica".
+Queries run inside a method decorated with replica_read go to one of them, every
+other query goes to the primary. A client whose request wrote, as told by the
+data manager calling mark_written() after committing, keeps reading from the
+primary for REPLICA_STICKY_SECONDS, so it sees its own writes even if the
+replicas lag behind. Writes made on the side, like rehashing a password on
+login, don't make the client sticky.
+"""
+import inspect
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND_PREFIX = "replica"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replica_read(method):
+    """
+    Let the queries of a read-only method be served by a replica.
+    A generator it returns keeps reading from the replica while it is consumed.
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+        return _replica_generator(result) if inspect.isgenerator(result) else result
+
+    return wrapper
+
+
+def _replica_generator(generator):
+    """
+    Yield the items of a generator, running every step of it as a replica read.
+    """
+    try:
+        while True:
+            token = _replica_reads.set(True)
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                _replica_reads.reset(token)
+            yield item
+    finally:
+        generator.close()
+
+
+def _is_write(clause):
+    return isinstance(clause, (sa.Insert, sa.Update, sa.Delete))
+
+
+def reads_own_writes():
+    """
+    Return True if the current client wrote recently and must read from the primary.
+    """
+    if not has_request_context():
+        return False
+    if g.get("db_wrote"):
+        return True
+    written_at = session.get("db_written_at")
+    sticky_seconds = current_app.config.get("REPLICA_STICKY_SECONDS", 5)
+    return written_at is not None and time.time() - written_at < sticky_seconds
+
+
+def mark_written():
+    """
+    Remember that the current client just wrote, so its next requests read from the primary.
+    Call it after committing a write made on behalf of the client.
+    """
+    if has_request_context():
+        g.db_wrote = True
+        session["db_written_at"] = time.time()
+
+
+class RoutingSession(Session):
+    """
+    Session sending the queries of replica_read methods to a replica and everything else to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # Writes, and the flushes of pending changes, go to the primary
+        if bind is None and _replica_reads.get() and not _is_write(clause) and not self._has_changes():
+            replicas = [engine for key, engine in self._db.engines.items()
+                        if key is not None and key.startswith(REPLICA_BIND_PREFIX)]
+            if replicas and not reads_own_writes():
+                return random.choice(replicas)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _has_changes(self):
+        # Pending changes are flushed before the query, so it must see them on the primary
+        return bool(self.new or self.dirty or self.deleted)
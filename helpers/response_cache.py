@@ -0,0 +1,124 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, request, session, Response
+from flask_login import current_user
+from helpers.cache import TTLCache, SQLiteCache, MISSING
+from helpers.replica_routing import reads_own_writes
+
+
+class ResponseCache:
+    """
+    Cache of rendered GET responses, keyed on the path, the query string, the
+    logged-in user and the data version. Every write to the database bumps the
+    data version, so cached responses are never served after the data changed.
+
+    Responses carry a strong ETag (a hash of their body) and the time of the last
+    write as Last-Modified. Requests whose If-None-Match matches the ETag, or
+    without If-None-Match and with an If-Modified-Since not older than the last
+    write, get a 304 Not Modified.
+    """
+
+    def __init__(self, backend, get_version, ttl=300):
+        """
+        Args:
+            backend: A TTLCache (in memory) or SQLiteCache (on disk) holding the responses.
+            get_version (callable): Returns the current data version and the naive UTC datetime
+                of its last change (None if unknown).
+            ttl (int): Seconds a response stays cached.
+        """
+        self.backend = backend
+        self.get_version = get_version
+        self.ttl = ttl
+
+    def init_app(self, app):
+        app.extensions["response_cache"] = self
+
+    def response_for(self, view, args, kwargs):
+        """
+        Return the cached response of the current request, or call the view and cache its response.
+        """
+        # Flashed messages are rendered once, so responses that show them can't be cached
+        if request.method != "GET" or session.get("_flashes"):
+            return view(*args, **kwargs)
+
+        user_id = current_user.get_id() if current_user.is_authenticated else ""
+        # Clients reading their own writes get pages rendered from the primary, not from a replica
+        version, changed_at = self.get_version()
+        raw_key = f"{version}|{user_id}|{int(reads_own_writes())}|{request.full_path}"
+        key = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+        entry = self.backend.get(key, MISSING)
+        if entry is MISSING or entry is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+
+            body = response.get_data(as_text=True)
+            entry = {
+                "body": body,
+                "mimetype": response.mimetype,
+                "etag": hashlib.sha256(body.encode("utf-8")).hexdigest(),
+                # Seconds since the epoch, whole since HTTP dates have no fractions
+                "last_modified": int((changed_at.replace(tzinfo=timezone.utc) if changed_at
+                                      else datetime.now(timezone.utc)).timestamp())
+            }
+            self.backend.set(key, entry, self.ttl)
+
+        last_modified = datetime.fromtimestamp(entry["last_modified"], timezone.utc)
+        # If-None-Match takes precedence over If-Modified-Since when a request has both
+        if request.if_none_match:
+            not_modified = entry["etag"] in request.if_none_match
+        else:
+            not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+        if not_modified:
+            response = Response(status=304)
+        else:
+            response = Response(entry["body"], mimetype=entry["mimetype"])
+        response.set_etag(entry["etag"])
+        response.last_modified = last_modified
+        # Clients keep the response but check its ETag before using it again
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+        return response
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def create_response_cache(app, get_version):
+    """
+    Create the response cache configured by RESPONSE_CACHE_BACKEND ("memory", "disk" or "none"),
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL and RESPONSE_CACHE_PATH (for "disk").
+    Returns None if the cache is disabled.
+    """
+    backend_name = app.config.get("RESPONSE_CACHE_BACKEND", "memory")
+    size = app.config.get("RESPONSE_CACHE_SIZE", 1024)
+    ttl = app.config.get("RESPONSE_CACHE_TTL", 300)
+
+    if backend_name == "memory":
+        backend = TTLCache(maxsize=size, ttl=ttl)
+    elif backend_name == "disk":
+        backend = SQLiteCache(app.config["RESPONSE_CACHE_PATH"], maxsize=size)
+    elif backend_name == "none":
+        return None
+    else:
+        raise ValueError(f"Unknown response cache backend: {backend_name}")
+
+    response_cache = ResponseCache(backend, get_version, ttl=ttl)
+    response_cache.init_app(app)
+    return response_cache
+
+
+def cached(view):
+    """
+    Serve the view's GET responses from the application's response cache, if it has one.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response_cache = current_app.extensions.get("response_cache")
+        if response_cache is None:
+            return view(*args, **kwargs)
+        return response_cache.response_for(view, args, kwargs)
+
+    return wrapper
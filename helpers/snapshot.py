@@ -0,0 +1,153 @@
+"""
+Snapshots of the catalog: the user, movie, user_movie_association and review tables.
+
+A snapshot is a zip file with one Arrow IPC stream per table, compressed with zstd,
+and a manifest. Tables are read and written in chunks of rows, so exporting or
+importing a database of any size only keeps one chunk in memory at a time.
+Derived tables (trending movies, search indexes) aren't exported, they are
+rebuilt from the imported rows.
+"""
+import json
+import zipfile
+from datetime import datetime, timezone
+import pyarrow as pa
+from sqlalchemy import delete, func, insert, select, text
+from helpers.migrations import bump_data_version, drop_search_triggers, rebuild_search_tables
+from helpers.sql_models import Movie, Review, TrendingMovie, User, user_movie_association
+
+# Parents before children, the import inserts in this order and deletes in the reverse one
+SNAPSHOT_TABLES = [User.__table__, Movie.__table__, user_movie_association, Review.__table__]
+# Rows per chunk (an Arrow record batch)
+SNAPSHOT_CHUNK_SIZE = 50000
+# Increased when the layout of the snapshot files changes
+SNAPSHOT_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+
+ARROW_TYPES = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp("us")}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _arrow_schema(table):
+    return pa.schema([(column.name, ARROW_TYPES[column.type.python_type]) for column in table.columns])
+
+
+def _schema_version(conn):
+    # The number of migrations applied, see helpers/migrations.py
+    if conn.dialect.name != "sqlite":
+        return None
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def export_snapshot(conn, path, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Write the catalog tables to a snapshot file.
+
+    Args:
+        conn: A connection to the database, ideally in a transaction so the tables are consistent.
+        path (str): The snapshot file to create.
+        chunk_size (int): The number of rows read and written at a time.
+
+    Returns:
+        dict: The number of rows exported from every table.
+    """
+    counts = {}
+    # The streams are already compressed, the zip file only bundles them
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for table in SNAPSHOT_TABLES:
+            schema = _arrow_schema(table)
+            result = conn.execution_options(yield_per=chunk_size).execute(
+                select(table).order_by(*table.primary_key.columns)
+            )
+            counts[table.name] = 0
+            with archive.open(f"{table.name}.arrow", "w", force_zip64=True) as stream, \
+                    pa.ipc.new_stream(stream, schema,
+                                      options=pa.ipc.IpcWriteOptions(compression="zstd")) as writer:
+                for rows in result.partitions():
+                    columns = list(zip(*rows))
+                    writer.write_batch(pa.record_batch(
+                        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                        schema=schema
+                    ))
+                    counts[table.name] += len(rows)
+
+        archive.writestr(MANIFEST_NAME, json.dumps({
+            "format": SNAPSHOT_FORMAT,
+            "schema_version": _schema_version(conn),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "tables": counts,
+        }, indent=2))
+
+    return counts
+
+
+def _reset_sequences(conn):
+    # Rows are inserted with their IDs, so PostgreSQL's sequences have to skip past them
+    for table in (User.__table__, Movie.__table__, Review.__table__):
+        conn.execute(text("SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+                          f"(SELECT COALESCE(MAX(id), 1) FROM \"{table.name}\"))"), {"table": f'"{table.name}"'})
+
+
+def import_snapshot(conn, path, replace=False):
+    """
+    Load a snapshot file into the catalog tables.
+
+    Foreign keys are checked when the transaction commits rather than for every row,
+    and on SQLite the search triggers are dropped during the load and the search
+    indexes rebuilt once at the end.
+
+    Args:
+        conn: A connection in a transaction, e.g. from engine.begin().
+        path (str): The snapshot file to load.
+        replace (bool): Delete the rows of the catalog tables first, instead of requiring them to be empty.
+
+    Returns:
+        dict: The number of rows imported into every table.
+
+    Raises:
+        SnapshotError: If the snapshot can't be loaded into this database.
+    """
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        if manifest["format"] != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Unsupported snapshot format: {manifest['format']}")
+        schema_version = _schema_version(conn)
+        if manifest["schema_version"] is not None and schema_version is not None \
+                and manifest["schema_version"] != schema_version:
+            raise SnapshotError(f"The snapshot was taken at schema version {manifest['schema_version']}, "
+                                f"the database is at version {schema_version}, migrate them to the same one")
+
+        sqlite = conn.dialect.name == "sqlite"
+        if sqlite:
+            conn.execute(text("PRAGMA defer_foreign_keys = ON"))
+            drop_search_triggers(conn)
+        elif conn.dialect.name == "postgresql":
+            conn.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+
+        if replace:
+            # Trending movies refer to the movies, they are recomputed from the imported reviews
+            conn.execute(delete(TrendingMovie.__table__))
+            for table in reversed(SNAPSHOT_TABLES):
+                conn.execute(delete(table))
+        else:
+            for table in SNAPSHOT_TABLES:
+                if conn.execute(select(func.count()).select_from(table)).scalar():
+                    raise SnapshotError(f"The {table.name} table isn't empty, import with replace to overwrite it")
+
+        counts = {}
+        for table in SNAPSHOT_TABLES:
+            counts[table.name] = 0
+            with archive.open(f"{table.name}.arrow") as stream:
+                for batch in pa.ipc.open_stream(stream):
+                    if batch.num_rows:
+                        conn.execute(insert(table), batch.to_pylist())
+                        counts[table.name] += batch.num_rows
+
+    if sqlite:
+        rebuild_search_tables(conn)
+    elif conn.dialect.name == "postgresql":
+        _reset_sequences(conn)
+    bump_data_version(conn)
+    return counts
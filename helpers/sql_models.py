@@ -1,26 +1,60 @@
 from flask_sqlalchemy import SQLAlchemy
+from helpers.replica_routing import RoutingSession
 from sqlalchemy.schema import CheckConstraint
+from helpers.text_helpers import normalize_title
 
-db = SQLAlchemy()
+# Read-only queries may be routed to read replicas, see helpers/replica_routing.py
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+# Movie.status values: a pending movie is still waiting for its info from the API
+MOVIE_PENDING = "pending"
+MOVIE_READY = "ready"
+MOVIE_FAILED = "failed"
+
+# DataVersion counter of the users, movies and reviews
+DATA_VERSION_NAME = "catalog"
 
 user_movie_association = db.Table('user_movie_association',
-                                  db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-                                  db.Column('movie_id', db.Integer, db.ForeignKey('movie.id'))
+                                  db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+                                  db.Column('movie_id', db.Integer, db.ForeignKey('movie.id'), primary_key=True),
+                                  # The primary key covers lookups by user, this one covers lookups by movie
+                                  db.Index('ix_user_movie_association_movie_id', 'movie_id')
                                   )
 
 
 class Movie(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String, nullable=False)
+    # Kept in sync with the title, used to find existing movies
+    normalized_title = db.Column(db.String, index=True)
     director = db.Column(db.String)
     year = db.Column(db.Integer)
     rating = db.Column(db.Float)
     poster = db.Column(db.String)
+    status = db.Column(db.String, nullable=False, default=MOVIE_READY, server_default=MOVIE_READY)
+    # Community rating aggregates, updated incrementally with every review
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Float, nullable=False, default=0, server_default="0")
+    avg_user_rating = db.Column(db.Float)
+    # Number of users with the movie in their favorites, updated with every link
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Top-rated and most-reviewed listings
+        db.Index('ix_movie_avg_user_rating', 'avg_user_rating'),
+        db.Index('ix_movie_review_count', 'review_count'),
+        db.Index('ix_movie_favorite_count', 'favorite_count'),
+    )
 
     # One-to-many relationship with review
     reviews = db.relationship('Review', backref='movie')
 
 
+@db.event.listens_for(Movie.title, 'set')
+def _set_normalized_title(movie, title, old_title, initiator):
+    movie.normalized_title = normalize_title(title) if title is not None else None
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True, nullable=False)
@@ -38,10 +72,42 @@ class Review(db.Model):
     movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False)
     review_text = db.Column(db.String)
     rating = db.Column(db.Float, nullable=False)
+    # Reviews written before these columns existed have no timestamps
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
 
     __table_args__ = (
         CheckConstraint('rating >= 1 AND rating <= 10', name='rating_check'),
+        # One review per user and movie
+        db.Index('uq_review_user_movie', 'user_id', 'movie_id', unique=True),
+        db.Index('ix_review_movie_id', 'movie_id'),
+        # Reviews in the trending window
+        db.Index('ix_review_created_at', 'created_at'),
+    )
+
+
+class TrendingMovie(db.Model):
+    """
+    The movies reviewed in the trending window, recomputed periodically from the review table.
+    """
+    __tablename__ = 'trending_movie'
+
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False)
+    avg_rating = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index('ix_trending_movie_review_count', 'review_count'),
     )
 
 
+class DataVersion(db.Model):
+    """
+    Counters increased by every write, used to tell whether cached responses are still current.
+    """
+    __tablename__ = 'data_version'
 
+    name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    # When the version last changed, sent as the Last-Modified of the cached responses
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
@@ -0,0 +1,61 @@
+"""
+Connection profile of the SQLite database: the pragmas run on every new connection.
+
+The "tuned" profile lets readers and writers work concurrently (WAL), waits for
+locks instead of failing with "database is locked", and gives every connection a
+larger page cache and a memory map of the file. The "default" profile keeps
+SQLite's own settings.
+"""
+import os
+from sqlalchemy import event
+
+SQLITE_PROFILES = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",
+        # With WAL, NORMAL only syncs at checkpoints and is still safe from corruption
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        # Negative sizes are in KiB
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def sqlite_pragmas_from_env():
+    """
+    Return the pragmas of the SQLITE_PROFILE profile ("tuned" by default),
+    each of them can be overridden with an SQLITE_<PRAGMA> environment variable,
+    e.g. SQLITE_BUSY_TIMEOUT=10000.
+    """
+    profile = os.getenv("SQLITE_PROFILE", "tuned")
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {profile}")
+
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in SQLITE_PROFILES["tuned"]:
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    Run the pragmas on every new connection of the engine. Engines of other databases are left alone.
+
+    Args:
+        engine: The SQLAlchemy engine (the sync_engine of an async engine).
+        pragmas (dict): The value of every pragma, by name.
+    """
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
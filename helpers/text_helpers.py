@@ -0,0 +1,24 @@
+import re
+import unicodedata
+
+
+def normalize_title(title):
+    """
+    Normalize a movie title for lookups: case, accents, punctuation and extra whitespace are ignored.
+    """
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(char for char in title if not unicodedata.combining(char))
+    title = re.sub(r"[\W_]+", " ", title.casefold())
+    return title.strip()
+
+
+def fts_match_query(query):
+    """
+    Turn a search query typed by a user into an FTS5 MATCH expression.
+    Every word must match, and the last letters of each word may be missing (prefix search).
+    Returns None if the query has no words.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
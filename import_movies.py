@@ -0,0 +1,32 @@
+import argparse
+import json
+import sys
+from app import app, data_manager
+from datamanager.sql_data_manager import UserNotFoundError
+from helpers.import_helpers import read_titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add movies to a user's favorites in bulk.")
+    parser.add_argument("user_id", help="the ID of the user")
+    parser.add_argument("file", help="a CSV file with a title in the first column of each row, or - for stdin")
+    args = parser.parse_args()
+
+    if args.file == "-":
+        titles = read_titles(sys.stdin)
+    else:
+        with open(args.file, newline="", encoding="utf-8") as csv_file:
+            titles = read_titles(csv_file)
+
+    with app.app_context():
+        try:
+            report = data_manager.import_movies(args.user_id, titles)
+        except UserNotFoundError as e:
+            sys.exit(f"{e}")
+
+    for result in report:
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
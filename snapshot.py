@@ -0,0 +1,40 @@
+import argparse
+import json
+import db_init
+from datamanager.sql_data_manager import db
+from helpers.snapshot import export_snapshot, import_snapshot, SnapshotError, SNAPSHOT_CHUNK_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the catalog of the database (DATABASE_URL, the data/ file by default) "
+                    "to a snapshot file, or import one."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write the catalog to a snapshot file")
+    export_parser.add_argument("path", help="snapshot file to create")
+    export_parser.add_argument("--chunk-size", type=int, default=SNAPSHOT_CHUNK_SIZE,
+                               help="rows read and written at a time")
+    import_parser = commands.add_parser("import", help="load a snapshot file into the catalog")
+    import_parser.add_argument("path", help="snapshot file to load")
+    import_parser.add_argument("--replace", action="store_true",
+                               help="delete the current rows first instead of requiring empty tables")
+    args = parser.parse_args()
+
+    db_init.create_tables()
+    db_init.migrate_tables()
+    with db_init.app.app_context():
+        with db.engine.begin() as conn:
+            if args.command == "export":
+                counts = export_snapshot(conn, args.path, chunk_size=args.chunk_size)
+            else:
+                try:
+                    counts = import_snapshot(conn, args.path, replace=args.replace)
+                except SnapshotError as e:
+                    parser.exit(1, f"{e}\n")
+
+    print(json.dumps(counts))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import pytest
+from helpers.async_api_helpers import AsyncMovieAPI
+from helpers.sql_models import MOVIE_FAILED, Movie, db, user_movie_association
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """
+    The application, with the async API, over its test database.
+    The movie API knows every title except "Unknown Movie".
+    """
+    from app import app
+
+    async def lookup_movie_info(title):
+        if title == "Unknown Movie":
+            return None
+        return {"name": title, "director": "Someone", "year": 2001, "rating": 7.1, "poster": ""}
+
+    monkeypatch.setattr(AsyncMovieAPI, "lookup_movie_info", staticmethod(lookup_movie_info))
+    return app
+
+
+def _logged_in_client(app, name):
+    from app import data_manager
+    with app.app_context():
+        user_id = data_manager.add_user(name, "password1", "password1")
+    client = app.test_client()
+    client.post(f"/login/{user_id}", data={"password": "password1"})
+    return client, user_id
+
+
+def _add_movie(title, **columns):
+    movie = Movie(title=title, **columns)
+    db.session.add(movie)
+    db.session.commit()
+    return movie.id
+
+
+def test_async_add_movie(app):
+    from app import data_manager
+    client, user_id = _logged_in_client(app, "async_alice")
+    with app.app_context():
+        seen_id = _add_movie("Seen Before")
+        data_manager.add_movie(user_id, "Seen Before")
+        data_manager.rebuild_recommender()
+        version = data_manager.get_data_version()
+
+    response = client.post(f"/api/async/users/{user_id}/movies", json={"title": "Brand New"})
+
+    assert response.status_code == 201
+    assert client.get(f"/api/async/users/{user_id}/movies").get_json() == ["Seen Before", "Brand New"]
+    with app.app_context():
+        # Cached responses are invalidated, and the recommendations know the new favorite
+        assert data_manager.get_data_version() > version
+        assert [movie["title"] for movie in data_manager.get_similar_movies(seen_id)] == ["Brand New"]
+    movies = client.get("/api/async/movies").get_json()["items"]
+    assert {"title": "Brand New", "status": "ready"}.items() <= movies[-1].items()
+
+
+def test_async_add_movie_discards_a_failed_movie_the_api_doesnt_know(app):
+    from app import data_manager
+    client, user_id = _logged_in_client(app, "async_bob")
+    _, other_user_id = _logged_in_client(app, "async_carol")
+    with app.app_context():
+        movie_id = _add_movie("Unknown Movie", status=MOVIE_FAILED)
+        db.session.execute(user_movie_association.insert().values(user_id=other_user_id, movie_id=movie_id))
+        db.session.commit()
+
+    response = client.post(f"/api/async/users/{user_id}/movies", json={"title": "Unknown Movie"})
+
+    assert response.status_code == 502
+    with app.app_context():
+        assert db.session.get(Movie, movie_id) is None
+        assert data_manager.get_user_movies(other_user_id) == {}
@@ -0,0 +1,95 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from flask import current_app
+from datamanager.enrichment import EnrichmentQueue
+from datamanager.sql_data_manager import db
+from helpers.api_helpers import MovieAPI, MovieAPIUnavailable
+from helpers.sql_models import MOVIE_FAILED, MOVIE_PENDING, MOVIE_READY, Movie
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """
+    The movie API, which knows every title except "Unknown Movie". It is down for
+    the first api.failures lookups, answers once api.answer is set, and api.lookups
+    lists the titles it was asked for.
+    """
+    api = SimpleNamespace(failures=0, lookups=[], answer=threading.Event())
+    api.answer.set()
+
+    def lookup_movie_info(title):
+        api.answer.wait(timeout=10)
+        api.lookups.append(title)
+        if len(api.lookups) <= api.failures:
+            raise MovieAPIUnavailable("The API is down")
+        if title == "Unknown Movie":
+            return None
+        return {"name": title, "director": "Someone", "year": 2001, "rating": 7.1, "poster": ""}
+
+    monkeypatch.setattr(MovieAPI, "lookup_movie_info", staticmethod(lookup_movie_info))
+    return api
+
+
+@pytest.fixture
+def data_manager(sqlite_backend):
+    """
+    A data manager with background enrichment, two attempts per movie and no delay between them.
+    """
+    sqlite_backend.enrichment_queue = EnrichmentQueue(current_app._get_current_object(), sqlite_backend.enrich_movie,
+                                                      workers=1, max_attempts=2, retry_delay=0)
+    sqlite_backend.enrichment_queue.start()
+    return sqlite_backend
+
+
+def _movie(title):
+    db.session.expire_all()
+    return db.session.query(Movie).filter_by(title=title).first()
+
+
+def test_pending_movies_are_enriched(data_manager, api):
+    user_id = data_manager.add_user("alice", "password1", "password1")
+    api.failures = 1
+
+    data_manager.add_movie(user_id, "The Matrix")
+    data_manager.enrichment_queue.join()
+
+    # The first attempt failed, the second one fetched the info
+    assert api.lookups == ["The Matrix"] * 2
+    movie = _movie("The Matrix")
+    assert (movie.status, movie.director, movie.year) == (MOVIE_READY, "Someone", 2001)
+    assert list(data_manager.get_user_movies(user_id)) == [movie.id]
+
+
+def test_movies_are_pending_until_enriched(data_manager, api):
+    user_id = data_manager.add_user("alice", "password1", "password1")
+    api.answer.clear()
+
+    data_manager.add_movie(user_id, "The Matrix")
+
+    # add_movie doesn't wait for the API
+    assert _movie("The Matrix").status == MOVIE_PENDING
+    assert list(data_manager.get_user_movies(user_id)) == [_movie("The Matrix").id]
+    api.answer.set()
+    data_manager.enrichment_queue.join()
+    assert _movie("The Matrix").status == MOVIE_READY
+
+
+def test_failed_movies_are_retried_then_discarded_when_unknown(data_manager, api):
+    alice = data_manager.add_user("alice", "password1", "password1")
+    bob = data_manager.add_user("bob", "password1", "password1")
+    api.failures = 2
+
+    data_manager.add_movie(alice, "Unknown Movie")
+    data_manager.enrichment_queue.join()
+    # Every attempt failed
+    assert _movie("Unknown Movie").status == MOVIE_FAILED
+    assert api.lookups == ["Unknown Movie"] * 2
+
+    # Adding the title again retries it, and the API now says it doesn't exist
+    data_manager.add_movie(bob, "Unknown Movie")
+    data_manager.enrichment_queue.join()
+
+    assert _movie("Unknown Movie") is None
+    assert data_manager.get_user_movies(alice) == {}
+    assert data_manager.get_user_movies(bob) == {}
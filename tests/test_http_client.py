@@ -0,0 +1,69 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from helpers.http_client import CircuitBreaker, MetadataClient
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    """ Answers every request with a 503, after delay seconds. """
+    delay = 0
+    calls = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        time.sleep(self.delay)
+        self.send_response(503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    _Upstream.delay = 0
+    _Upstream.calls = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield _Upstream, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def test_every_failed_attempt_counts_in_the_breaker(upstream):
+    handler, url = upstream
+    breaker = CircuitBreaker(failure_threshold=10)
+    client = MetadataClient(url, max_retries=2, backoff_factor=0.01, breaker=breaker)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.get({"t": "Anything"})
+
+    assert handler.calls == 3
+    assert breaker.failures == 3
+
+
+def test_retries_stop_when_the_breaker_opens(upstream):
+    handler, url = upstream
+    client = MetadataClient(url, max_retries=5, backoff_factor=0.01, breaker=CircuitBreaker(failure_threshold=2))
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.get({"t": "Anything"})
+
+    assert handler.calls == 2
+    assert client.breaker.is_open
+
+
+def test_total_timeout_bounds_the_retries(upstream):
+    handler, url = upstream
+    handler.delay = 0.3
+    client = MetadataClient(url, read_timeout=10, max_retries=10, total_timeout=1, backoff_factor=0.01,
+                            breaker=CircuitBreaker(failure_threshold=100))
+
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.RequestException):
+        client.get({"t": "Anything"})
+
+    assert time.monotonic() - start < 1.5
+    assert handler.calls < 5
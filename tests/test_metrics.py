@@ -0,0 +1,31 @@
+import time
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import IntegrityError
+from helpers.metrics import Metrics, collect
+
+
+def test_failed_statements_are_timed_and_leave_nothing_behind():
+    engine = create_engine("sqlite://")
+    Metrics().watch_engine(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def slow_down(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            time.sleep(0.05)
+
+    with engine.connect() as conn:
+        conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO item VALUES (1)"))
+        with collect() as stats:
+            with pytest.raises(IntegrityError):
+                conn.execute(text("INSERT INTO item VALUES (1)"))
+            conn.execute(text("SELECT id FROM item"))
+
+        assert [statement for statement, _ in stats.statements] == ["INSERT INTO item VALUES (1)",
+                                                                     "SELECT id FROM item"]
+        failed_seconds, select_seconds = [seconds for _, seconds in stats.statements]
+        assert failed_seconds >= 0.05
+        assert select_seconds < 0.05
+        assert "query_start" not in conn.info
+    engine.dispose()
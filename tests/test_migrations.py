@@ -0,0 +1,68 @@
+import sqlite3
+import pytest
+from flask import Flask
+from sqlalchemy import text
+from datamanager.sql_data_manager import SQLiteDataManager, db
+from helpers.db_config import configure_database
+from helpers.migrations import MIGRATIONS
+
+# The schema of the databases created before the migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE movie (id INTEGER NOT NULL, title VARCHAR NOT NULL, director VARCHAR, year INTEGER,
+                    rating FLOAT, poster VARCHAR, PRIMARY KEY (id));
+CREATE TABLE user (id INTEGER NOT NULL, name VARCHAR NOT NULL, password VARCHAR NOT NULL,
+                   PRIMARY KEY (id), UNIQUE (name));
+CREATE TABLE user_movie_association (user_id INTEGER, movie_id INTEGER,
+                                     FOREIGN KEY(user_id) REFERENCES user (id),
+                                     FOREIGN KEY(movie_id) REFERENCES movie (id));
+CREATE TABLE review (id INTEGER NOT NULL, user_id INTEGER NOT NULL, movie_id INTEGER NOT NULL,
+                     review_text VARCHAR, rating FLOAT NOT NULL, PRIMARY KEY (id),
+                     CONSTRAINT rating_check CHECK (rating >= 1 AND rating <= 10));
+INSERT INTO user VALUES (1, 'alice', 'not a hash');
+INSERT INTO movie VALUES (1, 'Old Movie', 'Someone', 1990, 7.0, '');
+INSERT INTO user_movie_association VALUES (1, 1), (1, 1);
+INSERT INTO review VALUES (1, 1, 1, 'First take', 4), (2, 1, 1, NULL, 5), (3, 1, 1, 'Second take', 8);
+"""
+
+
+@pytest.fixture
+def baseline_app(tmp_path, monkeypatch):
+    """
+    A Flask app over a database with the baseline schema, migrated on startup.
+    """
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY="test", PASSWORD_HASH_ROUNDS=4, PASSWORD_HASH_WORKERS=0,
+                      TRENDING_REFRESH_SECONDS=0, MIGRATE_ON_STARTUP=True)
+    configure_database(app)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_startup_migrates_a_baseline_database(baseline_app):
+    data_manager = SQLiteDataManager(baseline_app)
+
+    with baseline_app.app_context():
+        assert db.session.execute(text("PRAGMA user_version")).scalar() == len(MIGRATIONS)
+        movies = data_manager.get_user_movies(1)
+        assert list(movies) == [1]
+        assert movies[1]["my_rating"] == 8
+        movie = data_manager.get_movie_with_reviews(1)
+        assert len(movie["reviews"]) == 1
+
+
+def test_duplicate_reviews_are_folded_into_the_latest(baseline_app):
+    SQLiteDataManager(baseline_app)
+
+    with baseline_app.app_context():
+        reviews = db.session.execute(text("SELECT id, review_text, rating FROM review")).all()
+        assert reviews == [(3, "First take\n\nSecond take", 8)]
+        # The older rows are kept aside
+        archived = db.session.execute(text("SELECT id, review_text, rating FROM review_duplicate ORDER BY id")).all()
+        assert archived == [(1, "First take", 4), (2, None, 5)]
@@ -0,0 +1,66 @@
+import time
+from types import SimpleNamespace
+import pytest
+import requests
+from helpers import cache
+from helpers.api_helpers import CACHE_NEGATIVE_TTL, CACHE_TTL, MovieAPI, MovieAPIUnavailable
+from helpers.cache import SQLiteCache
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """
+    MovieAPI over an empty cache and a clock the test moves forward. The API knows every title
+    except "Unknown Movie", and api.requests lists the titles it was asked for.
+    """
+    api = SimpleNamespace(now=time.time(), requests=[], down=False)
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: api.now))
+    monkeypatch.setattr(MovieAPI, "cache", SQLiteCache(str(tmp_path / "movie_api_cache.db")))
+
+    def request_movie_info(title):
+        api.requests.append(title)
+        if api.down:
+            raise requests.exceptions.ConnectionError("The API is down")
+        if title == "Unknown Movie":
+            return None
+        return {"name": title, "director": "Someone", "year": 2001, "rating": 7.1, "poster": ""}
+
+    monkeypatch.setattr(MovieAPI, "_request_movie_info", staticmethod(request_movie_info))
+    return api
+
+
+def test_movies_are_cached_by_normalized_title(api):
+    movie = MovieAPI.lookup_movie_info("The Matrix")
+
+    assert MovieAPI.lookup_movie_info("the  MATRIX!") == movie
+    api.now += CACHE_TTL - 1
+    assert MovieAPI.lookup_movie_info("The Matrix") == movie
+    assert api.requests == ["The Matrix"]
+
+    api.now += 2
+    MovieAPI.lookup_movie_info("The Matrix")
+    assert api.requests == ["The Matrix"] * 2
+
+
+def test_unknown_titles_expire_after_the_negative_ttl(api):
+    assert MovieAPI.lookup_movie_info("Unknown Movie") is None
+
+    api.now += CACHE_NEGATIVE_TTL - 1
+    assert MovieAPI.lookup_movie_info("Unknown Movie") is None
+    assert api.requests == ["Unknown Movie"]
+
+    api.now += 2
+    assert MovieAPI.lookup_movie_info("Unknown Movie") is None
+    assert api.requests == ["Unknown Movie"] * 2
+    assert CACHE_NEGATIVE_TTL < CACHE_TTL
+
+
+def test_failures_are_not_cached(api):
+    api.down = True
+    with pytest.raises(MovieAPIUnavailable):
+        MovieAPI.lookup_movie_info("The Matrix")
+    assert MovieAPI.fetch_movie_info("The Matrix") is None
+
+    api.down = False
+    assert MovieAPI.lookup_movie_info("The Matrix")["name"] == "The Matrix"
+    assert api.requests == ["The Matrix"] * 3
@@ -0,0 +1,85 @@
+import threading
+import pytest
+from datamanager.sql_data_manager import WrongPassword, db
+from helpers import password_hasher
+from helpers.password_hasher import PasswordHasher
+from helpers.sql_models import User
+
+
+def test_inline_hashing_runs_in_the_calling_thread(monkeypatch):
+    hasher = PasswordHasher(rounds=4, workers=0)
+    threads = []
+    check_password = password_hasher._check_password
+
+    def recording_check_password(*args):
+        threads.append(threading.current_thread())
+        return check_password(*args)
+
+    monkeypatch.setattr(password_hasher, "_check_password", recording_check_password)
+
+    hashed_password = hasher.hash("password1")
+
+    assert hashed_password.startswith("$2b$04$")
+    assert hasher.verify("password1", hashed_password)
+    assert not hasher.verify("password2", hashed_password)
+    assert threads == [threading.current_thread()] * 2
+    assert hasher._pool is None
+
+
+@pytest.mark.parametrize("hashed_password, needs_rehash", [
+    ("$2b$04$" + "a" * 53, False),
+    ("$2b$05$" + "a" * 53, True),
+    ("$2b$12$" + "a" * 53, True),
+    ("not a bcrypt hash", True),
+    ("$2b$xx$" + "a" * 53, True),
+])
+def test_needs_rehash(hashed_password, needs_rehash):
+    assert PasswordHasher(rounds=4, workers=0).needs_rehash(hashed_password) is needs_rehash
+
+
+def _stored_hash(user_id):
+    db.session.expire_all()
+    return db.session.get(User, user_id).password
+
+
+@pytest.fixture
+def user_id(sqlite_backend):
+    # Created with the 4 rounds of the test configuration, then the work factor goes up to 5
+    user_id = sqlite_backend.add_user("alice", "password1", "password1")
+    sqlite_backend.password_hasher.rounds = 5
+    return user_id
+
+
+def test_login_rehashes_an_outdated_hash(sqlite_backend, user_id):
+    old_hash = _stored_hash(user_id)
+    assert old_hash.startswith("$2b$04$")
+
+    sqlite_backend.authenticate_user("password1", old_hash, user_id)
+
+    new_hash = _stored_hash(user_id)
+    assert new_hash.startswith("$2b$05$")
+    assert sqlite_backend.password_hasher.verify("password1", new_hash)
+    # The new hash is current, the next login leaves it alone
+    sqlite_backend.authenticate_user("password1", new_hash, user_id)
+    assert _stored_hash(user_id) == new_hash
+
+
+def test_no_rehash_without_a_successful_login(sqlite_backend, user_id):
+    old_hash = _stored_hash(user_id)
+
+    with pytest.raises(WrongPassword):
+        sqlite_backend.authenticate_user("password2", old_hash, user_id)
+    # Without the user ID the password is only checked
+    sqlite_backend.authenticate_user("password1", old_hash)
+
+    assert _stored_hash(user_id) == old_hash
+
+
+def test_a_password_changed_meanwhile_is_kept(sqlite_backend, user_id):
+    old_hash = _stored_hash(user_id)
+    db.session.get(User, user_id).password = changed_hash = sqlite_backend.password_hasher.hash("password2")
+    db.session.commit()
+
+    sqlite_backend.authenticate_user("password1", old_hash, user_id)
+
+    assert _stored_hash(user_id) == changed_hash
@@ -0,0 +1,129 @@
+import os
+import time
+from http.server import ThreadingHTTPServer
+import pytest
+from PIL import Image
+from benchmark import StubMovieAPIHandler, start_server
+from helpers.poster_cache import THUMBNAIL_FORMATS, PosterCache, PosterUnavailable
+
+
+class _PosterHandler(StubMovieAPIHandler):
+    """
+    The benchmark's stub, without latency, counting the requests. /missing/ paths are not found.
+    """
+    latency = 0
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path.startswith("/missing/"):
+            self.send_error(404)
+            return
+        super().do_GET()
+
+
+@pytest.fixture
+def server():
+    server = start_server(ThreadingHTTPServer(("127.0.0.1", 0), _PosterHandler))
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make_cache(**kwargs):
+        cache = PosterCache(str(tmp_path / "posters"), workers=2, wait_timeout=10, **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make_cache
+    for cache in caches:
+        cache.shutdown()
+
+
+def _files(directory):
+    return sorted(name for _, _, names in os.walk(directory) for name in names)
+
+
+def _wait_for_failure(cache, url):
+    # The failure is recorded by a callback of the download, which may run just after the waiting request returns
+    deadline = time.monotonic() + 5
+    while url not in cache._failed and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_thumbnails_of_every_width_and_format(server, make_cache):
+    cache = make_cache(widths=(170, 340))
+
+    path, etag = cache.thumbnail(f"{server.url}/posters/7.jpg", 170, "webp")
+
+    assert etag.endswith("-170-webp")
+    for width in (170, 340):
+        for image_format in THUMBNAIL_FORMATS:
+            with Image.open(path.replace("-170.webp", f"-{width}.{image_format}")) as thumbnail:
+                # The stub's posters are 600x900
+                assert thumbnail.size == (width, width * 3 // 2)
+                assert thumbnail.format == THUMBNAIL_FORMATS[image_format]["format"]
+    assert server.requests == ["/posters/7.jpg"]
+
+
+def test_posters_are_downloaded_once(server, make_cache):
+    url = f"{server.url}/posters/7.jpg"
+    cache = make_cache()
+    cache.thumbnail(url, 170, "jpeg")
+
+    cache.thumbnail(url, 340, "webp")
+    # A new cache over the same directory finds the files on disk
+    make_cache().thumbnail(url, 170, "webp")
+
+    assert server.requests == ["/posters/7.jpg"]
+
+
+def test_the_same_image_at_two_urls_is_stored_once(server, make_cache, tmp_path):
+    cache = make_cache()
+
+    first_path, first_etag = cache.thumbnail(f"{server.url}/posters/7.jpg", 170, "jpeg")
+    second_path, second_etag = cache.thumbnail(f"{server.url}/posters/7.jpg?size=large", 170, "jpeg")
+
+    assert (second_path, second_etag) == (first_path, first_etag)
+    assert len(_files(tmp_path / "posters" / "originals")) == 1
+    assert len(_files(tmp_path / "posters" / "urls")) == 2
+    assert cache.thumbnail(f"{server.url}/posters/8.jpg", 170, "jpeg")[0] != first_path
+
+
+def test_posters_larger_than_max_bytes_are_not_stored(server, make_cache, tmp_path):
+    cache = make_cache(max_bytes=100)
+
+    with pytest.raises(PosterUnavailable, match="larger than 100 bytes"):
+        cache.thumbnail(f"{server.url}/posters/7.jpg", 170, "jpeg")
+    assert _files(tmp_path / "posters") == []
+
+
+def test_responses_that_are_not_images_are_rejected(server, make_cache):
+    cache = make_cache()
+
+    with pytest.raises(PosterUnavailable, match="isn't a readable image"):
+        cache.thumbnail(f"{server.url}/?t=Alien", 170, "jpeg")
+
+
+def test_failed_posters_are_retried_after_the_window(server, make_cache):
+    url = f"{server.url}/missing/7.jpg"
+    cache = make_cache(retry_after=60)
+    with pytest.raises(PosterUnavailable, match="couldn't be downloaded"):
+        cache.thumbnail(url, 170, "jpeg")
+    _wait_for_failure(cache, url)
+
+    # Within the window neither the requests nor the prefetches go to the image host
+    with pytest.raises(PosterUnavailable, match="recently"):
+        cache.thumbnail(url, 170, "jpeg")
+    cache.prefetch(url)
+    assert server.requests == ["/missing/7.jpg"]
+
+    cache.retry_after = 0
+    with pytest.raises(PosterUnavailable, match="couldn't be downloaded: "):
+        cache.thumbnail(url, 170, "jpeg")
+    assert server.requests == ["/missing/7.jpg"] * 2
@@ -0,0 +1,99 @@
+"""
+Query budgets: the number of SQL statements of a read or a write must not grow
+with the number of favorites or reviews it touches.
+"""
+import pytest
+from datamanager.sql_data_manager import db
+from helpers.metrics import Metrics, collect
+from helpers.sql_models import Movie, Review, User, user_movie_association
+
+LIST_SIZES = [0, 1, 50, 500]
+
+
+@pytest.fixture
+def data_manager(sqlite_backend):
+    Metrics().watch_engine(db.engine)
+    # The first write of a database also creates the data version row, an extra statement
+    sqlite_backend._bump_data_version()
+    db.session.commit()
+    return sqlite_backend
+
+
+def _user_with_favorites(name, count, reviewed=True):
+    """
+    Add a user with count favorite movies, all reviewed by the user if reviewed is True.
+    Returns the user ID and the movie IDs.
+    """
+    user = User(name=name, password="not a hash")
+    movies = [Movie(title=f"{name} movie {i}") for i in range(count)]
+    db.session.add(user)
+    db.session.add_all(movies)
+    db.session.flush()
+    if movies:
+        db.session.execute(user_movie_association.insert(),
+                           [{"user_id": user.id, "movie_id": movie.id} for movie in movies])
+    if reviewed:
+        db.session.add_all([Review(user_id=user.id, movie_id=movie.id, rating=5, review_text="ok")
+                            for movie in movies])
+    db.session.commit()
+    movie_ids = [movie.id for movie in movies]
+    user_id = user.id
+    # Nothing cached in the session may save a query
+    db.session.expunge_all()
+    return user_id, movie_ids
+
+
+@pytest.mark.parametrize("favorites", LIST_SIZES)
+def test_get_user_movies_is_one_statement(data_manager, favorites):
+    user_id, movie_ids = _user_with_favorites("alice", favorites)
+
+    with collect() as stats:
+        movies = data_manager.get_user_movies(user_id)
+
+    assert sorted(movies) == movie_ids
+    assert all(movie["my_rating"] == 5 for movie in movies.values())
+    assert stats.statement_count == 1
+
+
+@pytest.mark.parametrize("reviews", LIST_SIZES)
+def test_get_movie_with_reviews_is_one_statement(data_manager, reviews):
+    movie = Movie(title="Shared")
+    users = [User(name=f"reviewer{i}", password="not a hash") for i in range(reviews)]
+    db.session.add(movie)
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.add_all([Review(user_id=user.id, movie_id=movie.id, rating=7) for user in users])
+    db.session.commit()
+    movie_id = movie.id
+    db.session.expunge_all()
+
+    with collect() as stats:
+        result = data_manager.get_movie_with_reviews(movie_id)
+
+    assert len(result["reviews"]) == reviews
+    assert stats.statement_count == 1
+
+
+def _statement_counts(data_manager, favorites):
+    """
+    Return the statement counts of the writes on a movie of a user with that many favorites.
+    """
+    user_id, movie_ids = _user_with_favorites(f"user{favorites}", favorites, reviewed=False)
+    movie_id = movie_ids[-1]
+    counts = {}
+    for name, write in [
+        ("get_movie_by_id", lambda: data_manager.get_movie_by_id(user_id, movie_id)),
+        ("add_review", lambda: data_manager.add_review(user_id, movie_id, "fine", 6)),
+        ("update_movie", lambda: data_manager.update_movie(user_id, movie_id, {"director": "Someone"})),
+        ("delete_movie", lambda: data_manager.delete_movie(user_id, movie_id)),
+        ("add_movie", lambda: data_manager.add_movie(user_id, f"user{favorites} movie {favorites - 1}")),
+    ]:
+        db.session.expunge_all()
+        with collect() as stats:
+            write()
+        counts[name] = stats.statement_count
+    return counts
+
+
+def test_write_paths_dont_depend_on_favorites(data_manager):
+    assert _statement_counts(data_manager, 1) == _statement_counts(data_manager, 500)
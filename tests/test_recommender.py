@@ -0,0 +1,121 @@
+import math
+import random
+import pytest
+from datamanager.sql_data_manager import db
+from helpers.recommender import ItemSimilarityIndex
+from helpers.sql_models import Movie, User, user_movie_association
+
+# Favorites of every user: C[1, 2] = 2, C[2, 3] = 2, C[1, 3] = C[2, 4] = C[3, 4] = C[4, 5] = 1,
+# and movies 1 to 5 are liked by 2, 3, 2, 2 and 1 users
+FAVORITES = {1: [1, 2, 3], 2: [1, 2], 3: [2, 3, 4], 4: [4, 5]}
+
+
+def _pairs(favorites):
+    pairs = [(user_id, movie_id) for user_id, movie_ids in favorites.items() for movie_id in movie_ids]
+    return [user_id for user_id, _ in pairs], [movie_id for _, movie_id in pairs]
+
+
+def _index(favorites=FAVORITES, **kwargs):
+    index = ItemSimilarityIndex(**kwargs)
+    index.build(*_pairs(favorites))
+    return index
+
+
+def _all_similar(index, movie_ids):
+    return {movie_id: index.similar(movie_id, limit=100) for movie_id in movie_ids}
+
+
+def test_similar_movies_by_cosine_similarity():
+    index = _index()
+
+    assert index.similar(1) == [(2, pytest.approx(2 / math.sqrt(6))), (3, pytest.approx(0.5))]
+    # Equal scores are ordered by movie ID
+    assert [movie_id for movie_id, _ in index.similar(2)] == [1, 3, 4]
+    assert index.similar(4) == [(5, pytest.approx(1 / math.sqrt(2))), (3, pytest.approx(0.5)),
+                                (2, pytest.approx(1 / math.sqrt(6)))]
+    assert index.similar(42) == []
+
+
+def test_recommendations_leave_out_the_seeds():
+    index = _index()
+
+    assert index.recommend({1: 1.0}) == [(2, pytest.approx(2 / math.sqrt(6))), (3, pytest.approx(0.5))]
+    assert [movie_id for movie_id, _ in index.recommend({4: 1.0, 5: 1.0})] == [3, 2]
+    # Scores add up over the seeds
+    assert index.recommend({1: 1.0, 2: 1.0}, limit=1) == [(3, pytest.approx(0.5 + 2 / math.sqrt(6)))]
+
+
+@pytest.mark.parametrize("max_changes_per_read, merge_threshold", [(1000, 1000000), (3, 1000000), (3, 5)])
+def test_incremental_changes_match_a_full_build(max_changes_per_read, merge_threshold):
+    rng = random.Random(7)
+    favorites = {user_id: set(rng.sample(range(1, 31), rng.randint(1, 8))) for user_id in range(1, 41)}
+    index = _index({user_id: sorted(movies) for user_id, movies in favorites.items()},
+                   max_changes_per_read=max_changes_per_read, merge_threshold=merge_threshold)
+
+    for step in range(200):
+        user_id = rng.randint(1, 45)
+        movie_id = rng.randint(1, 35)
+        user_favorites = favorites.setdefault(user_id, set())
+        if movie_id in user_favorites:
+            user_favorites.discard(movie_id)
+            index.record_change(user_id, movie_id, -1)
+        else:
+            user_favorites.add(movie_id)
+            index.record_change(user_id, movie_id, 1)
+        # Reads in between fold the changes in a few at a time
+        if step % 10 == 0:
+            index.similar(movie_id)
+
+    # Fold what is left
+    while index._pending:
+        index.similar(1)
+    rebuilt = _index({user_id: sorted(movies) for user_id, movies in favorites.items()})
+    assert _all_similar(index, range(1, 36)) == _all_similar(rebuilt, range(1, 36))
+
+
+def test_index_is_dropped_past_max_pending():
+    index = _index(max_pending=3)
+
+    for movie_id in range(6, 10):
+        index.record_change(1, movie_id, 1)
+
+    assert not index.built
+
+
+@pytest.fixture
+def data_manager(sqlite_backend):
+    """
+    A data manager with the movies and favorites of FAVORITES.
+    """
+    db.session.add_all([User(id=user_id, name=f"user{user_id}", password="not a hash") for user_id in FAVORITES])
+    db.session.add_all([Movie(id=movie_id, title=f"Movie {movie_id}") for movie_id in range(1, 7)])
+    db.session.flush()
+    user_ids, movie_ids = _pairs(FAVORITES)
+    db.session.execute(user_movie_association.insert(),
+                       [{"user_id": user_id, "movie_id": movie_id} for user_id, movie_id in zip(user_ids, movie_ids)])
+    db.session.commit()
+    return sqlite_backend
+
+
+def _ids(movies):
+    return [movie["id"] for movie in movies]
+
+
+def test_similar_movies_and_recommendations(data_manager):
+    assert _ids(data_manager.get_similar_movies(2)) == [1, 3, 4]
+    assert data_manager.get_similar_movies(1)[0] == {"id": 2, "title": "Movie 2", "score": 0.8165}
+    # User 2 has movies 1 and 2
+    assert _ids(data_manager.get_recommendations(2)) == [3, 4]
+    assert _ids(data_manager.get_recommendations(4)) == [3, 2]
+
+
+def test_favorite_changes_match_a_rebuild(data_manager):
+    data_manager.get_similar_movies(1)
+
+    data_manager.add_movie(4, "Movie 1")
+    data_manager.add_movie(2, "Movie 6")
+    data_manager.delete_movie(3, 2)
+    incremental = {movie_id: data_manager.get_similar_movies(movie_id) for movie_id in range(1, 7)}
+
+    data_manager.rebuild_recommender()
+    assert {movie_id: data_manager.get_similar_movies(movie_id) for movie_id in range(1, 7)} == incremental
@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from flask import current_app, session
+from sqlalchemy import insert
+from datamanager.sql_data_manager import db
+from helpers.sql_models import User
+
+
+@contextmanager
+def _request(app, client_session=None):
+    """
+    Push the contexts of a request, carrying the session of a client if given.
+    Every request has its own app context, and g with it.
+    """
+    with app.app_context(), app.test_request_context():
+        session.update(client_session or {})
+        yield
+
+
+def _add_replica_user(name):
+    # The replica has a user the primary doesn't, so every read tells where it went
+    with db.engines["replica_0"].begin() as conn:
+        conn.execute(insert(User).values(name=name, password="not a hash"))
+
+
+def _user_names(data_manager):
+    return [user.name for user in data_manager.get_all_users()]
+
+
+def test_reads_go_to_the_replica_until_the_client_writes(replica_backend):
+    _add_replica_user("on_replica")
+    app = current_app._get_current_object()
+
+    with _request(app):
+        assert _user_names(replica_backend) == ["on_replica"]
+        users, _ = replica_backend.get_users_page()
+        assert [user["username"] for user in users] == ["on_replica"]
+        # Streams keep reading from the replica while they are consumed
+        assert [user["username"] for user in replica_backend.iter_users()] == ["on_replica"]
+
+        replica_backend.add_user("alice", "password1", "password1")
+        # add_user called mark_written(), the client now reads its own writes
+        assert _user_names(replica_backend) == ["alice"]
+        client_session = dict(session)
+
+    # The next request of the same client
+    with _request(app, client_session):
+        assert _user_names(replica_backend) == ["alice"]
+        assert [user["username"] for user in replica_backend.iter_users()] == ["alice"]
+
+    # Another client, which didn't write, still reads from the replica
+    with _request(app):
+        assert _user_names(replica_backend) == ["on_replica"]
+
+
+def test_other_reads_go_to_the_primary(replica_backend):
+    _add_replica_user("on_replica")
+
+    assert db.session.query(User.name).all() == []
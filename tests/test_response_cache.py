@@ -0,0 +1,115 @@
+import pytest
+from flask import current_app, flash, g, get_flashed_messages, redirect
+from flask_login import LoginManager, UserMixin, current_user, login_user
+from helpers.response_cache import cached, create_response_cache
+
+
+class _User(UserMixin):
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+@pytest.fixture
+def app(sqlite_backend):
+    """
+    An app with cached views over the data manager, counting how often every view runs.
+    """
+    app = current_app._get_current_object()
+    app.config["RESPONSE_CACHE_BACKEND"] = "memory"
+    create_response_cache(app, sqlite_backend.get_data_version_info)
+    login_manager = LoginManager(app)
+    login_manager.user_loader(_User)
+    app.view_calls = 0
+
+    @app.before_request
+    def fresh_g():
+        # The requests share the fixture's app context, while every real request has its own g
+        for name in list(g):
+            g.pop(name)
+
+    @app.route("/users")
+    @cached
+    def users():
+        app.view_calls += 1
+        messages = get_flashed_messages()
+        return ",".join(messages + [user.name for user in sqlite_backend.get_all_users()])
+
+    @app.route("/me")
+    @cached
+    def me():
+        app.view_calls += 1
+        return f"user {current_user.get_id()}"
+
+    @app.route("/login/<user_id>")
+    def login(user_id):
+        login_user(_User(user_id))
+        return "ok"
+
+    @app.route("/add/<name>")
+    def add(name):
+        sqlite_backend.add_user(name, "password1", "password1")
+        flash(f"{name} added")
+        return redirect("/users")
+
+    return app
+
+
+def test_second_get_is_served_from_the_cache(app):
+    client = app.test_client()
+
+    assert client.get("/users").status_code == 200
+    assert client.get("/users").status_code == 200
+    assert app.view_calls == 1
+
+
+def test_a_write_invalidates_the_cache(app):
+    client = app.test_client()
+    client.get("/users")
+    version = app.extensions["response_cache"].get_version()[0]
+
+    app.test_client().get("/add/alice")
+
+    assert app.extensions["response_cache"].get_version()[0] > version
+    assert client.get("/users").get_data(as_text=True) == "alice"
+    assert app.view_calls == 2
+
+
+def test_if_none_match_returns_304(app):
+    client = app.test_client()
+    etag = client.get("/users").headers["ETag"]
+
+    response = client.get("/users", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert client.get("/users", headers={"If-None-Match": '"another"'}).status_code == 200
+
+
+def test_if_modified_since_returns_304(app):
+    client = app.test_client()
+    app.test_client().get("/add/alice")
+    last_modified = client.get("/users").headers["Last-Modified"]
+
+    assert client.get("/users", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/users", headers={"If-Modified-Since": "Sat, 01 Jan 2000 00:00:00 GMT"}).status_code == 200
+
+
+def test_users_get_their_own_pages(app):
+    alice, bob = app.test_client(), app.test_client()
+    alice.get("/login/1")
+    bob.get("/login/2")
+
+    response = alice.get("/me")
+    assert response.get_data(as_text=True) == "user 1"
+    assert "Cookie" in response.headers["Vary"]
+    assert bob.get("/me").get_data(as_text=True) == "user 2"
+    assert alice.get("/me").get_data(as_text=True) == "user 1"
+    assert app.view_calls == 2
+
+
+def test_pages_showing_a_flash_are_not_cached(app):
+    client = app.test_client()
+
+    # The redirect after the write renders the flash
+    assert client.get("/add/alice", follow_redirects=True).get_data(as_text=True) == "alice added,alice"
+    assert client.get("/users").get_data(as_text=True) == "alice"
+    assert app.view_calls == 2
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import func, select
+from conftest import _data_manager
+from datamanager.sql_data_manager import db
+from helpers.snapshot import SNAPSHOT_TABLES, SnapshotError, export_snapshot, import_snapshot
+from helpers.sql_models import Movie, User, user_movie_association
+
+# Movie 3 was deleted, so the IDs have a gap the import must keep
+MOVIES = {1: ("The Matrix", "Lana Wachowski"), 2: ("The Matrix Reloaded", "Lana Wachowski"), 4: ("Heat", "Michael Mann")}
+FAVORITES = {1: [1, 2, 4], 2: [1, 4]}
+REVIEWS = [(1, 1, "Mind-bending classic", 9), (1, 4, "A classic heist movie", 8), (2, 1, "Still holds up", 7)]
+SEARCHES = ["matrix", "mann", "classic", "holds"]
+
+
+def _row_counts():
+    return {table.name: db.session.execute(select(func.count()).select_from(table)).scalar()
+            for table in SNAPSHOT_TABLES}
+
+
+def _search_results(data_manager):
+    return {query: (data_manager.search_movies(query), data_manager.search_reviews(query)) for query in SEARCHES}
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    """
+    A snapshot of a small catalog exported from a SQLite file, with the row counts and search results of that file.
+    """
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    path = str(tmp_path / "catalog.snapshot")
+    with contextmanager(_data_manager)("sqlite", source_dir, monkeypatch) as data_manager:
+        for user_id in FAVORITES:
+            data_manager.add_user(f"user{user_id}", "password1", "password1")
+        db.session.add_all([Movie(id=movie_id, title=title, director=director)
+                            for movie_id, (title, director) in MOVIES.items()])
+        db.session.execute(user_movie_association.insert(),
+                           [{"user_id": user_id, "movie_id": movie_id}
+                            for user_id, movie_ids in FAVORITES.items() for movie_id in movie_ids])
+        db.session.commit()
+        for user_id, movie_id, review_text, rating in REVIEWS:
+            data_manager.add_review(user_id, movie_id, review_text, rating)
+
+        with db.engine.begin() as conn:
+            counts = export_snapshot(conn, path, chunk_size=2)
+        assert counts == _row_counts()
+        yield path, counts, _search_results(data_manager)
+
+
+def test_round_trip_into_an_empty_database(snapshot, backend):
+    path, counts, search_results = snapshot
+
+    with db.engine.begin() as conn:
+        assert import_snapshot(conn, path) == counts
+
+    assert _row_counts() == counts
+    if db.engine.dialect.name == "sqlite":
+        movies, _ = search_results["matrix"][0]
+        assert [movie["id"] for movie in sorted(movies, key=lambda movie: movie["id"])] == [1, 2]
+        assert _search_results(backend) == search_results
+    movie = db.session.get(Movie, 4)
+    assert (movie.title, movie.review_count, movie.avg_user_rating) == ("Heat", 1, 8)
+
+    # New rows continue after the imported IDs
+    assert backend.add_user("user3", "password1", "password1") == 3
+    db.session.add(Movie(title="Collateral", director="Michael Mann"))
+    db.session.commit()
+    assert db.session.execute(select(Movie.id).filter_by(title="Collateral")).scalar() == 5
+    db.session.execute(user_movie_association.insert().values(user_id=3, movie_id=5))
+    db.session.commit()
+    backend.add_review(3, 5, "Tense", 8)
+    assert _row_counts()["review"] == counts["review"] + 1
+
+
+def test_import_requires_empty_tables_unless_replacing(snapshot, backend):
+    path, counts, _ = snapshot
+    backend.add_user("someone", "password1", "password1")
+
+    with pytest.raises(SnapshotError, match="isn't empty"):
+        with db.engine.begin() as conn:
+            import_snapshot(conn, path)
+    with db.engine.begin() as conn:
+        import_snapshot(conn, path, replace=True)
+
+    assert _row_counts() == counts
+    assert [user.name for user in db.session.execute(select(User).order_by(User.id)).scalars()] == ["user1", "user2"]
@@ -0,0 +1,36 @@
+from datamanager.sql_data_manager import db
+from helpers.sql_models import User
+
+
+def test_login_users_are_cached(sqlite_backend):
+    user_id = sqlite_backend.add_user("alice", "password1", "password1")
+
+    first = sqlite_backend.get_login_user(str(user_id))
+    # Gone from the database, but still served from the cache
+    db.session.delete(db.session.get(User, user_id))
+    db.session.commit()
+
+    assert sqlite_backend.get_login_user(str(user_id)) is first
+    assert sqlite_backend.user_cache.stats()["hits"] == 1
+
+
+def test_an_updated_user_is_loaded_again(sqlite_backend):
+    user_id = sqlite_backend.add_user("alice", "password1", "password1")
+    old_hash = sqlite_backend.get_login_user(str(user_id)).password
+
+    # The login replaces a hash made with an outdated work factor
+    sqlite_backend.password_hasher.rounds = 5
+    sqlite_backend.authenticate_user("password1", old_hash, user_id)
+
+    new_hash = sqlite_backend.get_login_user(str(user_id)).password
+    assert new_hash != old_hash
+    assert new_hash == db.session.get(User, user_id).password
+
+
+def test_unknown_users_are_not_cached(sqlite_backend):
+    assert sqlite_backend.get_login_user("1") is None
+
+    user_id = sqlite_backend.add_user("alice", "password1", "password1")
+
+    assert user_id == 1
+    assert sqlite_backend.get_login_user("1").name == "alice"